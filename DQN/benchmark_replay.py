@@ -0,0 +1,41 @@
+"""
+measure sample + priority update throughput of the prioritized replay buffer
+"""
+import time
+
+import numpy as np
+
+from structs import PrioritizedReplayBuffer
+
+CAPACITY = 1_000_000
+OBSERVATION_SHAPE = (4,)
+BATCH_SIZE = 256
+ITERATIONS = 2_000
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    replay_buffer = PrioritizedReplayBuffer(CAPACITY, OBSERVATION_SHAPE)
+
+    # fill the buffer in vector environment sized batches
+    for _ in range(CAPACITY // 10_000):
+        replay_buffer.add(
+            rng.random((10_000, *OBSERVATION_SHAPE), dtype=np.float32),
+            rng.integers(2, size=10_000),
+            rng.random(10_000),
+            rng.random((10_000, *OBSERVATION_SHAPE), dtype=np.float32),
+            rng.random(10_000) < 0.01,
+        )
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        sample = replay_buffer.sample(BATCH_SIZE, rng)
+        replay_buffer.update_priorities(sample.indices, rng.normal(size=BATCH_SIZE))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"capacity: {CAPACITY}, batch size: {BATCH_SIZE}"
+        f"\nmemory: {replay_buffer.nbytes / 2**20:.1f} MiB"
+        f"\nsample + update: {ITERATIONS / elapsed:.0f} batches/s"
+        f", {ITERATIONS * BATCH_SIZE / elapsed:.0f} transitions/s"
+    )
@@ -0,0 +1,423 @@
+"""
+NumPy Q-network learner. The network uses the layer representation of
+NeuroEvolution: a list of (out, in) weight arrays and a list of (out,) bias arrays,
+with ReLU between layers and a linear output layer.
+"""
+
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from structs import (
+    FrameStackReplayBuffer,
+    NStepTargets,
+    ReplayBuffer,
+    Transitions,
+)
+
+
+def init_mlp(
+    layers: List[int], rng: np.random.Generator, dtype: type = np.float32
+) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """generate He initialized weights and zero biases for each layer
+
+    Arguments:
+        layers {List[int]} -- size of each layer, input layer first
+        rng {np.random.Generator} -- random generator
+
+    Keyword Arguments:
+        dtype {type} -- dtype of the parameters (default: {np.float32})
+
+    Returns:
+        Tuple[List[np.ndarray], List[np.ndarray]] -- weights and biases of each layer
+    """
+    weights = [
+        (
+            rng.normal(size=(layers[i], layers[i - 1])) * np.sqrt(2.0 / layers[i - 1])
+        ).astype(dtype)
+        for i in range(1, len(layers))
+    ]
+    biases = [np.zeros(layers[i], dtype=dtype) for i in range(1, len(layers))]
+    return weights, biases
+
+
+def n_step_targets(
+    indices: np.ndarray,
+    rewards: np.ndarray,
+    dones: np.ndarray,
+    position: int,
+    n: int,
+    gamma: float,
+    stride: int = 1,
+) -> NStepTargets:
+    """compute n-step returns of a batch of transitions from the arrays of a replay ring,
+    the next step of the transition at index i is at index i + stride (stride is the
+    amount of environments added together), returns are truncated at the end of an
+    episode and at the newest stored step
+
+    Arguments:
+        indices {np.ndarray} -- indices of the sampled transitions
+        rewards {np.ndarray} -- rewards array of the replay ring
+        dones {np.ndarray} -- dones array of the replay ring
+        position {int} -- index the next transition will be written to
+        n {int} -- maximal amount of steps of each return
+        gamma {float} -- discount factor
+
+    Keyword Arguments:
+        stride {int} -- distance between consecutive steps of an environment, the
+                        capacity of the ring must be a multiple of it (default: {1})
+
+    Returns:
+        NStepTargets -- discounted returns, indices of the transitions whose next
+                        observations bootstrap the returns, whether the returns ended an
+                        episode and the discount of the bootstrapped values
+    """
+    capacity = rewards.shape[0]
+    indices = np.asarray(indices)
+    steps = np.arange(n)
+
+    # (batch, n) indices of the following steps of each transition
+    step_indices = (indices[:, None] + steps * stride) % capacity
+    step_rewards = rewards[step_indices]
+    step_dones = dones[step_indices]
+
+    # a step counts if it was already stored and no earlier step ended the episode
+    stored_steps = (position - 1 - indices) % capacity // stride
+    valid = steps <= stored_steps[:, None]
+    valid &= np.cumsum(step_dones, axis=1) - step_dones == 0
+
+    discounts = gamma ** steps.astype(np.float64)
+    returns = (step_rewards * valid) @ discounts
+
+    last_steps = valid.sum(axis=1) - 1
+    rows = np.arange(indices.size)
+    bootstrap_indices = step_indices[rows, last_steps]
+    terminal = step_dones[rows, last_steps]
+    bootstrap_discounts = gamma ** (last_steps + 1.0) * ~terminal
+    return NStepTargets(returns, bootstrap_indices, terminal, bootstrap_discounts)
+
+
+def n_step_transitions(
+    replay_buffer: Union[ReplayBuffer, FrameStackReplayBuffer],
+    indices: np.ndarray,
+    n: int,
+    gamma: float,
+    stride: int = 1,
+) -> Tuple[Transitions, np.ndarray]:
+    """build n-step transitions of sampled indices, for a FrameStackReplayBuffer the
+    stride is its amount of lanes
+
+    Arguments:
+        replay_buffer {Union[ReplayBuffer, FrameStackReplayBuffer]} -- replay buffer
+        indices {np.ndarray} -- indices of the sampled transitions
+        n {int} -- maximal amount of steps of each return
+        gamma {float} -- discount factor
+
+    Keyword Arguments:
+        stride {int} -- distance between consecutive steps of an environment (default: {1})
+
+    Returns:
+        Tuple[Transitions, np.ndarray] -- transitions with n-step rewards, and the
+                                          discounts to pass to QLearner.train_step
+    """
+    # the newest step of a frame stack buffer has no next frame yet
+    position = replay_buffer.position
+    if isinstance(replay_buffer, FrameStackReplayBuffer):
+        position = (position - stride) % replay_buffer.capacity
+
+    targets = n_step_targets(
+        indices,
+        replay_buffer.rewards,
+        replay_buffer.dones,
+        position,
+        n,
+        gamma,
+        stride,
+    )
+    transitions = replay_buffer.transitions(indices)
+    bootstrap_transitions = replay_buffer.transitions(targets.bootstrap_indices)
+    transitions = Transitions(
+        transitions.observations,
+        transitions.actions,
+        targets.rewards,
+        bootstrap_transitions.next_observations,
+        targets.dones,
+    )
+    return transitions, targets.discounts
+
+
+class _BatchBuffers:
+    """
+    every array a training step needs for one batch size, allocated once
+    """
+
+    def __init__(self, layers: List[int], batch_size: int, dtype: type):
+        # pre-activations and activations of each layer for the online network on
+        # observations, the online network on next observations and the target network
+        # on next observations
+        self.pre_activations = [
+            np.zeros((batch_size, size), dtype) for size in layers[1:]
+        ]
+        self.activations = [np.zeros((batch_size, size), dtype) for size in layers[1:]]
+        self.next_activations = [
+            np.zeros((batch_size, size), dtype) for size in layers[1:]
+        ]
+        self.target_activations = [
+            np.zeros((batch_size, size), dtype) for size in layers[1:]
+        ]
+
+        # backward pass
+        self.deltas = [np.zeros((batch_size, size), dtype) for size in layers[1:]]
+        self.relu_masks = [np.zeros((batch_size, size), bool) for size in layers[1:]]
+
+        # td targets
+        self.rows = np.arange(batch_size) * layers[-1]
+        self.flat_actions = np.zeros(batch_size, np.int64)
+        self.next_actions = np.zeros(batch_size, np.int64)
+        self.not_dones = np.zeros(batch_size, bool)
+        self.selected_q_values = np.zeros(batch_size, dtype)
+        self.targets = np.zeros(batch_size, dtype)
+        self.td_errors = np.zeros(batch_size, dtype)
+        self.gradients = np.zeros(batch_size, dtype)
+        self.losses = np.zeros(batch_size, dtype)
+        self.scratch = np.zeros(batch_size, dtype)
+
+
+class QLearner:
+    """
+    Double DQN learner with a Huber td loss and Adam updates, all buffers of a training
+    step are allocated once per batch size so training steps don't allocate arrays
+    """
+
+    weights: List[np.ndarray]
+    biases: List[np.ndarray]
+    target_weights: List[np.ndarray]
+    target_biases: List[np.ndarray]
+
+    def __init__(
+        self,
+        layers: List[int],
+        learning_rate: float = 1e-3,
+        gamma: float = 0.99,
+        huber_delta: float = 1.0,
+        adam_betas: Tuple[float, float] = (0.9, 0.999),
+        adam_epsilon: float = 1e-8,
+        dtype: type = np.float32,
+        seed: int = None,
+    ):
+        self.layers = list(layers)
+        self.learning_rate = learning_rate
+        self.gamma = gamma
+        self.huber_delta = huber_delta
+        self.adam_betas = adam_betas
+        self.adam_epsilon = adam_epsilon
+        self.dtype = dtype
+        self.rng = np.random.default_rng(seed)
+
+        self.weights, self.biases = init_mlp(self.layers, self.rng, dtype)
+        self.target_weights = [np.copy(weights) for weights in self.weights]
+        self.target_biases = [np.copy(biases) for biases in self.biases]
+
+        # gradients, adam moments and adam scratch space match the parameters
+        parameters = self.weights + self.biases
+        self._gradients = [np.zeros_like(parameter) for parameter in parameters]
+        self._first_moments = [np.zeros_like(parameter) for parameter in parameters]
+        self._second_moments = [np.zeros_like(parameter) for parameter in parameters]
+        self._scratch = [np.zeros_like(parameter) for parameter in parameters]
+        self.steps = 0
+
+        self._buffers: Dict[int, _BatchBuffers] = {}
+
+    def _batch_buffers(self, batch_size: int) -> _BatchBuffers:
+        if batch_size not in self._buffers:
+            self._buffers[batch_size] = _BatchBuffers(
+                self.layers, batch_size, self.dtype
+            )
+        return self._buffers[batch_size]
+
+    def sync_target(self):
+        """
+        copy the online network into the target network
+        """
+        for target, online in zip(
+            self.target_weights + self.target_biases, self.weights + self.biases
+        ):
+            np.copyto(target, online)
+
+    def _forward(
+        self,
+        observations: np.ndarray,
+        weights: List[np.ndarray],
+        biases: List[np.ndarray],
+        activations: List[np.ndarray],
+        pre_activations: List[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        forward pass writing into preallocated activations, pre-activations are kept
+        for the backward pass when given
+        """
+        layer_input = observations
+        for layer, (layer_weights, layer_biases) in enumerate(zip(weights, biases)):
+            output = pre_activations[layer] if pre_activations else activations[layer]
+            np.matmul(layer_input, layer_weights.T, out=output)
+            output += layer_biases
+            if layer < len(weights) - 1:
+                np.maximum(output, 0, out=activations[layer])
+            elif output is not activations[layer]:
+                np.copyto(activations[layer], output)
+            layer_input = activations[layer]
+        return layer_input
+
+    def q_values(self, observations: np.ndarray) -> np.ndarray:
+        """
+        Q-values of a batch of observations, the result is a buffer that is overwritten
+        by the next call with the same batch size
+        """
+        observations = np.asarray(observations, dtype=self.dtype)
+        buffers = self._batch_buffers(observations.shape[0])
+        return self._forward(
+            observations, self.weights, self.biases, buffers.next_activations
+        )
+
+    def act(self, observations: np.ndarray, epsilon: float = 0.0) -> np.ndarray:
+        """
+        epsilon-greedy actions for a batch of observations
+        """
+        actions = self.q_values(observations).argmax(axis=1)
+        explore = self.rng.random(actions.size) < epsilon
+        actions[explore] = self.rng.integers(self.layers[-1], size=explore.sum())
+        return actions
+
+    def train_step(
+        self,
+        transitions: Transitions,
+        sample_weights: np.ndarray = None,
+        discounts: np.ndarray = None,
+    ) -> Tuple[float, np.ndarray]:
+        """perform one Double DQN update on a batch of transitions
+
+        Arguments:
+            transitions {Transitions} -- batch of transitions
+
+        Keyword Arguments:
+            sample_weights {np.ndarray} -- importance sampling weights (default: {None})
+            discounts {np.ndarray} -- discount of the bootstrapped value of each
+                                      transition, gamma^n for n-step returns (default: {gamma})
+
+        Returns:
+            Tuple[float, np.ndarray] -- loss, and td errors (a buffer overwritten by the
+                                        next step with the same batch size)
+        """
+        observations = np.asarray(transitions.observations, dtype=self.dtype)
+        next_observations = np.asarray(transitions.next_observations, dtype=self.dtype)
+        batch_size = observations.shape[0]
+        buffers = self._batch_buffers(batch_size)
+
+        # Double DQN targets: the online network picks the next action, the target
+        # network evaluates it
+        next_q_values = self._forward(
+            next_observations, self.weights, self.biases, buffers.next_activations
+        )
+        np.argmax(next_q_values, axis=1, out=buffers.next_actions)
+        target_q_values = self._forward(
+            next_observations,
+            self.target_weights,
+            self.target_biases,
+            buffers.target_activations,
+        )
+        np.add(buffers.rows, buffers.next_actions, out=buffers.flat_actions)
+        np.take(target_q_values, buffers.flat_actions, out=buffers.targets)
+        np.logical_not(transitions.dones, out=buffers.not_dones)
+        buffers.targets *= buffers.not_dones
+        buffers.targets *= self.gamma if discounts is None else discounts
+        buffers.targets += transitions.rewards
+
+        # td errors of the taken actions
+        q_values = self._forward(
+            observations,
+            self.weights,
+            self.biases,
+            buffers.activations,
+            buffers.pre_activations,
+        )
+        np.add(buffers.rows, transitions.actions, out=buffers.flat_actions)
+        np.take(q_values, buffers.flat_actions, out=buffers.selected_q_values)
+        np.subtract(buffers.selected_q_values, buffers.targets, out=buffers.td_errors)
+
+        # huber loss and its gradient with respect to the selected Q-values
+        delta = self.huber_delta
+        np.clip(buffers.td_errors, -delta, delta, out=buffers.gradients)
+        np.abs(buffers.td_errors, out=buffers.scratch)
+        np.minimum(buffers.scratch, delta, out=buffers.losses)
+        buffers.scratch -= buffers.losses
+        buffers.losses *= buffers.losses
+        buffers.losses *= 0.5
+        buffers.scratch *= delta
+        buffers.losses += buffers.scratch
+        if sample_weights is not None:
+            buffers.losses *= sample_weights
+            buffers.gradients *= sample_weights
+        buffers.gradients /= batch_size
+        loss = float(buffers.losses.mean())
+
+        self._backward(observations, buffers)
+        self._adam_update()
+        return loss, buffers.td_errors
+
+    def _backward(self, observations: np.ndarray, buffers: _BatchBuffers):
+        """
+        backward pass from the gradients of the selected Q-values into self._gradients
+        """
+        layer_amount = len(self.weights)
+        output_delta = buffers.deltas[-1]
+        output_delta.fill(0)
+        np.put(output_delta, buffers.flat_actions, buffers.gradients)
+
+        for layer in reversed(range(layer_amount)):
+            delta = buffers.deltas[layer]
+            layer_input = observations if layer == 0 else buffers.activations[layer - 1]
+            np.matmul(delta.T, layer_input, out=self._gradients[layer])
+            np.sum(delta, axis=0, out=self._gradients[layer_amount + layer])
+
+            if layer:
+                previous_delta = buffers.deltas[layer - 1]
+                np.matmul(delta, self.weights[layer], out=previous_delta)
+                np.greater(
+                    buffers.pre_activations[layer - 1],
+                    0,
+                    out=buffers.relu_masks[layer - 1],
+                )
+                previous_delta *= buffers.relu_masks[layer - 1]
+
+    def _adam_update(self):
+        """
+        in place adam update of the online network parameters
+        """
+        self.steps += 1
+        beta_1, beta_2 = self.adam_betas
+        step_size = (
+            self.learning_rate
+            * np.sqrt(1.0 - beta_2**self.steps)
+            / (1.0 - beta_1**self.steps)
+        )
+        for parameter, gradient, first_moment, second_moment, scratch in zip(
+            self.weights + self.biases,
+            self._gradients,
+            self._first_moments,
+            self._second_moments,
+            self._scratch,
+        ):
+            first_moment *= beta_1
+            np.multiply(gradient, 1.0 - beta_1, out=scratch)
+            first_moment += scratch
+
+            second_moment *= beta_2
+            np.multiply(gradient, gradient, out=scratch)
+            scratch *= 1.0 - beta_2
+            second_moment += scratch
+
+            np.sqrt(second_moment, out=scratch)
+            scratch += self.adam_epsilon
+            np.divide(first_moment, scratch, out=scratch)
+            scratch *= step_size
+            parameter -= scratch
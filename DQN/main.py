@@ -0,0 +1,219 @@
+import time
+from multiprocessing import Event, Process, Queue
+from queue import Empty
+from typing import List
+
+import gym
+import numpy as np
+
+from logic import QLearner
+from structs import ReplayBuffer, SharedTransitionRing, SharedWeights
+
+# env and hyper parameters setup
+ENVIRONMENT_NAME = "CartPole-v1"
+ACTOR_AMOUNT = 4
+ENVIRONMENTS_PER_ACTOR = 8
+HIDDEN_LAYERS = [64, 64]
+REPLAY_CAPACITY = 100_000
+RING_CAPACITY = 16_384
+BATCH_SIZE = 256
+LEARNING_STARTS = 2_000
+TRAINING_STEPS = 20_000
+LEARNING_RATE = 1e-3
+GAMMA = 0.99
+
+# the learner publishes weights to the actors and syncs its target network every
+# amount of training steps
+WEIGHT_SYNC_INTERVAL = 50
+TARGET_SYNC_INTERVAL = 500
+REPORT_INTERVAL = 1_000
+
+
+def actor_epsilon(actor_index: int, actor_amount: int) -> float:
+    """
+    exploration rate of each actor, spread from 0.4 down to 0.4^8 like Ape-X
+    """
+    return 0.4 ** (1 + 7 * actor_index / max(actor_amount - 1, 1))
+
+
+def actor(
+    actor_index: int,
+    environment_name: str,
+    environment_amount: int,
+    layers: List[int],
+    ring_name: str,
+    weights_name: str,
+    epsilon: float,
+    stop: Event,
+    episode_returns: Queue,
+):
+    """
+    step a batch of environments with the newest published weights and push the
+    transitions into the actor's shared memory ring
+    """
+    environments = [gym.make(environment_name) for _ in range(environment_amount)]
+    observations = np.array([environment.reset() for environment in environments])
+
+    learner = QLearner(layers, seed=actor_index)
+    ring = SharedTransitionRing(RING_CAPACITY, observations.shape[1:], name=ring_name)
+    shared_weights = SharedWeights(
+        [parameter.shape for parameter in learner.weights + learner.biases],
+        name=weights_name,
+    )
+    version = -1
+    current_returns = np.zeros(environment_amount)
+
+    while not stop.is_set():
+        version = shared_weights.pull(learner.weights + learner.biases, version)
+        actions = learner.act(observations, epsilon)
+
+        next_observations = np.empty_like(observations)
+        rewards = np.empty(environment_amount)
+        dones = np.empty(environment_amount, dtype=bool)
+        for index, environment in enumerate(environments):
+            (
+                next_observations[index],
+                rewards[index],
+                dones[index],
+                _,
+            ) = environment.step(actions[index])
+        ring.push(observations, actions, rewards, next_observations, dones)
+
+        # restart finished environments
+        current_returns += rewards
+        for index in np.flatnonzero(dones):
+            episode_returns.put(current_returns[index])
+            current_returns[index] = 0
+            next_observations[index] = environments[index].reset()
+        observations = next_observations
+
+    # unread episode returns must not keep the process from exiting
+    episode_returns.cancel_join_thread()
+    ring.close()
+    shared_weights.close()
+    for environment in environments:
+        environment.close()
+
+
+def training_loop(
+    environment_name: str,
+    actor_amount: int,
+    environments_per_actor: int,
+    hidden_layers: List[int],
+    replay_capacity: int,
+    batch_size: int,
+    learning_starts: int,
+    training_steps: int,
+    learning_rate: float,
+    gamma: float,
+) -> List[float]:
+    """
+    train a Q-network with actor processes feeding a single learner, returns the
+    returns of the episodes the actors finished
+    """
+    test_environment = gym.make(environment_name)
+    observation_shape = test_environment.observation_space.shape
+    layers = [
+        int(np.prod(observation_shape)),
+        *hidden_layers,
+        test_environment.action_space.n,
+    ]
+    test_environment.close()
+
+    learner = QLearner(layers, learning_rate, gamma, seed=0)
+    parameters = learner.weights + learner.biases
+    replay_buffer = ReplayBuffer(replay_capacity, observation_shape)
+    rng = np.random.default_rng(0)
+
+    # shared memory transports, created here and attached to by name in the actors
+    rings = [
+        SharedTransitionRing(RING_CAPACITY, observation_shape)
+        for _ in range(actor_amount)
+    ]
+    shared_weights = SharedWeights([parameter.shape for parameter in parameters])
+    shared_weights.publish(parameters)
+
+    stop = Event()
+    episode_returns = Queue()
+    actors = [
+        Process(
+            target=actor,
+            args=(
+                actor_index,
+                environment_name,
+                environments_per_actor,
+                layers,
+                ring.name,
+                shared_weights.name,
+                actor_epsilon(actor_index, actor_amount),
+                stop,
+                episode_returns,
+            ),
+            daemon=True,
+        )
+        for actor_index, ring in enumerate(rings)
+    ]
+    for process in actors:
+        process.start()
+
+    # logging
+    all_returns = []
+    report_time = time.perf_counter()
+    report_environment_steps = 0
+    training_step = 0
+
+    try:
+        while training_step < training_steps:
+            for ring in rings:
+                ring.pull(replay_buffer)
+            if len(replay_buffer) < learning_starts:
+                time.sleep(0.01)
+                continue
+
+            learner.train_step(replay_buffer.sample(batch_size, rng))
+            training_step += 1
+            if training_step % WEIGHT_SYNC_INTERVAL == 0:
+                shared_weights.publish(parameters)
+            if training_step % TARGET_SYNC_INTERVAL == 0:
+                learner.sync_target()
+
+            if training_step % REPORT_INTERVAL == 0:
+                while True:
+                    try:
+                        all_returns.append(episode_returns.get_nowait())
+                    except Empty:
+                        break
+                environment_steps = sum(ring.total_written for ring in rings)
+                elapsed = time.perf_counter() - report_time
+                print(
+                    f"step {training_step}: "
+                    f"{(environment_steps - report_environment_steps) / elapsed:.0f} env steps/s, "
+                    f"{REPORT_INTERVAL / elapsed:.0f} updates/s, "
+                    f"average return {np.mean(all_returns[-100:] or [0]):.1f}"
+                )
+                report_time = time.perf_counter()
+                report_environment_steps = environment_steps
+    finally:
+        stop.set()
+        for process in actors:
+            process.join()
+        for shared in (*rings, shared_weights):
+            shared.close()
+            shared.unlink()
+
+    return all_returns
+
+
+if __name__ == "__main__":
+    training_loop(
+        ENVIRONMENT_NAME,
+        ACTOR_AMOUNT,
+        ENVIRONMENTS_PER_ACTOR,
+        HIDDEN_LAYERS,
+        REPLAY_CAPACITY,
+        BATCH_SIZE,
+        LEARNING_STARTS,
+        TRAINING_STEPS,
+        LEARNING_RATE,
+        GAMMA,
+    )
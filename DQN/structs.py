@@ -0,0 +1,649 @@
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+
+class Transitions(NamedTuple):
+    observations: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    next_observations: np.ndarray
+    dones: np.ndarray
+
+
+class NStepTargets(NamedTuple):
+    rewards: np.ndarray
+    bootstrap_indices: np.ndarray
+    dones: np.ndarray
+    discounts: np.ndarray
+
+
+class ReplayBuffer:
+    """
+    fixed capacity circular replay buffer, every transition field is stored in its
+    own preallocated array so adding and sampling are plain array indexing
+    """
+
+    observations: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    next_observations: np.ndarray
+    dones: np.ndarray
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_shape: Tuple[int, ...],
+        observation_dtype: type = np.float32,
+        action_shape: Tuple[int, ...] = (),
+        action_dtype: type = np.int64,
+    ):
+        self.capacity = capacity
+        self.observation_shape = tuple(observation_shape)
+        self.action_shape = tuple(action_shape)
+
+        # index of the next transition to write and amount of stored transitions
+        self.position = 0
+        self.size = 0
+
+        self.observations = np.zeros(
+            (capacity, *self.observation_shape), dtype=observation_dtype
+        )
+        self.actions = np.zeros((capacity, *self.action_shape), dtype=action_dtype)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_observations = np.zeros(
+            (capacity, *self.observation_shape), dtype=observation_dtype
+        )
+        self.dones = np.zeros(capacity, dtype=bool)
+
+    @staticmethod
+    def required_bytes(
+        capacity: int,
+        observation_shape: Tuple[int, ...],
+        observation_dtype: type = np.float32,
+        action_shape: Tuple[int, ...] = (),
+        action_dtype: type = np.int64,
+    ) -> int:
+        """
+        bytes a buffer with these parameters allocates, without allocating it
+        """
+        observation_bytes = (
+            int(np.prod(observation_shape)) * np.dtype(observation_dtype).itemsize
+        )
+        action_bytes = int(np.prod(action_shape)) * np.dtype(action_dtype).itemsize
+        reward_bytes = np.dtype(np.float32).itemsize
+        done_bytes = np.dtype(bool).itemsize
+        return capacity * (
+            2 * observation_bytes + action_bytes + reward_bytes + done_bytes
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.observations.nbytes
+            + self.actions.nbytes
+            + self.rewards.nbytes
+            + self.next_observations.nbytes
+            + self.dones.nbytes
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(
+        self,
+        observations: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_observations: np.ndarray,
+        dones: np.ndarray,
+    ) -> np.ndarray:
+        """
+        add a batch of transitions (one per environment of a vector environment), a
+        single transition without the batch dimension is also accepted.
+        returns the indices the transitions were written to
+        """
+        observations = np.asarray(observations).reshape(-1, *self.observation_shape)
+        batch_size = observations.shape[0]
+
+        # when the batch is larger than the buffer only its end is kept
+        kept = slice(max(batch_size - self.capacity, 0), batch_size)
+        indices = (self.position + np.arange(kept.stop - kept.start)) % self.capacity
+
+        self.observations[indices] = observations[kept]
+        self.actions[indices] = np.asarray(actions).reshape(
+            batch_size, *self.action_shape
+        )[kept]
+        self.rewards[indices] = np.asarray(rewards).reshape(batch_size)[kept]
+        self.next_observations[indices] = np.asarray(next_observations).reshape(
+            batch_size, *self.observation_shape
+        )[kept]
+        self.dones[indices] = np.asarray(dones).reshape(batch_size)[kept]
+
+        self.position = int((self.position + indices.size) % self.capacity)
+        self.size = min(self.size + indices.size, self.capacity)
+        return indices
+
+    def transitions(self, indices: np.ndarray) -> Transitions:
+        """
+        gather the transitions stored at indices
+        """
+        return Transitions(
+            self.observations[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.next_observations[indices],
+            self.dones[indices],
+        )
+
+    def sample_indices(
+        self, batch_size: int, rng: np.random.Generator = None
+    ) -> np.ndarray:
+        """
+        uniformly sample indices of stored transitions (with replacement)
+        """
+        rng = rng or np.random.default_rng()
+        return rng.integers(0, self.size, size=batch_size)
+
+    def sample(self, batch_size: int, rng: np.random.Generator = None) -> Transitions:
+        """
+        uniformly sample a batch of stored transitions (with replacement)
+        """
+        return self.transitions(self.sample_indices(batch_size, rng))
+
+
+class SumTree:
+    """
+    sum-tree and min-tree over leaf priorities stored in flat arrays, node i has the
+    children 2i and 2i + 1 and the leaves start at index `leaf_offset`. all operations
+    take a batch of leaves and walk the tree one level at a time for the whole batch
+    """
+
+    sums: np.ndarray
+    mins: np.ndarray
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.depth = int(np.ceil(np.log2(max(capacity, 2))))
+        self.leaf_offset = 2**self.depth
+        self.sums = np.zeros(2 * self.leaf_offset)
+        self.mins = np.full(2 * self.leaf_offset, np.inf)
+
+    @property
+    def total(self) -> float:
+        return float(self.sums[1])
+
+    @property
+    def min(self) -> float:
+        return float(self.mins[1])
+
+    def __getitem__(self, leaves: np.ndarray) -> np.ndarray:
+        return self.sums[np.asarray(leaves) + self.leaf_offset]
+
+    def update(self, leaves: np.ndarray, priorities: np.ndarray):
+        """
+        set the priorities of leaves, when a leaf appears more than once in the batch
+        its last priority is kept
+        """
+        nodes = np.asarray(leaves) + self.leaf_offset
+        self.sums[nodes] = priorities
+        self.mins[nodes] = priorities
+
+        # recompute the parents of changed nodes level by level, recomputing instead of
+        # adding differences keeps duplicate leaves correct
+        for _ in range(self.depth):
+            nodes = np.unique(nodes // 2)
+            self.sums[nodes] = self.sums[2 * nodes] + self.sums[2 * nodes + 1]
+            self.mins[nodes] = np.minimum(
+                self.mins[2 * nodes], self.mins[2 * nodes + 1]
+            )
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """
+        find the leaf of each value in [0, total), the leaf whose priority range in
+        the cumulative sum of priorities contains the value
+        """
+        values = np.minimum(
+            np.asarray(values, dtype=float), np.nextafter(self.total, 0)
+        )
+        nodes = np.ones(values.shape, dtype=np.int64)
+        for _ in range(self.depth):
+            left_sums = self.sums[2 * nodes]
+            go_right = values >= left_sums
+            values = values - left_sums * go_right
+            nodes = 2 * nodes + go_right
+
+        # floating point errors can lead into an empty leaf
+        leaves = nodes - self.leaf_offset
+        empty = self.sums[nodes] <= 0
+        if empty.any():
+            leaves[empty] = self._last_nonempty_leaf(leaves[empty])
+        return leaves
+
+    def _last_nonempty_leaf(self, leaves: np.ndarray) -> np.ndarray:
+        """
+        helper function to move leaves without priority to the closest previous leaf
+        with priority
+        """
+        nonempty_leaves = np.flatnonzero(
+            self.sums[self.leaf_offset : self.leaf_offset + self.capacity] > 0
+        )
+        positions = np.searchsorted(nonempty_leaves, leaves, side="right") - 1
+        return nonempty_leaves[np.maximum(positions, 0)]
+
+
+class PrioritizedSample(NamedTuple):
+    transitions: Transitions
+    indices: np.ndarray
+    weights: np.ndarray
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    replay buffer sampling transitions proportionally to priority^alpha, priorities are
+    indexed by a SumTree so sampling and updating cost O(batch * log(capacity))
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_shape: Tuple[int, ...],
+        observation_dtype: type = np.float32,
+        action_shape: Tuple[int, ...] = (),
+        action_dtype: type = np.int64,
+        alpha: float = 0.6,
+        epsilon: float = 1e-6,
+    ):
+        super().__init__(
+            capacity, observation_shape, observation_dtype, action_shape, action_dtype
+        )
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self.priorities = SumTree(capacity)
+
+        # new transitions get the largest priority seen so far
+        self.max_priority = 1.0
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            super().nbytes + self.priorities.sums.nbytes + self.priorities.mins.nbytes
+        )
+
+    def add(
+        self,
+        observations: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_observations: np.ndarray,
+        dones: np.ndarray,
+    ) -> np.ndarray:
+        indices = super().add(observations, actions, rewards, next_observations, dones)
+        self.priorities.update(
+            indices, np.full(indices.size, self.max_priority**self.alpha)
+        )
+        return indices
+
+    def sample_indices(
+        self, batch_size: int, rng: np.random.Generator = None
+    ) -> np.ndarray:
+        """
+        stratified sampling, the total priority is split into batch_size equal segments
+        and one transition is sampled from each
+        """
+        rng = rng or np.random.default_rng()
+        segment = self.priorities.total / batch_size
+        return self.priorities.find(
+            (np.arange(batch_size) + rng.random(batch_size)) * segment
+        )
+
+    def sample(
+        self, batch_size: int, rng: np.random.Generator = None, beta: float = 0.4
+    ) -> PrioritizedSample:
+        """
+        sample a batch of transitions by priority together with their indices and
+        normalized importance sampling weights
+        """
+        indices = self.sample_indices(batch_size, rng)
+        return PrioritizedSample(
+            self.transitions(indices), indices, self.importance_weights(indices, beta)
+        )
+
+    def importance_weights(self, indices: np.ndarray, beta: float) -> np.ndarray:
+        """
+        importance sampling weights (size * P(i))^-beta, normalized by the largest
+        possible weight, the weight of the lowest priority transition
+        """
+        probabilities = self.priorities[indices] / self.priorities.total
+        min_probability = self.priorities.min / self.priorities.total
+        return ((probabilities / min_probability) ** -beta).astype(np.float32)
+
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray):
+        """
+        set the priorities of sampled transitions from their new td errors
+        """
+        priorities = np.abs(td_errors) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.priorities.update(indices, priorities**self.alpha)
+
+
+class FrameStackReplayBuffer:
+    """
+    replay buffer for stacked observations that stores every frame once. each add
+    stores one step of every lane (environment of a vector environment) at consecutive
+    indices, so the next step of the transition at index i is at index i + lanes.
+    observation stacks and next observations are rebuilt from the frames on sampling,
+    frames from before the start of an episode are zeros
+    """
+
+    frames: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    dones: np.ndarray
+    firsts: np.ndarray
+
+    def __init__(
+        self,
+        capacity: int,
+        lanes: int,
+        frame_shape: Tuple[int, ...],
+        stack_size: int,
+        frame_dtype: type = np.uint8,
+        action_dtype: type = np.int64,
+    ):
+        self.lanes = lanes
+        self.steps = capacity // lanes
+        self.capacity = self.steps * lanes
+        self.frame_shape = tuple(frame_shape)
+        self.stack_size = stack_size
+
+        # index of the next step to write and amount of stored transitions
+        self.position = 0
+        self.size = 0
+
+        self.frames = np.zeros((self.capacity, *self.frame_shape), dtype=frame_dtype)
+        self.actions = np.zeros(self.capacity, dtype=action_dtype)
+        self.rewards = np.zeros(self.capacity, dtype=np.float32)
+        self.dones = np.zeros(self.capacity, dtype=bool)
+
+        # marks the first frame of each episode
+        self.firsts = np.zeros(self.capacity, dtype=bool)
+        self._previous_dones = np.ones(lanes, dtype=bool)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.frames.nbytes
+            + self.actions.nbytes
+            + self.rewards.nbytes
+            + self.dones.nbytes
+            + self.firsts.nbytes
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(
+        self,
+        frames: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        dones: np.ndarray,
+    ) -> np.ndarray:
+        """
+        add one step of every lane, frames are the newest frame of the observation the
+        actions were taken in. returns the indices the transitions were written to
+        """
+        indices = self.position + np.arange(self.lanes)
+        self.frames[indices] = np.asarray(frames).reshape(self.lanes, *self.frame_shape)
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.dones[indices] = dones
+        self.firsts[indices] = self._previous_dones
+        self._previous_dones = np.asarray(dones, dtype=bool).reshape(self.lanes).copy()
+
+        self.position = (self.position + self.lanes) % self.capacity
+        self.size = min(self.size + self.lanes, self.capacity)
+        return indices
+
+    def sample_indices(
+        self, batch_size: int, rng: np.random.Generator = None
+    ) -> np.ndarray:
+        """
+        uniformly sample indices of transitions whose next observation is stored
+        """
+        rng = rng or np.random.default_rng()
+        stored_steps = self.size // self.lanes
+
+        # the newest step has no next observation yet, and after wrapping around the
+        # oldest steps lost the frames of their stacks
+        oldest_step = self.stack_size - 1 if self.size == self.capacity else 0
+        steps = rng.integers(oldest_step, stored_steps - 1, size=batch_size)
+        first_row = self.position if self.size == self.capacity else 0
+        return (first_row + steps * self.lanes) % self.capacity + rng.integers(
+            self.lanes, size=batch_size
+        )
+
+    def stack(self, indices: np.ndarray) -> np.ndarray:
+        """
+        rebuild the observation stacks at indices, ordered from oldest to newest frame
+        """
+        indices = np.asarray(indices)
+        stacks = np.zeros(
+            (indices.size, self.stack_size, *self.frame_shape), dtype=self.frames.dtype
+        )
+        in_episode = np.ones(indices.size, dtype=bool)
+        for offset in range(self.stack_size):
+            frame_indices = (indices - offset * self.lanes) % self.capacity
+            stacks[in_episode, self.stack_size - 1 - offset] = self.frames[
+                frame_indices[in_episode]
+            ]
+
+            # frames before the first frame of the episode stay zeros
+            in_episode &= ~self.firsts[frame_indices]
+        return stacks
+
+    def transitions(self, indices: np.ndarray) -> Transitions:
+        """
+        gather the transitions at indices, next observations of done transitions are
+        zeros since they are never bootstrapped from
+        """
+        dones = self.dones[indices]
+        next_observations = self.stack((indices + self.lanes) % self.capacity)
+        next_observations[dones] = 0
+        return Transitions(
+            self.stack(indices),
+            self.actions[indices],
+            self.rewards[indices],
+            next_observations,
+            dones,
+        )
+
+    def sample(self, batch_size: int, rng: np.random.Generator = None) -> Transitions:
+        """
+        uniformly sample a batch of transitions (with replacement)
+        """
+        return self.transitions(self.sample_indices(batch_size, rng))
+
+
+def _shared_arrays(
+    fields: List[Tuple[str, Tuple[int, ...], type]], name: str = None
+) -> Tuple[SharedMemory, dict]:
+    """
+    create (or attach to, when name is given) one shared memory segment holding an
+    array per field, arrays start at 8 byte aligned offsets
+    """
+    offsets, size = [], 0
+    for _, shape, dtype in fields:
+        offsets.append(size)
+        size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+    shared_memory = SharedMemory(name=name, create=name is None, size=max(size, 8))
+    arrays = {
+        field: np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf, offset=offset)
+        for (field, shape, dtype), offset in zip(fields, offsets)
+    }
+    return shared_memory, arrays
+
+
+class SharedTransitionRing:
+    """
+    transition ring in shared memory with a single writer (an actor process) and a
+    single reader (the learner). the writing counter is advanced before transitions
+    are written and the written counter after, so the reader never sees a partial
+    push, and drops the transitions it copied while the writer overwrote them. a
+    reader that falls more than a capacity behind loses the oldest unread transitions
+    """
+
+    observations: np.ndarray
+    actions: np.ndarray
+    rewards: np.ndarray
+    next_observations: np.ndarray
+    dones: np.ndarray
+
+    def __init__(
+        self,
+        capacity: int,
+        observation_shape: Tuple[int, ...],
+        observation_dtype: type = np.float32,
+        name: str = None,
+    ):
+        self.capacity = capacity
+        self.observation_shape = tuple(observation_shape)
+        self.shared_memory, arrays = _shared_arrays(
+            [
+                ("written", (1,), np.int64),
+                ("writing", (1,), np.int64),
+                ("observations", (capacity, *observation_shape), observation_dtype),
+                ("actions", (capacity,), np.int64),
+                ("rewards", (capacity,), np.float32),
+                (
+                    "next_observations",
+                    (capacity, *observation_shape),
+                    observation_dtype,
+                ),
+                ("dones", (capacity,), bool),
+            ],
+            name,
+        )
+        self.__dict__.update(arrays)
+        self.name = self.shared_memory.name
+
+        # amount of transitions this process has read
+        self.read = 0
+
+    @property
+    def total_written(self) -> int:
+        return int(self.written[0])
+
+    def push(
+        self,
+        observations: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_observations: np.ndarray,
+        dones: np.ndarray,
+    ):
+        """
+        write a batch of transitions (writer process only)
+        """
+        written = self.total_written
+        indices = (written + np.arange(len(actions))) % self.capacity
+        self.writing[0] = written + len(actions)
+        self.observations[indices] = observations
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_observations[indices] = next_observations
+        self.dones[indices] = dones
+        self.written[0] = written + len(actions)
+
+    def pull(self, replay_buffer: ReplayBuffer) -> int:
+        """
+        add the unread transitions to a replay buffer (reader process only), returns
+        the amount of transitions added
+        """
+        written = self.total_written
+        positions = np.arange(max(self.read, written - self.capacity), written)
+        transitions = self._copy_transitions(positions % self.capacity)
+
+        # slots the writer started overwriting during the copy may be torn
+        valid = positions >= int(self.writing[0]) - self.capacity
+        if valid.any():
+            replay_buffer.add(*(field[valid] for field in transitions))
+        self.read = written
+        return int(valid.sum())
+
+    def _copy_transitions(self, indices: np.ndarray) -> Transitions:
+        return Transitions(
+            self.observations[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.next_observations[indices],
+            self.dones[indices],
+        )
+
+    def close(self):
+        # views into the segment must be released before closing it
+        for field in ("written", "writing", *Transitions._fields):
+            setattr(self, field, None)
+        self.shared_memory.close()
+
+    def unlink(self):
+        self.shared_memory.unlink()
+
+
+class SharedWeights:
+    """
+    network parameters in shared memory with a version counter. the version is odd
+    while the writer copies new parameters, readers retry until they copy under the
+    same even version (a seqlock)
+    """
+
+    def __init__(
+        self,
+        shapes: List[Tuple[int, ...]],
+        dtype: type = np.float32,
+        name: str = None,
+    ):
+        self.shapes = [tuple(shape) for shape in shapes]
+        self.shared_memory, arrays = _shared_arrays(
+            [("version", (1,), np.int64)]
+            + [(index, shape, dtype) for index, shape in enumerate(self.shapes)],
+            name,
+        )
+        self.version = arrays.pop("version")
+        self.parameters = list(arrays.values())
+        self.name = self.shared_memory.name
+
+    def publish(self, parameters: List[np.ndarray]):
+        """
+        copy new parameters into shared memory (single writer)
+        """
+        self.version[0] += 1
+        for shared, parameter in zip(self.parameters, parameters):
+            np.copyto(shared, parameter)
+        self.version[0] += 1
+
+    def pull(self, parameters: List[np.ndarray], known_version: int = -1) -> int:
+        """
+        copy the shared parameters into parameters if they are newer than
+        known_version, returns the version of the copied parameters
+        """
+        while True:
+            version = int(self.version[0])
+            if version == known_version:
+                return version
+            if version % 2:
+                continue
+            for parameter, shared in zip(parameters, self.parameters):
+                np.copyto(parameter, shared)
+            if int(self.version[0]) == version:
+                return version
+
+    def close(self):
+        self.version = None
+        self.parameters = []
+        self.shared_memory.close()
+
+    def unlink(self):
+        self.shared_memory.unlink()
@@ -0,0 +1,177 @@
+import numpy as np
+
+from logic import QLearner, n_step_targets, n_step_transitions
+from structs import FrameStackReplayBuffer, ReplayBuffer, Transitions
+
+
+def generate_transitions(rng: np.random.Generator, batch_size: int) -> Transitions:
+    return Transitions(
+        rng.normal(size=(batch_size, 4)),
+        rng.integers(3, size=batch_size),
+        rng.normal(size=batch_size),
+        rng.normal(size=(batch_size, 4)),
+        rng.random(batch_size) < 0.3,
+    )
+
+
+def naive_loss(learner: QLearner, transitions: Transitions, targets: np.ndarray):
+    layer_input = transitions.observations
+    for layer, (weights, biases) in enumerate(zip(learner.weights, learner.biases)):
+        layer_input = layer_input @ weights.T + biases
+        if layer < len(learner.weights) - 1:
+            layer_input = np.maximum(layer_input, 0)
+    errors = layer_input[np.arange(len(targets)), transitions.actions] - targets
+    quadratic = np.minimum(np.abs(errors), learner.huber_delta)
+    linear = np.abs(errors) - quadratic
+    return np.mean(0.5 * quadratic**2 + learner.huber_delta * linear)
+
+
+def test_q_learner_gradients():
+    rng = np.random.default_rng(0)
+    learner = QLearner([4, 8, 8, 3], learning_rate=0.0, dtype=np.float64, seed=0)
+    learner.biases[0] += 0.1
+    transitions = generate_transitions(rng, 16)
+    loss, td_errors = learner.train_step(transitions)
+
+    # targets are treated as constants, recover them from the td errors
+    q_values = learner.q_values(transitions.observations)
+    targets = q_values[np.arange(16), transitions.actions] - td_errors
+    assert np.isclose(loss, naive_loss(learner, transitions, targets))
+
+    # compare the backward pass with finite differences
+    epsilon = 1e-6
+    for parameter, gradient in zip(
+        learner.weights + learner.biases, learner._gradients
+    ):
+        numeric = np.zeros_like(parameter)
+        for index in np.ndindex(parameter.shape):
+            original = parameter[index]
+            parameter[index] = original + epsilon
+            loss_plus = naive_loss(learner, transitions, targets)
+            parameter[index] = original - epsilon
+            loss_minus = naive_loss(learner, transitions, targets)
+            parameter[index] = original
+            numeric[index] = (loss_plus - loss_minus) / (2 * epsilon)
+        assert np.allclose(gradient, numeric, atol=1e-6)
+
+
+def test_q_learner_double_dqn_targets():
+    rng = np.random.default_rng(1)
+    learner = QLearner([4, 16, 3], learning_rate=0.0, gamma=0.9, seed=1)
+    transitions = generate_transitions(rng, 32)
+    learner.target_weights[-1] *= 2
+
+    # the online network selects the next actions, the target network evaluates them
+    next_actions = learner.q_values(transitions.next_observations).argmax(axis=1)
+    target_q_values = (
+        np.maximum(transitions.next_observations @ learner.target_weights[0].T, 0)
+        @ learner.target_weights[1].T
+    )
+    expected_targets = transitions.rewards + 0.9 * ~transitions.dones * (
+        target_q_values[np.arange(32), next_actions]
+    )
+    _, td_errors = learner.train_step(transitions)
+    q_values = learner.q_values(transitions.observations)
+    targets = q_values[np.arange(32), transitions.actions] - td_errors
+    assert np.allclose(targets, expected_targets, atol=1e-5)
+
+
+def test_q_learner_fits_rewards():
+    rng = np.random.default_rng(2)
+    learner = QLearner([4, 32, 3], learning_rate=1e-2, seed=2)
+    transitions = generate_transitions(rng, 64)
+    transitions = transitions._replace(dones=np.ones(64, dtype=bool))
+
+    # with terminal transitions the Q-values regress onto the rewards
+    first_loss, _ = learner.train_step(transitions)
+    buffers = learner._buffers[64]
+    for _ in range(500):
+        loss, _ = learner.train_step(transitions)
+    assert loss < first_loss / 10
+    assert learner._buffers[64] is buffers
+
+
+def naive_n_step_targets(history, n, gamma):
+    # walk each lane's recorded steps forward from every stored transition
+    targets = {}
+    for steps in history:
+        for start, (index, _, _) in enumerate(steps):
+            total = 0.0
+            for step, (step_index, reward, done) in enumerate(steps[start : start + n]):
+                total += gamma**step * reward
+                if done:
+                    break
+            discount = 0.0 if done else gamma ** (step + 1)
+            targets[index] = (total, step_index, done, discount)
+    return targets
+
+
+def test_n_step_targets():
+    rng = np.random.default_rng(3)
+    lanes, capacity = 4, 40
+    replay_buffer = ReplayBuffer(capacity, observation_shape=(1,))
+    history = [[] for _ in range(lanes)]
+
+    # fill partially, then past the capacity of the ring
+    for steps in (6, 20):
+        for _ in range(steps):
+            rewards = rng.normal(size=lanes)
+            dones = rng.random(lanes) < 0.15
+            indices = replay_buffer.add(
+                np.zeros((lanes, 1)),
+                np.zeros(lanes),
+                rewards,
+                np.zeros((lanes, 1)),
+                dones,
+            )
+            for lane, index in enumerate(indices):
+                history[lane].append((index, rewards[lane], dones[lane]))
+
+        indices = rng.permutation(len(replay_buffer))
+        for n in (1, 3, 5):
+            targets = n_step_targets(
+                indices,
+                replay_buffer.rewards,
+                replay_buffer.dones,
+                replay_buffer.position,
+                n,
+                0.9,
+                stride=lanes,
+            )
+            expected = naive_n_step_targets(history, n, 0.9)
+            expected = [np.array(values) for values in zip(*map(expected.get, indices))]
+            assert np.allclose(targets.rewards, expected[0])
+            assert (targets.bootstrap_indices == expected[1]).all()
+            assert (targets.dones == expected[2]).all()
+            assert np.allclose(targets.discounts, expected[3])
+
+
+def test_n_step_transitions_frame_stack():
+    rng = np.random.default_rng(4)
+    lanes = 2
+    replay_buffer = FrameStackReplayBuffer(
+        capacity=20 * lanes, lanes=lanes, frame_shape=(1,), stack_size=2
+    )
+    for step in range(30):
+        replay_buffer.add(
+            np.full((lanes, 1), step + 1),
+            np.zeros(lanes),
+            np.ones(lanes),
+            rng.random(lanes) < 0.2,
+        )
+
+    indices = replay_buffer.sample_indices(200, rng)
+    transitions, discounts = n_step_transitions(
+        replay_buffer, indices, 3, 0.5, stride=lanes
+    )
+
+    # bootstrapped next observations are never past the newest frame
+    assert 0 < transitions.next_observations.max() <= 30
+    assert ((discounts == 0) == transitions.dones).all()
+
+    # rewards are all 1, so a bootstrapped m-step return is 2 * (1 - 0.5^m)
+    bootstrapped = discounts > 0
+    assert np.allclose(
+        transitions.rewards[bootstrapped], 2 * (1 - discounts[bootstrapped])
+    )
+    assert (transitions.next_observations[~bootstrapped] == 0).all()
@@ -0,0 +1,223 @@
+import numpy as np
+
+from structs import (
+    FrameStackReplayBuffer,
+    PrioritizedReplayBuffer,
+    ReplayBuffer,
+    SharedTransitionRing,
+    SharedWeights,
+    SumTree,
+)
+
+
+def test_replay_buffer_add_and_wrap():
+    replay_buffer = ReplayBuffer(capacity=10, observation_shape=(3,))
+    assert replay_buffer.nbytes == ReplayBuffer.required_bytes(10, (3,))
+
+    # batches of 4 transitions, like a vector environment with 4 environments
+    for step in range(4):
+        observations = np.full((4, 3), step, dtype=np.float32)
+        replay_buffer.add(
+            observations,
+            np.arange(4),
+            np.full(4, step),
+            observations + 1,
+            np.zeros(4, dtype=bool),
+        )
+
+    # 16 transitions were added, the first 6 were overwritten
+    assert len(replay_buffer) == 10
+    assert replay_buffer.position == 6
+    assert sorted(replay_buffer.rewards.tolist()) == [1, 1, 2, 2, 2, 2, 3, 3, 3, 3]
+    assert (replay_buffer.next_observations - replay_buffer.observations == 1).all()
+
+    # single transitions don't need a batch dimension
+    index = replay_buffer.add(np.ones(3), 2, 5.0, np.ones(3), True)
+    assert index.tolist() == [6]
+    assert replay_buffer.dones[6] and replay_buffer.rewards[6] == 5.0
+
+
+def test_replay_buffer_sample():
+    replay_buffer = ReplayBuffer(capacity=100, observation_shape=(2,))
+    replay_buffer.add(
+        np.arange(60).reshape(30, 2),
+        np.arange(30),
+        np.arange(30),
+        np.arange(60).reshape(30, 2),
+        np.zeros(30),
+    )
+    transitions = replay_buffer.sample(64, np.random.default_rng(0))
+    assert transitions.observations.shape == (64, 2)
+    assert transitions.actions.shape == (64,)
+
+    # only stored transitions are sampled, and fields stay aligned
+    assert transitions.actions.max() < 30
+    assert (transitions.observations[:, 0] == 2 * transitions.actions).all()
+    assert (transitions.rewards == transitions.actions).all()
+
+
+def test_sum_tree():
+    rng = np.random.default_rng(0)
+    sum_tree = SumTree(capacity=13)
+    priorities = rng.random(13)
+    sum_tree.update(np.arange(13), priorities)
+
+    # duplicate leaves keep their last priority
+    sum_tree.update(np.array([3, 3, 7]), np.array([5.0, 0.5, 0.0]))
+    priorities[[3, 7]] = [0.5, 0.0]
+    assert np.isclose(sum_tree.total, priorities.sum())
+    assert sum_tree.min == priorities.min()
+
+    # find agrees with searching the cumulative sum
+    values = rng.random(1000) * priorities.sum()
+    expected = np.searchsorted(np.cumsum(priorities), values, side="right")
+    assert (sum_tree.find(values) == expected).all()
+    assert 7 not in sum_tree.find(values)
+
+
+def test_prioritized_replay_buffer():
+    rng = np.random.default_rng(0)
+    replay_buffer = PrioritizedReplayBuffer(
+        capacity=8, observation_shape=(1,), alpha=1.0
+    )
+    replay_buffer.add(
+        np.arange(8), np.arange(8), np.zeros(8), np.arange(8), np.zeros(8)
+    )
+    replay_buffer.update_priorities(
+        np.arange(8), np.arange(1, 9) - replay_buffer.epsilon
+    )
+
+    # transitions are sampled proportionally to their priority
+    sample = replay_buffer.sample(36_000, rng, beta=1.0)
+    frequencies = np.bincount(sample.indices, minlength=8) / 36_000
+    assert np.allclose(frequencies, np.arange(1, 9) / 36, atol=0.01)
+    assert (sample.transitions.actions == sample.indices).all()
+
+    # importance sampling weights are normalized by the lowest priority
+    assert np.allclose(sample.weights, 1.0 / (sample.indices + 1))
+
+    # new transitions get the largest priority
+    replay_buffer.add(0, 0, 0, 0, 0)
+    assert np.isclose(replay_buffer.priorities[0], 8.0)
+
+
+def test_frame_stack_replay_buffer():
+    rng = np.random.default_rng(0)
+    lanes, stack_size, steps = 3, 4, 50
+    replay_buffer = FrameStackReplayBuffer(
+        capacity=30 * lanes, lanes=lanes, frame_shape=(2,), stack_size=stack_size
+    )
+
+    # frame values are unique, episode lengths are random
+    episodes = [[[]] for _ in range(lanes)]
+    transitions = {}
+    for step in range(steps):
+        frames = (step * lanes + np.arange(lanes) + 1)[:, None].repeat(2, 1)
+        dones = rng.random(lanes) < 0.2
+        indices = replay_buffer.add(frames, np.arange(lanes), frames[:, 0], dones)
+        for lane, index in enumerate(indices):
+            episode = episodes[lane][-1]
+            episode.append(frames[lane])
+            transitions[step, lane] = (index, list(episode), bool(dones[lane]))
+            if dones[lane]:
+                episodes[lane].append([])
+
+    def naive_stack(episode_frames):
+        stack = np.zeros((stack_size, 2), dtype=np.uint8)
+        recent_frames = episode_frames[-stack_size:]
+        stack[stack_size - len(recent_frames) :] = recent_frames
+        return stack
+
+    # compare every sampleable transition with the episode it was recorded in
+    index_to_step = {
+        index: (step, lane)
+        for (step, lane), (index, _, _) in transitions.items()
+        if step >= steps - 30
+    }
+    sampled = replay_buffer.sample_indices(500, rng)
+    batch = replay_buffer.transitions(sampled)
+    for index, observation, next_observation, done in zip(
+        sampled, batch.observations, batch.next_observations, batch.dones
+    ):
+        step, lane = index_to_step[index]
+        _, episode_frames, expected_done = transitions[step, lane]
+        assert step < steps - 1
+        assert done == expected_done
+        assert (observation == naive_stack(episode_frames)).all()
+        if done:
+            assert (next_observation == 0).all()
+        else:
+            assert (
+                next_observation == naive_stack(transitions[step + 1, lane][1])
+            ).all()
+
+    # every frame is stored once
+    assert replay_buffer.frames.nbytes == 30 * lanes * 2
+
+
+def test_shared_transition_ring():
+    writer = SharedTransitionRing(capacity=8, observation_shape=(2,))
+    reader = SharedTransitionRing(capacity=8, observation_shape=(2,), name=writer.name)
+    replay_buffer = ReplayBuffer(capacity=100, observation_shape=(2,))
+
+    def push(first, amount):
+        steps = np.arange(first, first + amount)
+        writer.push(
+            steps[:, None].repeat(2, 1), steps, steps, steps[:, None] + 1, steps % 2
+        )
+
+    push(0, 5)
+    assert reader.pull(replay_buffer) == 5
+    assert reader.pull(replay_buffer) == 0
+
+    # a reader that falls behind only gets the newest capacity transitions
+    push(5, 4)
+    push(9, 7)
+    assert reader.pull(replay_buffer) == 8
+    assert replay_buffer.actions[:13].tolist() == [0, 1, 2, 3, 4, *range(8, 16)]
+    assert (
+        replay_buffer.next_observations[:13, 0] == replay_buffer.actions[:13] + 1
+    ).all()
+
+    # transitions overwritten while the reader copies them are dropped
+    copy_transitions = reader._copy_transitions
+
+    def copy_while_pushing(indices):
+        transitions = copy_transitions(indices)
+        push(22, 5)
+        return transitions
+
+    push(16, 6)
+    reader._copy_transitions = copy_while_pushing
+    assert reader.pull(replay_buffer) == 3
+    assert replay_buffer.actions[13:16].tolist() == [19, 20, 21]
+    del reader._copy_transitions
+    assert reader.pull(replay_buffer) == 5
+    assert replay_buffer.actions[16:21].tolist() == list(range(22, 27))
+    assert (
+        replay_buffer.next_observations[:21, 0] == replay_buffer.actions[:21] + 1
+    ).all()
+
+    reader.close()
+    writer.close()
+    writer.unlink()
+
+
+def test_shared_weights():
+    writer = SharedWeights([(3, 2), (3,)])
+    reader = SharedWeights([(3, 2), (3,)], name=writer.name)
+    parameters = [np.zeros((3, 2), dtype=np.float32), np.zeros(3, dtype=np.float32)]
+
+    writer.publish([np.ones((3, 2)), np.arange(3)])
+    version = reader.pull(parameters)
+    assert version == 2
+    assert (parameters[0] == 1).all() and parameters[1].tolist() == [0, 1, 2]
+
+    # parameters are only copied when a newer version was published
+    parameters[0][:] = 5
+    assert reader.pull(parameters, version) == version
+    assert (parameters[0] == 5).all()
+
+    reader.close()
+    writer.close()
+    writer.unlink()
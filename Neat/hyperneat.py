@@ -0,0 +1,312 @@
+"""
+HyperNEAT, NEAT genomes are evolved as CPPNs that paint the weights of a large
+substrate network from the coordinates of its nodes
+"""
+
+from typing import List
+
+import numpy as np
+
+from logics import (
+    _get_episode_rewards,
+    _sigmoid,
+    _sparse_module,
+    compile_networks,
+    feed_forward_compiled,
+)
+from structs import (
+    DEFAULT_DTYPE_POLICY,
+    BaseNodes,
+    ConnectionDirections,
+    ConnectionStates,
+    ConnectionWeights,
+    DTypePolicy,
+    Environments,
+    Substrate,
+    SubstrateNetworks,
+)
+
+# CPPN outputs below this magnitude don't express a connection
+WEIGHT_THRESHOLD = 0.2
+
+# expressed CPPN outputs are scaled to weights of at most this magnitude
+MAX_WEIGHT = 3.0
+
+
+def grid_substrate(layer_sizes: List[int]) -> Substrate:
+    """place the nodes of each layer evenly on a horizontal line, layers are stacked
+    from y = -1 (inputs) to y = 1 (outputs)
+
+    Arguments:
+        layer_sizes {List[int]} -- amount of nodes in each layer, from inputs to outputs
+
+    Returns:
+        Substrate -- 2d substrate
+    """
+    return Substrate(
+        [
+            np.stack(
+                [
+                    np.linspace(-1, 1, layer_size) if layer_size > 1 else np.zeros(1),
+                    np.full(layer_size, y),
+                ],
+                axis=1,
+            )
+            for layer_size, y in zip(layer_sizes, np.linspace(-1, 1, len(layer_sizes)))
+        ]
+    )
+
+
+def cppn_base_nodes(
+    substrate: Substrate, dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY
+) -> BaseNodes:
+    """base nodes of the CPPNs of a substrate, the inputs are the coordinates of the
+    source and the destination node of a query and the outputs are the connection
+    weight and the destination bias
+
+    Arguments:
+        substrate {Substrate} -- substrate the CPPNs are queried over
+
+    Keyword Arguments:
+        dtype_policy {DTypePolicy} -- dtype of the node ids (default: {DEFAULT_DTYPE_POLICY})
+
+    Returns:
+        BaseNodes -- input, output and bias nodes of the CPPNs
+    """
+    input_amount = 2 * substrate.layer_coordinates[0].shape[1]
+    return BaseNodes(
+        np.arange(input_amount, dtype=dtype_policy.nodes),
+        np.arange(input_amount, input_amount + 2, dtype=dtype_policy.nodes),
+    )
+
+
+def _express(
+    cppn_outputs: np.ndarray, weight_threshold: float, max_weight: float
+) -> np.ndarray:
+    """helper function that maps sigmoid CPPN outputs to weights, outputs close to 0.5
+    aren't expressed and the rest is scaled to [-max_weight, max_weight]
+
+    Arguments:
+        cppn_outputs {np.ndarray} -- CPPN outputs in (0, 1)
+        weight_threshold {float} -- smallest expressed magnitude of 2 * output - 1
+        max_weight {float} -- magnitude of the largest weight
+
+    Returns:
+        np.ndarray -- weights
+    """
+    centered = 2 * cppn_outputs - 1
+    magnitudes = np.maximum(np.abs(centered) - weight_threshold, 0)
+    return np.sign(centered) * magnitudes / (1 - weight_threshold) * max_weight
+
+
+def build_substrate_networks(
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+    base_nodes: BaseNodes,
+    substrate: Substrate,
+    weight_threshold: float = WEIGHT_THRESHOLD,
+    max_weight: float = MAX_WEIGHT,
+    backend: str = "dense",
+    cppn_backend: str = "auto",
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+) -> SubstrateNetworks:
+    """query the CPPN of every genome for every connection and bias of the substrate
+
+    All CPPNs are compiled together and every query of every CPPN is answered by one
+    batched feed_forward_compiled call, so the cost of a generation doesn't grow with
+    the amount of genomes in Python.
+
+    Arguments:
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each CPPN
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each CPPN
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each CPPN
+        base_nodes {BaseNodes} -- CPPN base nodes, see cppn_base_nodes
+        substrate {Substrate} -- substrate to generate networks on
+
+    Keyword Arguments:
+        weight_threshold {float} -- smallest expressed CPPN output magnitude (default: {WEIGHT_THRESHOLD})
+        max_weight {float} -- magnitude of the largest weight (default: {MAX_WEIGHT})
+        backend {str} -- "dense" or "sparse" substrate weights (default: {"dense"})
+        cppn_backend {str} -- evaluation backend passed to compile_networks (default: {"auto"})
+        dtype_policy {DTypePolicy} -- dtype to evaluate the networks in (default: {DEFAULT_DTYPE_POLICY})
+
+    Returns:
+        SubstrateNetworks -- weights and biases of the substrate network of each genome
+    """
+    networks_amount = len(networks_connection_directions)
+    layer_coordinates = substrate.layer_coordinates
+
+    # every (source, destination) pair between consecutive layers, followed by one bias
+    # query (zero source) for every non input node
+    connection_queries = [
+        np.concatenate(
+            [
+                np.repeat(sources, destinations.shape[0], axis=0),
+                np.tile(destinations, (sources.shape[0], 1)),
+            ],
+            axis=1,
+        )
+        for sources, destinations in zip(layer_coordinates, layer_coordinates[1:])
+    ]
+    bias_destinations = np.concatenate(layer_coordinates[1:])
+    queries = np.concatenate(
+        connection_queries
+        + [
+            np.concatenate(
+                [np.zeros_like(bias_destinations), bias_destinations], axis=1
+            )
+        ]
+    )
+
+    compiled_networks = compile_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        cppn_backend,
+        dtype_policy,
+    )
+    cppn_outputs = feed_forward_compiled(
+        np.broadcast_to(
+            queries[:, None].astype(dtype_policy.weights),
+            (queries.shape[0], networks_amount, queries.shape[1]),
+        ),
+        compiled_networks,
+    )
+    weights = _express(cppn_outputs[..., 0], weight_threshold, max_weight)
+    biases = _express(cppn_outputs[..., 1], weight_threshold, max_weight)
+
+    layer_weights = []
+    layer_biases = []
+    query_start = 0
+    bias_start = sum(query.shape[0] for query in connection_queries)
+    for sources, destinations in zip(layer_coordinates, layer_coordinates[1:]):
+        source_amount, destination_amount = sources.shape[0], destinations.shape[0]
+
+        # queries are ordered source major, weights are stored (networks, out, in)
+        dense_weights = (
+            weights[query_start : query_start + source_amount * destination_amount]
+            .reshape(source_amount, destination_amount, networks_amount)
+            .transpose(2, 1, 0)
+        )
+        query_start += source_amount * destination_amount
+        if backend == "sparse":
+            sparse = _sparse_module()
+            if sparse is None:
+                raise ImportError("the sparse backend requires scipy")
+            layer_weights.append(sparse.block_diag(list(dense_weights), format="csr"))
+        elif backend == "dense":
+            layer_weights.append(np.ascontiguousarray(dense_weights))
+        else:
+            raise ValueError(f"unknown backend {backend}")
+
+        layer_biases.append(
+            np.ascontiguousarray(biases[bias_start : bias_start + destination_amount].T)
+        )
+        bias_start += destination_amount
+
+    return SubstrateNetworks(layer_weights, layer_biases, backend)
+
+
+def feed_forward_substrate(
+    inputs: np.ndarray, substrate_networks: SubstrateNetworks
+) -> np.ndarray:
+    """calculate the output of substrate networks layer by layer, the same way the
+    NeuroEvolution agents are stacked
+
+    Arguments:
+        inputs {np.ndarray} -- inputs of each network, shaped (networks, inputs) or
+                               (batch, networks, inputs)
+        substrate_networks {SubstrateNetworks} -- networks to evaluate
+
+    Returns:
+        np.ndarray -- outputs of each network, shaped like inputs
+    """
+    inputs = np.asarray(inputs)
+    batched = inputs.ndim == 3
+    networks_amount = substrate_networks.layer_biases[0].shape[0]
+    values = inputs.reshape(-1, networks_amount, inputs.shape[-1])
+
+    for layer_weights, layer_biases in zip(
+        substrate_networks.layer_weights, substrate_networks.layer_biases
+    ):
+        if substrate_networks.backend == "sparse":
+            weighted_sums = (
+                layer_weights @ values.reshape(values.shape[0], -1).T
+            ).T.reshape(values.shape[0], networks_amount, -1)
+        else:
+            weighted_sums = np.einsum("noi,bni->bno", layer_weights, values)
+        values = _sigmoid(weighted_sums + layer_biases)
+
+    return values if batched else values[0]
+
+
+def evaluate_substrate_networks(
+    environments: Environments,
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+    base_nodes: BaseNodes,
+    substrate: Substrate,
+    max_steps: int,
+    episodes: int,
+    score_exponent: int = 1,
+    weight_threshold: float = WEIGHT_THRESHOLD,
+    max_weight: float = MAX_WEIGHT,
+    backend: str = "dense",
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+    episode_seeds: np.ndarray = None,
+) -> np.ndarray:
+    """calculate the average episode reward of the substrate network of each CPPN
+
+    Arguments:
+        environments {Environments} -- gym environments
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each CPPN
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each CPPN
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each CPPN
+        base_nodes {BaseNodes} -- CPPN base nodes, see cppn_base_nodes
+        substrate {Substrate} -- substrate to generate networks on
+        max_steps {int} -- step limit for each episode
+        episodes {int} -- number of episodes to test each network
+
+    Keyword Arguments:
+        weight_threshold {float} -- smallest expressed CPPN output magnitude (default: {WEIGHT_THRESHOLD})
+        max_weight {float} -- magnitude of the largest weight (default: {MAX_WEIGHT})
+        backend {str} -- "dense" or "sparse" substrate weights (default: {"dense"})
+        dtype_policy {DTypePolicy} -- dtype to evaluate the networks in (default: {DEFAULT_DTYPE_POLICY})
+        episode_seeds {np.ndarray} -- reset seed of each episode (default: {None, unseeded episodes})
+
+    Returns:
+        np.ndarray -- average network rewards over n episodes
+    """
+    if episode_seeds is None:
+        episode_seeds = [None] * episodes
+
+    substrate_networks = build_substrate_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        substrate,
+        weight_threshold,
+        max_weight,
+        backend,
+        dtype_policy=dtype_policy,
+    )
+    return (
+        np.average(
+            [
+                _get_episode_rewards(
+                    environments,
+                    max_steps,
+                    substrate_networks,
+                    seed=seed,
+                    forward=feed_forward_substrate,
+                )
+                for seed in episode_seeds
+            ],
+            axis=0,
+        )
+        ** score_exponent
+    )
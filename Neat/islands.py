@@ -0,0 +1,228 @@
+"""
+Island model NEAT, sub-populations evolve in their own processes and periodically send
+their best networks to the next island of a ring
+"""
+
+import os
+import threading
+from multiprocessing import Pool
+from multiprocessing.managers import BaseManager
+from queue import Empty, Queue
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from main import (
+    CROSSOVER_PARAMETERS,
+    ENVIRONMENT_NAME,
+    GENERATIONS,
+    GENETIC_DISTANCE_PARAMETERS,
+    MUTATION_PARAMETERS,
+    NETWORK_AMOUNT,
+    training_loop,
+)
+from structs import ConnectionDirections, ConnectionStates, ConnectionWeights
+
+# amount of islands, each evolves NETWORK_AMOUNT networks in its own process
+ISLAND_AMOUNT = os.cpu_count()
+
+# every MIGRATION_INTERVAL generations each island sends its MIGRANT_AMOUNT best
+# networks to the next island, which replaces its worst networks with them
+MIGRATION_INTERVAL = 10
+MIGRANT_AMOUNT = 2
+
+SEED = 0
+
+
+class InnovationRegistry:
+    """
+    innovation numbers shared by all islands, hosted by a RegistryManager server
+    process. islands only ask it for connections and splits they haven't seen, so
+    calls are rare once the islands' histories fill up
+    """
+
+    def __init__(self):
+        self.connection_innovations: Dict[Tuple[int, int], int] = {}
+        self.node_innovations: Dict[Tuple[int, int], int] = {}
+        self.lock = threading.Lock()
+
+    def register_connections(self, connections: List[Tuple[int, int]]) -> List[int]:
+        """
+        innovation number of each connection, new connections get the next numbers
+        """
+        with self.lock:
+            for connection in connections:
+                if connection not in self.connection_innovations:
+                    self.connection_innovations[connection] = len(
+                        self.connection_innovations
+                    )
+            return [
+                self.connection_innovations[connection] for connection in connections
+            ]
+
+    def register_node(
+        self, split_connection: Tuple[int, int], first_node_id: int
+    ) -> int:
+        """
+        node number of the node splitting a connection, new splits get the next number
+        """
+        with self.lock:
+            if split_connection not in self.node_innovations:
+                self.node_innovations[split_connection] = first_node_id + len(
+                    self.node_innovations
+                )
+            return self.node_innovations[split_connection]
+
+
+class RegistryManager(BaseManager):
+    pass
+
+
+RegistryManager.register("InnovationRegistry", InnovationRegistry)
+RegistryManager.register("Queue", Queue)
+
+
+def _migration(inbox: Any, outbox: Any, migration_interval: int, migrant_amount: int):
+    """
+    migration callback of an island. migrants are sent without waiting for the next
+    island and received migrants are used when they have arrived, so islands never
+    wait for each other. returns the networks and scores with the migrants swapped
+    in and the indices of the replaced networks, or None
+    """
+
+    def migrate(
+        generation: int,
+        networks_connection_directions: List[ConnectionDirections],
+        networks_connection_weights: List[ConnectionWeights],
+        networks_connection_states: List[ConnectionStates],
+        networks_scores: np.ndarray,
+    ):
+        if (generation + 1) % migration_interval:
+            return None
+
+        ranking = np.argsort(networks_scores)
+        outbox.put(
+            [
+                (
+                    networks_connection_directions[network].directions,
+                    networks_connection_weights[network].weights,
+                    networks_connection_states[network].states,
+                    networks_scores[network],
+                    networks_connection_directions[network].activations,
+                )
+                for network in ranking[-migrant_amount:]
+            ]
+        )
+
+        migrants = []
+        while True:
+            try:
+                migrants += inbox.get_nowait()
+            except Empty:
+                break
+        if not migrants:
+            return None
+
+        # the newest migrants replace the worst networks
+        migrants = migrants[-min(len(migrants), len(ranking)) :]
+        networks_connection_directions = list(networks_connection_directions)
+        networks_connection_weights = list(networks_connection_weights)
+        networks_connection_states = list(networks_connection_states)
+        networks_scores = np.array(networks_scores, dtype=float)
+        for network, (directions, weights, states, score, activations) in zip(
+            ranking, migrants
+        ):
+            networks_connection_directions[network] = ConnectionDirections(
+                directions, activations
+            )
+            networks_connection_weights[network] = ConnectionWeights(weights)
+            networks_connection_states[network] = ConnectionStates(states)
+            networks_scores[network] = score
+        return (
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            networks_scores,
+            ranking[: len(migrants)],
+        )
+
+    return migrate
+
+
+def run_island(
+    island: int,
+    queues: List[Any],
+    registry: Any,
+    migration_interval: int,
+    migrant_amount: int,
+    seed: int,
+    training_parameters: Dict[str, Any],
+) -> Tuple[List[float], List[float]]:
+    """
+    evolve one island, returns the average and max score of each generation
+    """
+    # NEAT draws from the global numpy generator, every island needs its own stream
+    np.random.seed(seed + island)
+    return training_loop(
+        **training_parameters,
+        innovation_registry=registry,
+        migration=_migration(
+            queues[island],
+            queues[(island + 1) % len(queues)],
+            migration_interval,
+            migrant_amount,
+        ),
+        draw_networks=False,
+        verbose=False,
+    )
+
+
+def island_training_loop(
+    island_amount: int,
+    migration_interval: int,
+    migrant_amount: int,
+    seed: int = SEED,
+    **training_parameters: Any,
+) -> List[Tuple[List[float], List[float]]]:
+    """
+    evolve islands in parallel processes sharing one innovation registry, the
+    training parameters are passed to main.training_loop. returns the average and max
+    score of each generation of each island
+    """
+    with RegistryManager() as manager, Pool(island_amount) as pool:
+        registry = manager.InnovationRegistry()
+        queues = [manager.Queue() for _ in range(island_amount)]
+        return pool.starmap(
+            run_island,
+            [
+                (
+                    island,
+                    queues,
+                    registry,
+                    migration_interval,
+                    migrant_amount,
+                    seed,
+                    training_parameters,
+                )
+                for island in range(island_amount)
+            ],
+        )
+
+
+if __name__ == "__main__":
+    island_results = island_training_loop(
+        ISLAND_AMOUNT,
+        MIGRATION_INTERVAL,
+        MIGRANT_AMOUNT,
+        environment_name=ENVIRONMENT_NAME,
+        network_amount=NETWORK_AMOUNT,
+        generations=GENERATIONS,
+        genetic_distance_parameters=GENETIC_DISTANCE_PARAMETERS,
+        mutation_parameters=MUTATION_PARAMETERS,
+        crossover_parameters=CROSSOVER_PARAMETERS,
+    )
+    for island, (average_scores, max_scores) in enumerate(island_results):
+        print(
+            f"island {island}: best score {max(max_scores)}, "
+            f"final average score {average_scores[-1]}"
+        )
@@ -0,0 +1,117 @@
+"""
+Exercises serve.py with concurrent clients sending random observations, reports the
+throughput and latencies seen by the clients and the metrics of the server
+"""
+
+import asyncio
+import json
+import time
+from typing import List
+
+import numpy as np
+
+from serve import HOST, PORT, UNIX_SOCKET, encode_http_message, read_http_message
+
+# amount of concurrent clients, each keeps one connection and one request in flight
+CLIENTS = 64
+DURATION = 5.0
+SEED = 0
+
+
+async def _request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    method: str,
+    path: str,
+    body: dict = None,
+) -> dict:
+    writer.write(
+        encode_http_message(
+            f"{method} {path} HTTP/1.1",
+            json.dumps(body).encode() if body is not None else b"",
+            headers=f"Host: {HOST}\r\n",
+        )
+    )
+    await writer.drain()
+    start_line, response = await read_http_message(reader)
+    if not start_line.startswith("HTTP/1.1 200"):
+        raise RuntimeError(f"{start_line}: {response.decode()}")
+    return json.loads(response)
+
+
+async def _connect(host: str, port: int, unix_socket: str = None):
+    if unix_socket:
+        return await asyncio.open_unix_connection(unix_socket)
+    return await asyncio.open_connection(host, port)
+
+
+async def _client(
+    host: str,
+    port: int,
+    unix_socket: str,
+    input_size: int,
+    deadline: float,
+    rng: np.random.Generator,
+    latencies: List[float],
+):
+    reader, writer = await _connect(host, port, unix_socket)
+    try:
+        while time.perf_counter() < deadline:
+            observation = rng.normal(size=input_size).tolist()
+            start = time.perf_counter()
+            await _request(reader, writer, "POST", "/act", {"observation": observation})
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def generate_load(
+    clients: int = CLIENTS,
+    duration: float = DURATION,
+    host: str = HOST,
+    port: int = PORT,
+    unix_socket: str = UNIX_SOCKET,
+    seed: int = SEED,
+) -> dict:
+    """
+    run clients against a server for duration seconds, returns the client side
+    throughput and latency percentiles in milliseconds, and the server metrics
+    """
+    reader, writer = await _connect(host, port, unix_socket)
+    input_size = (await _request(reader, writer, "GET", "/metrics"))["input_size"]
+
+    latencies = []
+    rngs = [np.random.default_rng(seed + client) for client in range(clients)]
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _client(
+                host,
+                port,
+                unix_socket,
+                input_size,
+                start + duration,
+                rng,
+                latencies,
+            )
+            for rng in rngs
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    server_metrics = await _request(reader, writer, "GET", "/metrics")
+    writer.close()
+    await writer.wait_closed()
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": latencies.size,
+        "requests_per_second": latencies.size / elapsed,
+        "client_latency_p50_ms": float(np.percentile(latencies, 50)),
+        "client_latency_p99_ms": float(np.percentile(latencies, 99)),
+        "server": server_metrics,
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(asyncio.run(generate_load()), indent=4))
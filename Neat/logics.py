@@ -1,24 +1,68 @@
 """
 Contains all logical operations to that are needed to transform the data
 """
-from typing import List, Dict, Tuple
+
+import os
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, List, Dict, Tuple
 
 import numpy as np
-import gym
-from gym import spaces
 from itertools import cycle
+from multiprocessing.pool import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+# gym and scipy are imported by the functions that use them so importing this module
+# only loads numpy
+if TYPE_CHECKING:
+    from gym import spaces
 
+from policy import write_frozen_policy
 from structs import (
+    DEFAULT_DTYPE_POLICY,
     BaseNodes,
+    CompiledNetworks,
     ConnectionDirections,
     ConnectionInnovationsMap,
     ConnectionWeights,
     ConnectionStates,
     ConnectionDirections,
+    DTypePolicy,
     Environments,
+    GenomeSummary,
     NodeInnovationsMap,
+    SharedPopulation,
+    Species,
+    SpeciesHints,
 )
 
+# networks with fewer enabled connections than this are evaluated edge by edge
+SCALAR_BACKEND_MAX_CONNECTIONS = 16
+
+# layers denser than this are evaluated as dense matrices instead of csr matrices
+DENSE_BACKEND_MIN_DENSITY = 0.1
+
+# amount of bits in the connection fingerprint of a genome summary
+FINGERPRINT_SIZE = 256
+
+# environments of pool workers by environment id, kept between generations
+_worker_environments: Dict[str, List[Any]] = {}
+
+# activation functions of nodes, an activation gene holds an index into this tuple and
+# nodes without a gene use the first one. the names match policy.ACTIVATIONS
+ACTIVATION_FUNCTIONS = ("sigmoid", "tanh", "relu", "identity", "gaussian")
+
+
+@lru_cache(maxsize=None)
+def _sparse_module() -> Any:
+    """
+    scipy.sparse, or None when scipy isn't installed (the sparse backend is optional)
+    """
+    try:
+        from scipy import sparse
+    except ImportError:
+        return None
+    return sparse
+
 
 def feed_forward(
     inputs: np.ndarray,
@@ -60,6 +104,97 @@ def _activation_function(x: float) -> float:
     return 1.0 / (1.0 + np.exp(-x))
 
 
+def _sigmoid(x: np.ndarray, dtype: type = None) -> np.ndarray:
+    """
+    vectorized sigmoid computed in place on a single new array, evaluated in dtype
+    when it is given (np.float32 approximates float64 inputs faster)
+    """
+    values = np.negative(x, dtype=dtype or x.dtype)
+    np.exp(values, out=values)
+    values += 1
+    np.reciprocal(values, out=values)
+    return values.astype(x.dtype, copy=False)
+
+
+def _apply_activation(
+    activation: int, x: np.ndarray, sigmoid_dtype: type = None
+) -> np.ndarray:
+    """helper function that applies one activation function to an array
+
+    Arguments:
+        activation {int} -- index of the activation in ACTIVATION_FUNCTIONS
+        x {np.ndarray} -- weighted sums
+
+    Keyword Arguments:
+        sigmoid_dtype {type} -- dtype to evaluate sigmoids in (default: {None, the dtype of x})
+
+    Returns:
+        np.ndarray -- activated values
+    """
+    name = ACTIVATION_FUNCTIONS[activation]
+    if name == "sigmoid":
+        return _sigmoid(x, sigmoid_dtype)
+    if name == "tanh":
+        return np.tanh(x)
+    if name == "relu":
+        return np.maximum(x, 0)
+    if name == "identity":
+        return x
+    values = np.square(x)
+    np.negative(values, out=values)
+    np.exp(values, out=values)
+    return values
+
+
+def _activate(
+    weighted_sums: np.ndarray,
+    activation_ranges: List[Tuple[int, int, int]] = None,
+    sigmoid_dtype: type = None,
+) -> np.ndarray:
+    """helper function that activates the rows of a layer, each group of rows sharing an
+    activation is activated by one vectorized call on a slice
+
+    Arguments:
+        weighted_sums {np.ndarray} -- (rows, batch) weighted sums of a layer
+
+    Keyword Arguments:
+        activation_ranges {List[Tuple[int, int, int]]} -- (activation, start, stop) row
+            range of each group (default: {None, every row uses the sigmoid})
+        sigmoid_dtype {type} -- dtype to evaluate sigmoids in (default: {None})
+
+    Returns:
+        np.ndarray -- activated rows
+    """
+    if activation_ranges is None:
+        return _sigmoid(weighted_sums, sigmoid_dtype)
+    if len(activation_ranges) == 1:
+        return _apply_activation(activation_ranges[0][0], weighted_sums, sigmoid_dtype)
+
+    values = np.empty_like(weighted_sums)
+    for activation, start, stop in activation_ranges:
+        values[start:stop] = _apply_activation(
+            activation, weighted_sums[start:stop], sigmoid_dtype
+        )
+    return values
+
+
+def _node_activation(connection_directions: ConnectionDirections, node_id: int) -> int:
+    """helper function to get the activation gene of a node
+
+    Arguments:
+        connection_directions {ConnectionDirections} -- connections and activation genes
+        node_id {int} -- id of the node
+
+    Returns:
+        int -- index of the node's activation in ACTIVATION_FUNCTIONS
+    """
+    activations = connection_directions.activations
+    if activations is None:
+        return 0
+    genes = activations[activations[:, 0] == node_id]
+    return int(genes[-1, 1]) if genes.size else 0
+
+
 def _get_node_output(
     node_id: int,
     inputs: np.ndarray,
@@ -92,47 +227,537 @@ def _get_node_output(
     if node_id == base_nodes.bias_node:
         return 1.0
 
+    # weighted sum of the outputs of all nodes outputing into node
+    weighted_sum = np.sum(
+        [
+            _get_node_output(
+                connection_src,
+                inputs,
+                connection_directions,
+                connection_weights,
+                connection_states,
+                base_nodes,
+                ignore_connections
+                + [
+                    (connection_src, connection_dst,)
+                ],  # mark connection as to-ignore
+            )
+            * connection_weight  # weight the output
+            for (
+                connection_src,
+                connection_dst,
+            ), connection_weight, connection_state in zip(
+                connection_directions.directions,
+                connection_weights.weights,
+                connection_states.states,
+            )
+            if (
+                connection_dst == node_id  # get connections outputing into node
+                and (connection_src, connection_dst,)
+                not in ignore_connections  # ignore accounted for connections
+                and connection_state  # ignore disabled connections
+            )
+        ]
+    )
+
     # since input nodes don't have properties, the node_properties_index is offset by
     # the input node amount
-    return _activation_function(  # activation function of node
-        np.sum(  # weighted sum of the outputs of all nodes outputing into node
-            [
-                _get_node_output(
-                    connection_src,
-                    inputs,
+    return _apply_activation(  # activation function of node
+        _node_activation(connection_directions, node_id), np.atleast_1d(weighted_sum)
+    )[0]
+
+
+def compile_networks(
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+    base_nodes: BaseNodes,
+    backend: str = "auto",
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+) -> CompiledNetworks:
+    """flatten networks into evaluation layers so they can be evaluated together
+
+    Each node is placed one layer after the deepest node outputing into it, so every
+    layer only depends on previous layers. Recurrent connections (connections leading
+    back into a node that is still being resolved) can't be layered, networks with
+    one are kept aside and evaluated by feed_forward in feed_forward_compiled, so the
+    result is identical to feed_forward for every network. The rows of each layer are
+    ordered by activation gene, so every activation is applied once per layer.
+
+    Arguments:
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each network
+        base_nodes {BaseNodes} -- input, output and bias nodes
+
+    Keyword Arguments:
+        backend {str} -- "dense", "sparse", "scalar" or "auto" to choose by density (default: {"auto"})
+        dtype_policy {DTypePolicy} -- dtype to evaluate the networks in (default: {DEFAULT_DTYPE_POLICY})
+
+    Returns:
+        CompiledNetworks -- all networks flattened into shared evaluation layers
+    """
+    input_amount = base_nodes.input_nodes.size
+    networks_amount = len(networks_connection_directions)
+
+    node_amount = 0
+    input_slots = []
+    bias_slots = []
+    output_slots = []
+
+    # (depth, slot, activation) of every compiled node and (depth, source slot,
+    # destination slot, weight) of every compiled connection
+    node_depths: List[Tuple[int, int, int]] = []
+    connection_depths: List[Tuple[int, int, int, float]] = []
+    recurrent_networks = []
+
+    for network_index, (
+        connection_directions,
+        connection_weights,
+        connection_states,
+    ) in enumerate(
+        zip(
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+        )
+    ):
+
+        # each network starts with its input and bias slots
+        network_slots = {
+            int(node_id): node_amount + index
+            for index, node_id in enumerate(base_nodes.input_nodes)
+        }
+        network_slots[int(base_nodes.bias_node)] = node_amount + input_amount
+        input_slots.append(np.arange(node_amount, node_amount + input_amount))
+        bias_slots.append(node_amount + input_amount)
+        node_amount += input_amount + 1
+
+        # activation genes of the network, nodes without one use the sigmoid
+        network_activations: Dict[int, int] = {}
+        if connection_directions.activations is not None:
+            network_activations = {
+                int(node_id): int(activation)
+                for node_id, activation in connection_directions.activations
+            }
+
+        # group enabled connections by destination node
+        incoming_connections: Dict[int, List[Tuple[int, float]]] = {}
+        for (source, destination), weight, state in zip(
+            connection_directions.directions,
+            connection_weights.weights,
+            connection_states.states,
+        ):
+            if state:
+                incoming_connections.setdefault(int(destination), []).append(
+                    (int(source), weight)
+                )
+
+        # depth first search from the output nodes, on_stack marks nodes that are
+        # still being resolved
+        depths = {node_id: 0 for node_id in network_slots}
+        on_stack = set()
+        recurrent = False
+        for output_node in base_nodes.output_nodes:
+            stack = [(int(output_node), 0)]
+            while stack:
+                node_id, connection_index = stack.pop()
+                if node_id in depths and connection_index == 0:
+                    continue
+                on_stack.add(node_id)
+                node_connections = incoming_connections.get(node_id, [])
+
+                # resolve the next unresolved source node first
+                while connection_index < len(node_connections):
+                    source = node_connections[connection_index][0]
+                    if source not in depths and source not in on_stack:
+                        break
+                    connection_index += 1
+                if connection_index < len(node_connections):
+                    stack.append((node_id, connection_index))
+                    stack.append((node_connections[connection_index][0], 0))
+                    continue
+
+                # all sources are resolved, recurrent connections have no depth
+                on_stack.remove(node_id)
+                recurrent |= any(source not in depths for source, _ in node_connections)
+                depths[node_id] = 1 + max(
+                    [
+                        depths[source]
+                        for source, _ in node_connections
+                        if source in depths
+                    ],
+                    default=0,
+                )
+                network_slots[node_id] = node_amount
+                node_depths.append(
+                    (depths[node_id], node_amount, network_activations.get(node_id, 0))
+                )
+                node_amount += 1
+
+                for source, weight in node_connections:
+                    if depths.get(source, depths[node_id]) < depths[node_id]:
+                        connection_depths.append(
+                            (
+                                depths[node_id],
+                                network_slots[source],
+                                network_slots[node_id],
+                                weight,
+                            )
+                        )
+
+        output_slots.append(
+            np.array(
+                [network_slots[int(node_id)] for node_id in base_nodes.output_nodes]
+            )
+        )
+        if recurrent:
+            recurrent_networks.append(
+                (
+                    network_index,
                     connection_directions,
                     connection_weights,
                     connection_states,
-                    base_nodes,
-                    ignore_connections
-                    + [
-                        (connection_src, connection_dst,)
-                    ],  # mark connection as to-ignore
-                )
-                * connection_weight  # weight the output
-                for (
-                    connection_src,
-                    connection_dst,
-                ), connection_weight, connection_state in zip(
-                    connection_directions.directions,
-                    connection_weights.weights,
-                    connection_states.states,
                 )
-                if (
-                    connection_dst == node_id  # get connections outputing into node
-                    and (connection_src, connection_dst,)
-                    not in ignore_connections  # ignore accounted for connections
-                    and connection_state  # ignore disabled connections
+            )
+
+    # group nodes and connections into layers by depth
+    layer_amount = max([depth for depth, _, _ in node_depths], default=0)
+    layer_rows = [[] for _ in range(layer_amount)]
+    layer_row_activations = [[] for _ in range(layer_amount)]
+    layer_connections = [[] for _ in range(layer_amount)]
+    for depth, slot, activation in node_depths:
+        layer_rows[depth - 1].append(slot)
+        layer_row_activations[depth - 1].append(activation)
+    for depth, source_slot, destination_slot, weight in connection_depths:
+        layer_connections[depth - 1].append((source_slot, destination_slot, weight))
+
+    layer_columns = []
+    layer_connection_arrays = []
+    layer_activations = []
+    for layer, (rows, row_activations, connections) in enumerate(
+        zip(layer_rows, layer_row_activations, layer_connections)
+    ):
+        connection_values = np.array(connections, dtype=float).reshape(-1, 3)
+        columns, column_positions = np.unique(
+            connection_values[:, 0].astype(int), return_inverse=True
+        )
+
+        # slots are assigned in increasing order, so rows are sorted before they are
+        # grouped by activation
+        row_order = np.argsort(row_activations, kind="stable")
+        row_positions = np.argsort(row_order)[
+            np.searchsorted(rows, connection_values[:, 1].astype(int))
+        ]
+        layer_rows[layer] = np.array(rows, dtype=int)[row_order]
+        row_activations = np.array(row_activations, dtype=int)[row_order]
+        group_starts = np.flatnonzero(np.diff(row_activations, prepend=-1))
+        layer_activations.append(
+            [
+                (int(row_activations[start]), int(start), int(stop))
+                for start, stop in zip(
+                    group_starts, np.append(group_starts[1:], row_activations.size)
                 )
             ]
         )
+        layer_columns.append(columns)
+        layer_connection_arrays.append(
+            (
+                row_positions,
+                column_positions,
+                connection_values[:, 2].astype(dtype_policy.weights),
+            )
+        )
+
+    # measure density to pick an evaluation backend
+    connection_amount = len(connection_depths)
+    dense_size = sum(
+        len(rows) * columns.size for rows, columns in zip(layer_rows, layer_columns)
+    )
+    if backend == "auto":
+        if connection_amount < SCALAR_BACKEND_MAX_CONNECTIONS:
+            backend = "scalar"
+        elif (
+            _sparse_module() is None
+            or connection_amount / max(dense_size, 1) >= DENSE_BACKEND_MIN_DENSITY
+        ):
+            backend = "dense"
+        else:
+            backend = "sparse"
+
+    layer_weights = [
+        _build_layer_weights(len(rows), columns.size, connections, backend)
+        for rows, columns, connections in zip(
+            layer_rows, layer_columns, layer_connection_arrays
+        )
+    ]
+
+    return CompiledNetworks(
+        node_amount,
+        np.array(input_slots, dtype=int).reshape(networks_amount, input_amount),
+        np.array(bias_slots, dtype=int),
+        np.array(output_slots, dtype=int).reshape(networks_amount, -1),
+        [np.array(rows, dtype=int) for rows in layer_rows],
+        layer_columns,
+        layer_weights,
+        backend,
+        dtype_policy.weights,
+        layer_activations,
+        dtype_policy.sigmoid,
+        recurrent_networks,
+        base_nodes,
+    )
+
+
+def _build_layer_weights(
+    row_amount: int,
+    column_amount: int,
+    connections: Tuple[np.ndarray, np.ndarray, np.ndarray],
+    backend: str,
+) -> Any:
+    """helper function to store the connections of a layer for a backend
+
+    Arguments:
+        row_amount {int} -- amount of nodes in layer
+        column_amount {int} -- amount of nodes outputing into layer
+        connections {Tuple[np.ndarray, np.ndarray, np.ndarray]} -- row, column and weight of each connection
+        backend {str} -- "dense", "sparse" or "scalar"
+
+    Returns:
+        Any -- dense matrix, csr matrix or the connections themselves for "scalar"
+    """
+    row_positions, column_positions, weights = connections
+    if backend == "scalar":
+        return connections
+
+    if backend == "sparse":
+        sparse = _sparse_module()
+        if sparse is None:
+            raise ImportError("the sparse backend requires scipy")
+        return sparse.csr_matrix(
+            (weights, (row_positions, column_positions)),
+            shape=(row_amount, column_amount),
+        )
+
+    if backend == "dense":
+        layer_weights = np.zeros((row_amount, column_amount), dtype=weights.dtype)
+        np.add.at(layer_weights, (row_positions, column_positions), weights)
+        return layer_weights
+
+    raise ValueError(f"unknown backend {backend}")
+
+
+def feed_forward_compiled(
+    inputs: np.ndarray, compiled_networks: CompiledNetworks
+) -> np.ndarray:
+    """calculate the output of compiled networks layer by layer
+
+    Arguments:
+        inputs {np.ndarray} -- inputs of each network, shaped (networks, inputs) or
+                               (batch, networks, inputs)
+        compiled_networks {CompiledNetworks} -- networks to evaluate
+
+    Returns:
+        np.ndarray -- outputs of each network, shaped like inputs
+    """
+    inputs = np.asarray(inputs)
+    batched = inputs.ndim == 3
+    networks_amount, input_amount = compiled_networks.input_slots.shape
+    inputs = inputs.reshape(-1, networks_amount * input_amount)
+
+    # each column holds the values of all nodes for one batch entry
+    values = np.zeros(
+        (compiled_networks.node_amount, inputs.shape[0]), dtype=compiled_networks.dtype
+    )
+    values[compiled_networks.input_slots.ravel()] = inputs.T
+    values[compiled_networks.bias_slots] = 1.0
+
+    layer_activations = compiled_networks.layer_activations or [None] * len(
+        compiled_networks.layer_rows
+    )
+    for rows, columns, layer_weights, activation_ranges in zip(
+        compiled_networks.layer_rows,
+        compiled_networks.layer_columns,
+        compiled_networks.layer_weights,
+        layer_activations,
+    ):
+        layer_inputs = values[columns]
+        if compiled_networks.backend == "scalar":
+            weighted_sums = np.zeros(
+                (rows.size, layer_inputs.shape[1]), dtype=compiled_networks.dtype
+            )
+            for row, column, weight in zip(*layer_weights):
+                weighted_sums[row] += weight * layer_inputs[column]
+        else:
+            weighted_sums = layer_weights @ layer_inputs
+        values[rows] = _activate(
+            weighted_sums, activation_ranges, compiled_networks.sigmoid_dtype
+        )
+
+    outputs = values[compiled_networks.output_slots.ravel()].T.reshape(
+        -1, networks_amount, compiled_networks.output_slots.shape[1]
     )
 
+    # recurrent networks weren't layered, they are evaluated one input at a time
+    network_inputs = inputs.reshape(-1, networks_amount, input_amount)
+    for (
+        network_index,
+        connection_directions,
+        connection_weights,
+        connection_states,
+    ) in compiled_networks.recurrent_networks:
+        for batch_index, batch_inputs in enumerate(network_inputs[:, network_index]):
+            outputs[batch_index, network_index] = feed_forward(
+                batch_inputs,
+                connection_directions,
+                connection_weights,
+                connection_states,
+                compiled_networks.base_nodes,
+            )
+    return outputs if batched else outputs[0]
+
 
-def transform_network_output_discrete(network_output: np.ndarray) -> spaces.Discrete:
+def transform_network_output_discrete(network_output: np.ndarray) -> "spaces.Discrete":
     return np.argmax(network_output)
 
 
+def save_champion(
+    path: str,
+    connection_directions: ConnectionDirections,
+    connection_weights: ConnectionWeights,
+    connection_states: ConnectionStates,
+    base_nodes: BaseNodes,
+):
+    """save a network with its base nodes so it can be served without the population
+
+    Arguments:
+        path {str} -- .npz file to write
+        connection_directions {ConnectionDirections} -- directions of the network connections
+        connection_weights {ConnectionWeights} -- weights of the network connections
+        connection_states {ConnectionStates} -- states of the network connections
+        base_nodes {BaseNodes} -- input, output and bias nodes
+    """
+    np.savez(
+        path,
+        kind="neat",
+        directions=connection_directions.directions,
+        weights=connection_weights.weights,
+        states=connection_states.states,
+        activations=np.zeros((0, 2), dtype=int)
+        if connection_directions.activations is None
+        else connection_directions.activations,
+        input_nodes=base_nodes.input_nodes,
+        output_nodes=base_nodes.output_nodes,
+        bias_node=base_nodes.bias_node,
+    )
+
+
+def load_champion(
+    path: str,
+) -> Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates, BaseNodes]:
+    """load a network saved by save_champion
+
+    Arguments:
+        path {str} -- .npz file to read
+
+    Returns:
+        Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates, BaseNodes] -- the network and its base nodes
+    """
+    with np.load(path) as champion:
+        if str(champion["kind"]) != "neat":
+            raise ValueError(f"{path} is not a NEAT champion")
+        # champions saved before activation genes existed only have sigmoids
+        activations = (
+            champion["activations"] if "activations" in champion.files else None
+        )
+        return (
+            ConnectionDirections(
+                champion["directions"],
+                activations if activations is not None and activations.size else None,
+            ),
+            ConnectionWeights(champion["weights"]),
+            ConnectionStates(champion["states"]),
+            BaseNodes(
+                champion["input_nodes"],
+                champion["output_nodes"],
+                int(champion["bias_node"]),
+            ),
+        )
+
+
+def freeze_neat(
+    path: str,
+    connection_directions: ConnectionDirections,
+    connection_weights: ConnectionWeights,
+    connection_states: ConnectionStates,
+    base_nodes: BaseNodes,
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+):
+    """write a network as a frozen policy file that policy.py evaluates without NEAT
+
+    The network is compiled once and its layers are stored as dense matrices in
+    evaluation order, a layer with several activations is stored as one layer per
+    activation. Networks with recurrent connections can't be layered and raise a
+    ValueError.
+
+    Arguments:
+        path {str} -- .npy policy file to write
+        connection_directions {ConnectionDirections} -- directions of the network connections
+        connection_weights {ConnectionWeights} -- weights of the network connections
+        connection_states {ConnectionStates} -- states of the network connections
+        base_nodes {BaseNodes} -- input, output and bias nodes
+
+    Keyword Arguments:
+        dtype_policy {DTypePolicy} -- dtype of the stored weights (default: {DEFAULT_DTYPE_POLICY})
+    """
+    compiled_networks = compile_networks(
+        [connection_directions],
+        [connection_weights],
+        [connection_states],
+        base_nodes,
+        "dense",
+        dtype_policy,
+    )
+    if compiled_networks.recurrent_networks:
+        raise ValueError("recurrent networks can't be frozen")
+    write_frozen_policy(
+        path,
+        "neat",
+        compiled_networks.node_amount,
+        compiled_networks.input_slots[0],
+        compiled_networks.bias_slots[0],
+        compiled_networks.output_slots[0],
+        [
+            (
+                rows[start:stop],
+                columns,
+                layer_weights[start:stop],
+                ACTIVATION_FUNCTIONS[activation],
+            )
+            for rows, columns, layer_weights, activation_ranges in zip(
+                compiled_networks.layer_rows,
+                compiled_networks.layer_columns,
+                compiled_networks.layer_weights,
+                compiled_networks.layer_activations,
+            )
+            for activation, start, stop in activation_ranges
+        ],
+    )
+
+
+def draw_episode_seeds(rng: np.random.Generator, episodes: int) -> np.ndarray:
+    """draw the reset seeds of a generation's episodes
+
+    Arguments:
+        rng {np.random.Generator} -- random generator of the training run
+        episodes {int} -- amount of episodes
+
+    Returns:
+        np.ndarray -- seed of each episode
+    """
+    return rng.integers(2 ** 31 - 1, size=episodes)
+
+
 def evaluate_networks(
     environments: Environments,
     networks_connection_directions: List[ConnectionDirections],
@@ -143,6 +768,9 @@ def evaluate_networks(
     episodes: int,
     score_exponent: int = 1,
     render: bool = False,
+    backend: str = "auto",
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+    episode_seeds: np.ndarray = None,
 ) -> np.ndarray:
     """calculate the average episode reward for each network
 
@@ -157,101 +785,562 @@ def evaluate_networks(
 
     Keyword Arguments:
         render {bool} -- render episodes (default: {False})
+        backend {str} -- evaluation backend passed to compile_networks (default: {"auto"})
+        dtype_policy {DTypePolicy} -- dtype to evaluate the networks in (default: {DEFAULT_DTYPE_POLICY})
+        episode_seeds {np.ndarray} -- reset seed of each episode, every network plays
+                                      the same seeded starts (common random numbers)
+                                      (default: {None, unseeded episodes})
 
     Returns:
         np.ndarray -- average network rewards over n episodes
     """
+    if episode_seeds is None:
+        episode_seeds = [None] * episodes
+
+    # compile all networks once so each step is a single forward pass
+    compiled_networks = compile_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        backend,
+        dtype_policy,
+    )
     return (
-        np.array(
+        np.average(
             [
-                np.average(
-                    [
-                        _get_episode_reward(
-                            environment,
-                            max_steps,
-                            network_connections,
-                            network_connection_weights,
-                            network_connection_states,
-                            base_nodes,
-                            render,
-                        )
-                        for _ in range(episodes)
-                    ]
-                )
-                for (
-                    environment,
-                    network_connections,
-                    network_connection_weights,
-                    network_connection_states,
-                ) in zip(
-                    environments.environments,
-                    networks_connection_directions,
-                    networks_connection_weights,
-                    networks_connection_states,
+                _get_episode_rewards(
+                    environments, max_steps, compiled_networks, render, seed=seed
                 )
-            ]
+                for seed in episode_seeds
+            ],
+            axis=0,
         )
         ** score_exponent
     )
 
 
-def _get_episode_reward(
-    environment: gym.Env,
+def _get_episode_rewards(
+    environments: Environments,
     max_steps: int,
-    connection_directions: ConnectionDirections,
-    connection_weights: ConnectionWeights,
-    connection_states: ConnectionStates,
-    base_nodes: BaseNodes,
+    compiled_networks: CompiledNetworks,
     render: bool = False,
-) -> float:
-    """helper function that runs an episode and returns the episode rewards
+    step_counts: np.ndarray = None,
+    seed: int = None,
+    forward: Callable[[np.ndarray, Any], np.ndarray] = None,
+) -> np.ndarray:
+    """helper function that runs an episode for every network in its own environment,
+    stepping all environments together, and returns the episode rewards
+
+    Arguments:
+        environments {Environments} -- gym environment of each network
+        max_steps {int} -- limit of steps to take in episode
+        compiled_networks {CompiledNetworks} -- compiled networks
+
+    Keyword Arguments:
+        render {bool} -- render episodes (default: {False})
+        step_counts {np.ndarray} -- steps taken by each network are added to it (default: {None})
+        seed {int} -- reset every environment with this seed (default: {None})
+        forward {Callable[[np.ndarray, Any], np.ndarray]} -- evaluates the networks
+            for a (networks, inputs) observation batch, for networks that aren't
+            CompiledNetworks (default: {None, feed_forward_compiled})
+
+    Returns:
+        np.ndarray -- episode reward of each network
+    """
+    # reset environments, with a seed every network starts from the same state
+    episode_rewards = np.zeros(len(environments.environments))
+    observations = np.array(
+        [
+            environment.reset() if seed is None else environment.reset(seed=int(seed))
+            for environment in environments.environments
+        ]
+    )
+    done_environments = np.zeros(len(environments.environments), dtype=bool)
+    forward = forward or feed_forward_compiled
+
+    # play through simulation
+    for _ in range(max_steps):
+
+        networks_output = forward(observations, compiled_networks)
+        for environment_index, environment in enumerate(environments.environments):
+            if done_environments[environment_index]:
+                continue
+
+            action = transform_network_output_discrete(
+                networks_output[environment_index]
+            )
+            (
+                observations[environment_index],
+                reward,
+                done_environments[environment_index],
+                _,
+            ) = environment.step(action)
+
+            # debuging
+            if render:
+                environment.render()
+
+            episode_rewards[environment_index] += reward
+            if step_counts is not None:
+                step_counts[environment_index] += 1
+
+        if done_environments.all():
+            break
+
+    for environment in environments.environments:
+        environment.close()
+    return episode_rewards
+
+
+def evaluate_networks_racing(
+    environments: Environments,
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+    base_nodes: BaseNodes,
+    max_steps: int,
+    initial_episodes: int = 2,
+    max_episodes: int = 10,
+    cutoff_quantile: float = 0.8,
+    confidence_z: float = 1.96,
+    std_floor: float = 1.0,
+    step_budget: int = None,
+    score_exponent: int = 1,
+    backend: str = "auto",
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+    episode_seeds: np.ndarray = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """calculate the average episode reward for each network, spending extra episodes
+    only where they can change selection. every network plays initial_episodes, then
+    networks whose confidence interval contains the selection cutoff (the
+    cutoff_quantile of the average rewards) play one more episode per round, until no
+    interval contains the cutoff, they played max_episodes or step_budget steps were
+    taken in total. a network that stops racing doesn't race again, so the networks
+    of a round have all played the same episodes
+
+    Arguments:
+        environments {Environments} -- gym environment of each network
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each network
+        base_nodes {BaseNodes} -- input, output and bias nodes
+        max_steps {int} -- step limit for each episode
+
+    Keyword Arguments:
+        initial_episodes {int} -- episodes every network plays (default: {2})
+        max_episodes {int} -- episode limit of each network (default: {10})
+        cutoff_quantile {float} -- quantile of the average rewards networks race against (default: {0.8})
+        confidence_z {float} -- width of the confidence intervals in standard errors (default: {1.96})
+        std_floor {float} -- lower bound of the reward standard deviations, networks with
+                             equal rewards in their first episodes aren't certain (default: {1.0})
+        step_budget {int} -- limit of the total steps of all networks (default: {no limit})
+        backend {str} -- evaluation backend passed to compile_networks (default: {"auto"})
+        dtype_policy {DTypePolicy} -- dtype to evaluate the networks in (default: {DEFAULT_DTYPE_POLICY})
+        episode_seeds {np.ndarray} -- reset seed of each of the max_episodes episodes, the
+                                      k-th episode of every network has the same start
+                                      (default: {None, unseeded episodes})
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- average network rewards and the amount of
+                                         episodes each network played
+    """
+    network_amount = len(networks_connection_directions)
+    reward_sums = np.zeros(network_amount)
+    reward_squares = np.zeros(network_amount)
+    episode_counts = np.zeros(network_amount, dtype=int)
+    step_counts = np.zeros(network_amount, dtype=int)
+    step_budget = np.inf if step_budget is None else step_budget
+
+    networks = np.arange(network_amount)
+    compiled_networks = compile_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        backend,
+        dtype_policy,
+    )
+    for episode in range(max_episodes):
+        episode_steps = np.zeros(networks.size, dtype=int)
+        rewards = _get_episode_rewards(
+            Environments(environments.environments[: networks.size]),
+            max_steps,
+            compiled_networks,
+            step_counts=episode_steps,
+            seed=None if episode_seeds is None else episode_seeds[episode],
+        )
+        reward_sums[networks] += rewards
+        reward_squares[networks] += rewards ** 2
+        episode_counts[networks] += 1
+        step_counts[networks] += episode_steps
+        if episode + 1 < initial_episodes:
+            continue
+        if step_counts.sum() >= step_budget:
+            break
+
+        # race the networks whose confidence interval contains the cutoff
+        means = reward_sums / episode_counts
+        variances = np.maximum(reward_squares / episode_counts - means ** 2, 0.0) * (
+            episode_counts / np.maximum(episode_counts - 1, 1)
+        )
+        variances = np.maximum(variances, std_floor ** 2)
+        half_widths = confidence_z * np.sqrt(variances / episode_counts)
+        cutoff = np.quantile(means, cutoff_quantile)
+        racing = (
+            (means - half_widths <= cutoff)
+            & (means + half_widths >= cutoff)
+            & (episode_counts < max_episodes)
+        )
+
+        # networks that stopped racing stay out, so episode seeds stay aligned
+        in_race = np.zeros(network_amount, dtype=bool)
+        in_race[networks] = True
+        networks = np.flatnonzero(racing & in_race)
+        if networks.size == 0:
+            break
+        compiled_networks = compile_networks(
+            [networks_connection_directions[network] for network in networks],
+            [networks_connection_weights[network] for network in networks],
+            [networks_connection_states[network] for network in networks],
+            base_nodes,
+            backend,
+            dtype_policy,
+        )
+
+    return (reward_sums / episode_counts) ** score_exponent, episode_counts
+
+
+def _shared_population_layout(
+    network_amount: int,
+    connection_amount: int,
+    dtype_policy: DTypePolicy,
+    activation_amount: int = 0,
+) -> Tuple[List[Tuple[Tuple[int, ...], type, int]], int]:
+    """shape, dtype and byte offset of the offsets, directions, weights, states,
+    activation offsets and activations arrays of a shared population, and the size of
+    the block
+
+    Arguments:
+        network_amount {int} -- amount of networks
+        connection_amount {int} -- amount of connections of all networks
+        dtype_policy {DTypePolicy} -- dtypes of the population arrays
+
+    Keyword Arguments:
+        activation_amount {int} -- amount of activation genes of all networks (default: {0})
+
+    Returns:
+        Tuple[List[Tuple[Tuple[int, ...], type, int]], int] -- array layouts and block size
+    """
+    layout = []
+    size = 0
+    for shape, dtype in (
+        ((network_amount + 1,), np.int64),
+        ((connection_amount, 2), dtype_policy.nodes),
+        ((connection_amount,), dtype_policy.weights),
+        ((connection_amount,), dtype_policy.states),
+        ((network_amount + 1,), np.int64),
+        ((activation_amount, 2), dtype_policy.nodes),
+    ):
+        layout.append((shape, dtype, size))
+
+        # keep every array 8 byte aligned
+        size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+    return layout, max(size, 8)
+
+
+def share_population(
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+) -> Tuple[SharedMemory, SharedPopulation]:
+    """write a population into a new shared memory block, concatenating the arrays of
+    all networks. the caller owns the block and has to close and unlink it
+
+    Arguments:
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each network
+
+    Keyword Arguments:
+        dtype_policy {DTypePolicy} -- dtypes of the shared arrays (default: {DEFAULT_DTYPE_POLICY})
+
+    Returns:
+        Tuple[SharedMemory, SharedPopulation] -- shared memory block and its handle
+    """
+    connection_amounts = [
+        connection_weights.weights.size
+        for connection_weights in networks_connection_weights
+    ]
+    networks_activations = [
+        np.zeros((0, 2), dtype=dtype_policy.nodes)
+        if connection_directions.activations is None
+        else connection_directions.activations
+        for connection_directions in networks_connection_directions
+    ]
+    network_amount = len(connection_amounts)
+    connection_amount = int(sum(connection_amounts))
+    activation_amount = sum(
+        network_activations.shape[0] for network_activations in networks_activations
+    )
+    layout, size = _shared_population_layout(
+        network_amount, connection_amount, dtype_policy, activation_amount
+    )
+    shared_memory = SharedMemory(create=True, size=size)
+    offsets, directions, weights, states, activation_offsets, activations = [
+        np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf, offset=offset)
+        for shape, dtype, offset in layout
+    ]
+
+    offsets[0] = 0
+    np.cumsum(connection_amounts, out=offsets[1:])
+    if connection_amount:
+        directions[:] = np.concatenate(
+            [
+                connection_directions.directions.reshape(-1, 2)
+                for connection_directions in networks_connection_directions
+            ]
+        )
+        weights[:] = np.concatenate(
+            [
+                connection_weights.weights
+                for connection_weights in networks_connection_weights
+            ]
+        )
+        states[:] = np.concatenate(
+            [
+                connection_states.states
+                for connection_states in networks_connection_states
+            ]
+        )
+    activation_offsets[0] = 0
+    np.cumsum(
+        [network_activations.shape[0] for network_activations in networks_activations],
+        out=activation_offsets[1:],
+    )
+    if activation_amount:
+        activations[:] = np.concatenate(networks_activations)
+    del offsets, directions, weights, states, activation_offsets, activations
+    return (
+        shared_memory,
+        SharedPopulation(
+            shared_memory.name,
+            network_amount,
+            connection_amount,
+            dtype_policy,
+            activation_amount,
+        ),
+    )
+
+
+def attach_population(
+    shared_population: SharedPopulation, start: int = 0, stop: int = None
+) -> Tuple[
+    SharedMemory,
+    List[ConnectionDirections],
+    List[ConnectionWeights],
+    List[ConnectionStates],
+]:
+    """map a shared population without copying it, the networks are views into the
+    block so they have to be released before the block is closed
+
+    Arguments:
+        shared_population {SharedPopulation} -- handle of the shared population
+
+    Keyword Arguments:
+        start {int} -- index of the first network to map (default: {0})
+        stop {int} -- index after the last network to map (default: {all networks})
+
+    Returns:
+        Tuple[SharedMemory, List[ConnectionDirections], List[ConnectionWeights], List[ConnectionStates]] --
+            shared memory block and the connections of each mapped network
+    """
+    shared_memory = SharedMemory(name=shared_population.name)
+    layout, _ = _shared_population_layout(
+        shared_population.network_amount,
+        shared_population.connection_amount,
+        shared_population.dtype_policy,
+        shared_population.activation_amount,
+    )
+    offsets, directions, weights, states, activation_offsets, activations = [
+        np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf, offset=offset)
+        for shape, dtype, offset in layout
+    ]
+
+    stop = shared_population.network_amount if stop is None else stop
+    networks = range(start, stop)
+    return (
+        shared_memory,
+        [
+            ConnectionDirections(
+                directions[offsets[index] : offsets[index + 1]],
+                activations[activation_offsets[index] : activation_offsets[index + 1]]
+                if shared_population.activation_amount
+                else None,
+            )
+            for index in networks
+        ],
+        [
+            ConnectionWeights(weights[offsets[index] : offsets[index + 1]])
+            for index in networks
+        ],
+        [
+            ConnectionStates(states[offsets[index] : offsets[index + 1]])
+            for index in networks
+        ],
+    )
+
+
+def evaluate_networks_parallel(
+    pool: Pool,
+    environment_name: str,
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+    base_nodes: BaseNodes,
+    max_steps: int,
+    episodes: int,
+    score_exponent: int = 1,
+    backend: str = "auto",
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+    chunks: int = None,
+    episode_seeds: np.ndarray = None,
+) -> np.ndarray:
+    """evaluate_networks split over the workers of a pool. the population is written
+    once into shared memory, workers map their slice of it and only the scores are
+    sent back
+
+    Arguments:
+        pool {Pool} -- worker pool
+        environment_name {str} -- gym environment id, every worker makes its own environments
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each network
+        base_nodes {BaseNodes} -- input, output and bias nodes
+        max_steps {int} -- step limit for each episode
+        episodes {int} -- number of episodes to test each network
+
+    Keyword Arguments:
+        backend {str} -- evaluation backend passed to compile_networks (default: {"auto"})
+        dtype_policy {DTypePolicy} -- dtype to share and evaluate the networks in (default: {DEFAULT_DTYPE_POLICY})
+        chunks {int} -- amount of slices to split the population into (default: {cpu count})
+        episode_seeds {np.ndarray} -- reset seed of each episode, sent to every worker so
+                                      all networks play the same starts (default: {None})
+
+    Returns:
+        np.ndarray -- average network rewards over n episodes
+    """
+    shared_memory, shared_population = share_population(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        dtype_policy,
+    )
+    chunks = chunks or os.cpu_count()
+    bounds = np.linspace(0, shared_population.network_amount, chunks + 1).astype(int)
+    try:
+        scores = pool.starmap(
+            _evaluate_shared_networks,
+            [
+                (
+                    shared_population,
+                    start,
+                    stop,
+                    environment_name,
+                    base_nodes,
+                    max_steps,
+                    episodes,
+                    score_exponent,
+                    backend,
+                    episode_seeds,
+                )
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ],
+        )
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+    return np.concatenate(scores)
 
-    Arguments:
-        environment {gym.Env} -- gym environment
-        max_steps {int} -- limit of steps to take in episode
-        connection_directions {ConnectionDirections} -- network connections
-        connection_data {ConnectionProperties} -- network connection data
-        base_nodes {BaseNodes} -- input, output and bias nodes
 
-    Returns:
-        float -- network episode reward
+def _evaluate_shared_networks(
+    shared_population: SharedPopulation,
+    start: int,
+    stop: int,
+    environment_name: str,
+    base_nodes: BaseNodes,
+    max_steps: int,
+    episodes: int,
+    score_exponent: int,
+    backend: str,
+    episode_seeds: np.ndarray = None,
+) -> np.ndarray:
+    """
+    worker side of evaluate_networks_parallel, evaluates the networks in [start, stop)
     """
-    # reset environment
-    episode_reward = 0
-    observation = environment.reset()
+    import gym
 
-    # play through simulation
-    for _ in range(max_steps):
+    environments = _worker_environments.setdefault(environment_name, [])
+    while len(environments) < stop - start:
+        environments.append(gym.make(environment_name))
 
-        network_output = feed_forward(
-            observation,
-            connection_directions,
-            connection_weights,
-            connection_states,
+    (
+        shared_memory,
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+    ) = attach_population(shared_population, start, stop)
+    try:
+        scores = evaluate_networks(
+            Environments(environments[: stop - start]),
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
             base_nodes,
+            max_steps,
+            episodes,
+            score_exponent,
+            backend=backend,
+            dtype_policy=shared_population.dtype_policy,
+            episode_seeds=episode_seeds,
         )
-        action = transform_network_output_discrete(network_output)
-        observation, reward, done, _ = environment.step(action)
-
-        # debuging
-        if render:
-            environment.render()
-            # print(
-            #     episode_reward,
-            #     action,
-            #     network_output,
-            #     connection_directions,
-            #     connection_weights,
-            #     connection_states,
-            # )
-
-        episode_reward += reward
-
-        if done:
-            break
+    finally:
+        # release the views before closing the block
+        del (
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+        )
+
+        # frames of a raised exception can still hold views, the block is then left
+        # to the garbage collector so the exception isn't masked
+        try:
+            shared_memory.close()
+        except BufferError:
+            pass
+    return scores
+
+
+def clear_species_hints(
+    species_hints: SpeciesHints, networks: np.ndarray
+) -> SpeciesHints:
+    """forget the hints of networks that weren't bred by new_generation, like migrants
+    that replaced networks, so split_into_species compares them with the species reps
+
+    Arguments:
+        species_hints {SpeciesHints} -- hints returned by new_generation
+        networks {np.ndarray} -- indices of the networks whose hints are cleared
 
-    environment.close()
-    return episode_reward
+    Returns:
+        SpeciesHints -- hints without a species or distance for the networks
+    """
+    hinted_species = np.array(species_hints.species, dtype=int)
+    distances = np.array(species_hints.distances, dtype=float)
+    hinted_species[networks] = -1
+    distances[networks] = np.nan
+    return SpeciesHints(hinted_species, distances)
 
 
 def split_into_species(
@@ -259,60 +1348,260 @@ def split_into_species(
     networks_connection_weights: List[ConnectionWeights],
     global_innovation_history: ConnectionInnovationsMap,
     genetic_distance_parameters: Dict[str, float],
-    previous_generation_species_reps: List[
-        Tuple[ConnectionDirections, ConnectionWeights]
-    ] = None,
-) -> Tuple[np.array, List[Tuple[ConnectionDirections, ConnectionWeights]]]:
+    previous_generation_species: List[Species] = None,
+    metrics: Dict[str, int] = None,
+    species_hints: SpeciesHints = None,
+) -> Tuple[np.array, List[Species]]:
     """assign a species to each network
 
+    Species reps whose genetic distance lower bound (see _genetic_distance_lower_bound)
+    already exceeds the threshold are skipped without calculating the genetic distance,
+    which doesn't change the assigned species.
+
+    When species hints are given, the species of the parent of a network is tested
+    before all other species, and a known distance under the threshold assigns the
+    network without any comparison.
+
     Arguments:
-        networks_connections {List[ConnectionDirections]} -- connections of each network
-        networks_connection_data {List[ConnectionProperties]} -- data of connections of each network
-        networks_nodes {List[Nodes]} -- nodes of each network
+        networks_connection_directions {List[ConnectionDirections]} -- connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        global_innovation_history {ConnectionInnovationsMap} -- connection innovation history
         genetic_distance_parameters {Dict[str, float]} -- hyperparameters for genetic distance
 
+    Keyword Arguments:
+        previous_generation_species {List[Species]} -- live species of the previous generation (default: {None})
+        metrics {Dict[str, int]} -- counts "comparisons" with species reps, and how many of
+                                    them were "pruned" or needed a full "distance", and
+                                    networks assigned to their "hinted" species (default: {None})
+        species_hints {SpeciesHints} -- hints returned by new_generation, indexing
+                                        previous_generation_species (default: {None})
+
     Returns:
-        np.array -- species of each network by index
+        Tuple[np.array, List[Species]] -- species of each network by index, and the species
     """
     genetic_distance_threshold = genetic_distance_parameters["threshold"]
-    species = []
+    networks_species = []
 
     # if no previous generation is available, generate species reps from current generation
-    species_reps: List[
-        Tuple[ConnectionDirections, ConnectionWeights]
-    ] = previous_generation_species_reps or []
-    for (network_connection_directions, network_connection_weights,) in zip(
-        networks_connection_directions, networks_connection_weights,
-    ):
+    species: List[Species] = list(previous_generation_species or [])
+    next_species_id = max(
+        (existing_species.species_id for existing_species in species), default=-1
+    ) + 1
+    species_summaries = [
+        _genome_summary(existing_species.rep_connection_directions)
+        for existing_species in species
+    ]
+    metrics = metrics if metrics is not None else {}
+    for key in ("comparisons", "pruned", "distances", "hinted"):
+        metrics.setdefault(key, 0)
+
+    previous_species_amount = len(species)
+    for network_index, (
+        network_connection_directions,
+        network_connection_weights,
+    ) in enumerate(zip(networks_connection_directions, networks_connection_weights)):
+        network_summary = _genome_summary(network_connection_directions)
+
+        # test the species of the network's parent first
+        species_order = range(len(species))
+        hinted_species = (
+            int(species_hints.species[network_index]) if species_hints else -1
+        )
+        if 0 <= hinted_species < previous_species_amount:
+            if species_hints.distances[network_index] < genetic_distance_threshold:
+                networks_species.append(hinted_species)
+                metrics["hinted"] += 1
+                continue
+            species_order = [hinted_species] + [
+                species_index
+                for species_index in species_order
+                if species_index != hinted_species
+            ]
 
         # check genetic distance to all species reps
-        for (
-            species_rep_index,
-            (rep_connection_directions, rep_connection_weights),
-        ) in enumerate(species_reps):
+        for species_index in species_order:
+            existing_species = species[species_index]
+            metrics["comparisons"] += 1
+            if (
+                _genetic_distance_lower_bound(
+                    network_summary,
+                    species_summaries[species_index],
+                    genetic_distance_parameters,
+                )
+                >= genetic_distance_threshold
+            ):
+                metrics["pruned"] += 1
+                continue
+
+            metrics["distances"] += 1
             if (
                 _genetic_distance(
                     network_connection_directions,
                     network_connection_weights,
-                    rep_connection_directions,
-                    rep_connection_weights,
+                    existing_species.rep_connection_directions,
+                    existing_species.rep_connection_weights,
                     global_innovation_history,
                     genetic_distance_parameters,
                 )
                 < genetic_distance_threshold
             ):
-                species.append(species_rep_index)
+                networks_species.append(species_index)
+                metrics["hinted"] += species_index == hinted_species
                 break
         else:
 
             # generate a new rep for new species when a network doesn't match any
             # other species rep
-            species.append(len(species_reps))
-            species_reps.append(
-                (network_connection_directions, network_connection_weights,)
+            networks_species.append(len(species))
+            species.append(
+                Species(
+                    next_species_id,
+                    network_connection_directions,
+                    network_connection_weights,
+                )
+            )
+            species_summaries.append(network_summary)
+            next_species_id += 1
+
+    return np.array(networks_species), species
+
+
+def update_species(
+    species: List[Species],
+    networks_species: np.ndarray,
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_scores: np.ndarray,
+    generation: int,
+) -> Tuple[List[Species], np.ndarray]:
+    """retire species without members and refresh the history and rep of the others,
+    the new rep of each species is its best scoring member
+
+    Arguments:
+        species {List[Species]} -- species returned by split_into_species
+        networks_species {np.ndarray} -- species of each network by index
+        networks_connection_directions {List[ConnectionDirections]} -- connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        networks_scores {np.ndarray} -- scores of each network
+        generation {int} -- current generation
+
+    Returns:
+        Tuple[List[Species], np.ndarray] -- live species, and species of each network by
+                                            index into the live species
+    """
+    member_amounts = np.bincount(networks_species, minlength=len(species))
+    networks = np.arange(networks_species.size)
+
+    live_species = []
+    for species_index, (existing_species, member_amount) in enumerate(
+        zip(species, member_amounts)
+    ):
+        if not member_amount:
+            continue
+
+        species_networks = networks[networks_species == species_index]
+        champion = int(species_networks[networks_scores[species_networks].argmax()])
+        champion_score = float(networks_scores[champion])
+        improved = champion_score > existing_species.best_score
+        live_species.append(
+            existing_species._replace(
+                rep_connection_directions=networks_connection_directions[champion],
+                rep_connection_weights=networks_connection_weights[champion],
+                age=existing_species.age + 1,
+                member_amount=int(member_amount),
+                best_score=max(champion_score, existing_species.best_score),
+                last_improvement_generation=(
+                    generation
+                    if improved
+                    else existing_species.last_improvement_generation
+                ),
             )
+        )
+
+    # live species keep their order, so indices only shift past retired species
+    live_species_indices = np.cumsum(member_amounts > 0) - 1
+    return live_species, live_species_indices[networks_species]
+
+
+def _genome_summary(connection_directions: ConnectionDirections) -> GenomeSummary:
+    """summarize a network for _genetic_distance_lower_bound
+
+    Arguments:
+        connection_directions {ConnectionDirections} -- connections of network
+
+    Returns:
+        GenomeSummary -- unique connection amount, largest node id and a fingerprint with
+                         one hashed bit per connection
+    """
+    unique_connections = np.unique(
+        connection_directions.directions.astype(np.int64).reshape(-1, 2), axis=0
+    )
+    fingerprint = np.zeros(FINGERPRINT_SIZE, dtype=bool)
+    fingerprint[
+        (unique_connections[:, 0] * 0x9E3779B1 ^ unique_connections[:, 1] * 0x85EBCA77)
+        % FINGERPRINT_SIZE
+    ] = True
+    return GenomeSummary(
+        unique_connections.shape[0],
+        int(unique_connections.max()) if unique_connections.size else 1,
+        fingerprint,
+    )
+
+
+def _genetic_distance_lower_bound(
+    network_a_summary: GenomeSummary,
+    network_b_summary: GenomeSummary,
+    genetic_distance_parameters: Dict[str, float],
+) -> float:
+    """a lower bound of the genetic distance between two networks
+
+    Every excess or disjoint connection is a connection of one network that is missing
+    in the other. A fingerprint bit set only in network a must come from such a
+    connection of network a (and vice-versa), and the difference in connection amounts
+    is the difference between the missing connection amounts of each network. The
+    weight and activation differences are never negative, so the smaller
+    excess/disjoint constant times the bounded missing connection amount can't exceed
+    the genetic distance.
 
-    return np.array(species), species_reps
+    Arguments:
+        network_a_summary {GenomeSummary} -- summary of network a
+        network_b_summary {GenomeSummary} -- summary of network b
+        genetic_distance_parameters {Dict[str, float]} -- hyperparameters for genetic distance
+
+    Returns:
+        float -- lower bound of _genetic_distance
+    """
+    only_a_bits = np.count_nonzero(
+        network_a_summary.fingerprint & ~network_b_summary.fingerprint
+    )
+    only_b_bits = np.count_nonzero(
+        network_b_summary.fingerprint & ~network_a_summary.fingerprint
+    )
+    size_difference = (
+        network_a_summary.connection_amount - network_b_summary.connection_amount
+    )
+    only_a_amount = max(only_a_bits, only_b_bits + size_difference, size_difference, 0)
+    uncommon_amount = 2 * only_a_amount - size_difference
+
+    # same normalization as _genetic_distance
+    if network_a_summary.connection_amount and network_b_summary.connection_amount:
+        largest_genome_size = max(network_a_summary.max_node, network_b_summary.max_node)
+    elif network_a_summary.connection_amount:
+        largest_genome_size = network_a_summary.max_node
+    elif network_b_summary.connection_amount:
+        largest_genome_size = network_b_summary.max_node
+    else:
+        largest_genome_size = 1
+
+    lower_bound = uncommon_amount * min(
+        genetic_distance_parameters["excess_constant"],
+        genetic_distance_parameters["disjoint_constant"],
+    )
+    if largest_genome_size >= genetic_distance_parameters["large_genome_size"]:
+        lower_bound /= largest_genome_size
+
+    # leave room for rounding differences with _genetic_distance
+    return lower_bound * (1.0 - 1e-9)
 
 
 def _genetic_distance(
@@ -325,6 +1614,10 @@ def _genetic_distance(
 ) -> float:
     """calculate the genetic distance between two networks
 
+    Besides the excess, disjoint and weight terms, the share of the nodes of both
+    networks whose activation genes differ is weighted by the optional
+    "activation_constant" (0 when it isn't given).
+
     Arguments:
         network_a_connection_directions {ConnectionDirections} -- connections of network a
         network_a_connection_weights {ConnectionWeights} -- weights of connections of network a
@@ -386,6 +1679,10 @@ def _genetic_distance(
     if np.isnan(weight_difference):
         weight_difference = 0
 
+    activation_difference = _activation_difference(
+        network_a_connection_directions, network_b_connection_directions
+    )
+
     # get disjoint and excess amounts
     a_disjoints = (
         (uncommon_connection_innovations_a < uncommon_connection_innovations_b.max())
@@ -404,6 +1701,7 @@ def _genetic_distance(
     c1 = genetic_distance_parameters["excess_constant"]
     c2 = genetic_distance_parameters["disjoint_constant"]
     c3 = genetic_distance_parameters["weight_bias_constant"]
+    c4 = genetic_distance_parameters.get("activation_constant", 0.0)
     large_genome_size = genetic_distance_parameters["large_genome_size"]
 
     if (
@@ -434,18 +1732,75 @@ def _genetic_distance(
     # don't normalize excess and disjoint difference in small genomes
     if largest_genome_size < large_genome_size:
         genetic_distance = (
-            c1 * excess_amount + c2 * disjoint_amount + c3 * (weight_difference)
+            c1 * excess_amount
+            + c2 * disjoint_amount
+            + c3 * (weight_difference)
+            + c4 * activation_difference
         )
     else:
         genetic_distance = (
             c1 * excess_amount / largest_genome_size
             + c2 * disjoint_amount / largest_genome_size
             + c3 * (weight_difference)
+            + c4 * activation_difference
         )
 
     return genetic_distance
 
 
+def _activation_difference(
+    network_a_connection_directions: ConnectionDirections,
+    network_b_connection_directions: ConnectionDirections,
+) -> float:
+    """helper function to get the share of the nodes of both networks whose activation
+    genes differ, nodes without a gene use the sigmoid
+
+    Arguments:
+        network_a_connection_directions {ConnectionDirections} -- connections and activation genes of network a
+        network_b_connection_directions {ConnectionDirections} -- connections and activation genes of network b
+
+    Returns:
+        float -- share of shared nodes with different activations
+    """
+    if (
+        network_a_connection_directions.activations is None
+        and network_b_connection_directions.activations is None
+    ):
+        return 0.0
+
+    shared_nodes = np.intersect1d(
+        network_a_connection_directions.directions,
+        network_b_connection_directions.directions,
+    )
+    if not shared_nodes.size:
+        return 0.0
+
+    # later genes of a node override earlier ones, like _node_activation
+    networks_activations = [
+        {
+            int(node_id): int(activation)
+            for node_id, activation in (
+                connection_directions.activations
+                if connection_directions.activations is not None
+                else []
+            )
+        }
+        for connection_directions in (
+            network_a_connection_directions,
+            network_b_connection_directions,
+        )
+    ]
+    return float(
+        np.average(
+            [
+                networks_activations[0].get(int(node_id), 0)
+                != networks_activations[1].get(int(node_id), 0)
+                for node_id in shared_nodes
+            ]
+        )
+    )
+
+
 def _get_common_connection_indices(
     network_a_connection_directions: ConnectionDirections,
     network_b_connection_directions: ConnectionDirections,
@@ -487,12 +1842,19 @@ def new_generation(
     genetic_distance_parameters: Dict[str, float],
     mutation_parameters: Dict[str, float],
     crossover_parameters: Dict[str, float],
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
 ) -> Tuple[
     List[ConnectionDirections],
     List[ConnectionWeights],
     List[ConnectionStates],
     ConnectionInnovationsMap,
+    SpeciesHints,
 ]:
+    """generate a new generation using crossover and mutation, every child carries a
+    hint of its parent's species (networks_species index) for split_into_species,
+    species champions that are copied as-is are known to be at distance 0 from their
+    species rep since update_species makes the champion the rep
+    """
 
     # normalize scores using species fitness sharing
     normalized_scores = _normalize_scores_by_species(networks_scores, networks_species)
@@ -505,6 +1867,8 @@ def new_generation(
     new_networks_connection_directions = []
     new_networks_connection_weights = []
     new_networks_connection_states = []
+    new_networks_species_hints = []
+    new_networks_distance_hints = []
 
     # generate a new network from two randomly chosen parents
     # with each parent being chosen according to its score
@@ -549,6 +1913,8 @@ def new_generation(
             new_networks_connection_states.append(
                 networks_connection_states[best_network]
             )
+            new_networks_species_hints.append(species)
+            new_networks_distance_hints.append(0.0)
 
         # get the probabilities for choosing each mate from this species
         species_probabilities: np.ndarray = normalized_scores[
@@ -608,12 +1974,14 @@ def new_generation(
                     networks_connection_states[parent_b],
                     genetic_distance_parameters,
                     crossover_parameters,
+                    dtype_policy,
                 )
             else:
 
                 # copy data from parent a with no crossover
                 new_network_connection_directions = ConnectionDirections(
-                    networks_connection_directions[parent_a].directions
+                    networks_connection_directions[parent_a].directions,
+                    networks_connection_directions[parent_a].activations,
                 )
                 new_network_connection_weights = ConnectionWeights(
                     networks_connection_weights[parent_a].weights
@@ -635,18 +2003,25 @@ def new_generation(
                 global_connection_innovation_history,
                 global_node_innovation_history,
                 mutation_parameters,
+                dtype_policy,
             )
 
             # add child to new population
             new_networks_connection_directions.append(new_network_connection_directions)
             new_networks_connection_weights.append(new_network_connection_weights)
             new_networks_connection_states.append(new_network_connection_states)
+            new_networks_species_hints.append(species)
+            new_networks_distance_hints.append(np.nan)
 
     return (
         new_networks_connection_directions,
         new_networks_connection_weights,
         new_networks_connection_states,
         global_connection_innovation_history,
+        SpeciesHints(
+            np.array(new_networks_species_hints, dtype=int),
+            np.array(new_networks_distance_hints),
+        ),
     )
 
 
@@ -659,6 +2034,7 @@ def _crossover(
     network_b_connection_states: ConnectionStates,
     genetic_distance_parameters: Dict[str, float],
     crossover_parameters: Dict[str, float],
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
 ) -> Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates]:
     """combine two networks to form a child network
 
@@ -671,6 +2047,9 @@ def _crossover(
         network_b_connection_states {ConnectionStates} -- ConnectionStates
         genetic_distance_parameters {Dict[str, float]} -- Dict[str, float]
 
+    Keyword Arguments:
+        dtype_policy {DTypePolicy} -- dtypes of the child network (default: {DEFAULT_DTYPE_POLICY})
+
     Returns:
         Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates] -- child network
     """
@@ -778,14 +2157,20 @@ def _crossover(
     )
 
     # generate child using inherited properties
-    child_connection_directions = ConnectionDirections(
-        np.concatenate(
-            (
-                inherited_common_connection_direction_values,
-                inherited_uncommon_connection_direction_values,
-            )
+    child_connection_direction_values = np.concatenate(
+        (
+            inherited_common_connection_direction_values,
+            inherited_uncommon_connection_direction_values,
         )
     )
+    child_connection_directions = ConnectionDirections(
+        child_connection_direction_values,
+        _inherit_activations(
+            network_a_connection_directions.activations,
+            network_b_connection_directions.activations,
+            child_connection_direction_values,
+        ),
+    )
     child_connection_weights = ConnectionWeights(
         np.concatenate(
             (
@@ -804,13 +2189,53 @@ def _crossover(
         )
     )
 
-    return (
+    return _apply_dtype_policy(
         child_connection_directions,
         child_connection_weights,
         child_connection_states,
+        dtype_policy,
     )
 
 
+def _inherit_activations(
+    activations_a: np.ndarray,
+    activations_b: np.ndarray,
+    child_connection_direction_values: np.ndarray,
+) -> np.ndarray:
+    """helper function that picks the activation genes of a crossover child, genes of
+    nodes only one parent has are inherited from it and genes both parents have are
+    inherited from either parent at random. nodes the child doesn't have lose their
+    genes
+
+    Arguments:
+        activations_a {np.ndarray} -- activation genes of parent a, or None
+        activations_b {np.ndarray} -- activation genes of parent b, or None
+        child_connection_direction_values {np.ndarray} -- connections of the child
+
+    Returns:
+        np.ndarray -- activation genes of the child, None when neither parent has any
+    """
+    if activations_a is None and activations_b is None:
+        return None
+
+    genes = {}
+    for node_id, activation in [] if activations_b is None else activations_b:
+        genes[int(node_id)] = int(activation)
+    for node_id, activation in [] if activations_a is None else activations_a:
+        if int(node_id) not in genes or np.random.random() < 0.5:
+            genes[int(node_id)] = int(activation)
+
+    child_nodes = set(np.unique(child_connection_direction_values).tolist())
+    return np.array(
+        [
+            [node_id, activation]
+            for node_id, activation in genes.items()
+            if node_id in child_nodes
+        ],
+        dtype=int,
+    ).reshape(-1, 2)
+
+
 def _mutate(
     network_connection_directions: ConnectionDirections,
     network_connection_weights: ConnectionWeights,
@@ -819,12 +2244,14 @@ def _mutate(
     global_connection_innovation_history: ConnectionInnovationsMap,
     global_node_innovation_history: NodeInnovationsMap,
     mutation_parameters: Dict[str, float],
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
 ) -> Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates]:
     """mutate a network:
        - pertrube weight
        - randomize weight
        - add connection
        - split connection
+       - change the activation of a node
 
     Arguments:
         network_connection_directions {ConnectionDirections} -- ConnectionDirections
@@ -834,6 +2261,9 @@ def _mutate(
         global_connection_innovation_history {ConnectionInnovationsMap} -- ConnectionInnovationsMap
         mutation_parameters {Dict[str, float]} -- odds of each mutation occuring
 
+    Keyword Arguments:
+        dtype_policy {DTypePolicy} -- dtypes of the mutated network (default: {DEFAULT_DTYPE_POLICY})
+
     Returns:
         Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates] -- mutated network
     """
@@ -844,7 +2274,9 @@ def _mutate(
         p=[1.0 - permutation_rate, permutation_rate / 2.0, permutation_rate / 2.0],
         size=network_connection_weights.weights.size,
     )
-    network_connection_weights = ConnectionWeights(new_weights)
+    network_connection_weights = ConnectionWeights(
+        new_weights.astype(dtype_policy.weights)
+    )
 
     # random weight mutation
     random_weight_rate = mutation_parameters["random_weight_rate"]
@@ -855,7 +2287,9 @@ def _mutate(
             p=[1.0 - random_weight_rate, random_weight_rate],
             size=network_connection_weights.weights.size,
         ),
-        np.random.normal(size=network_connection_weights.weights.size),
+        np.random.normal(size=network_connection_weights.weights.size).astype(
+            dtype_policy.weights
+        ),
     )
 
     # new connection mutation
@@ -916,26 +2350,16 @@ def _mutate(
             new_connection_state = np.array([1])
 
             # update global innovation history
-            new_connection_tuple = (
-                new_connection_direction[0][0],
-                new_connection_direction[0][1],
+            register_connection_innovations(
+                global_connection_innovation_history, new_connection_direction
             )
 
-            # edge-case this is the first innovation
-            if not len(global_connection_innovation_history.innovations):
-                global_connection_innovation_history.innovations[new_connection_tuple] = 0
-
-            # log innovation if it is new
-            elif not new_connection_tuple in global_connection_innovation_history.innovations:
-                global_connection_innovation_history.innovations[new_connection_tuple] = (
-                    max(global_connection_innovation_history.innovations.values()) + 1
-                )
-
             # update network
             network_connection_directions = ConnectionDirections(
                 np.concatenate(
                     (network_connection_directions.directions, new_connection_direction)
-                )
+                ),
+                network_connection_directions.activations,
             )
             network_connection_weights = ConnectionWeights(
                 np.concatenate(
@@ -960,20 +2384,9 @@ def _mutate(
                 network_connection_directions.directions[split_connection]
             )
 
-            # check if connection has been split in the past
-            if split_connection_direction in global_node_innovation_history.innovations:
-                new_node_id = global_node_innovation_history.innovations[
-                    split_connection_direction
-                ]
-
-            # check if no connections have ever been split
-            elif len(global_node_innovation_history.innovations) == 0:
-                new_node_id = max(base_nodes.output_nodes) + 1
-
-            else:
-                new_node_id = (
-                    max(global_node_innovation_history.innovations.values()) + 1
-                )
+            new_node_id = _split_node_id(
+                global_node_innovation_history, split_connection_direction, base_nodes
+            )
 
             # check if connection has already been split inside this network
             if not np.isin(new_node_id, network_connection_directions.directions):
@@ -996,23 +2409,10 @@ def _mutate(
                 network_connection_states.states[split_connection] = 0
 
                 # update global innovation history
-                # NOTE: the dict can't be empty since we checked that at least 1 connection
-                #       exists
-                if (
-                    not tuple(lead_connection_direction)
-                    in global_connection_innovation_history.innovations
-                ):
-                    global_connection_innovation_history.innovations[
-                        tuple(lead_connection_direction)
-                    ] = (max(global_connection_innovation_history.innovations.values()) + 1)
-
-                if (
-                    not tuple(exit_connection_direction)
-                    in global_connection_innovation_history.innovations
-                ):
-                    global_connection_innovation_history.innovations[
-                        tuple(exit_connection_direction)
-                    ] = (max(global_connection_innovation_history.innovations.values()) + 1)
+                register_connection_innovations(
+                    global_connection_innovation_history,
+                    [lead_connection_direction, exit_connection_direction],
+                )
 
                 # update network
                 network_connection_directions = ConnectionDirections(
@@ -1022,7 +2422,8 @@ def _mutate(
                             [lead_connection_direction],
                             [exit_connection_direction],
                         )
-                    )
+                    ),
+                    network_connection_directions.activations,
                 )
                 network_connection_weights = ConnectionWeights(
                     np.concatenate(
@@ -1043,10 +2444,245 @@ def _mutate(
                     )
                 )
 
-    return (
+    # activation mutation, populations only carry activation genes when it is enabled
+    activation_mutation_rate = mutation_parameters.get("activation_mutation_rate", 0)
+    if activation_mutation_rate and (
+        np.random.random_sample() < activation_mutation_rate
+    ):
+
+        # input nodes and the bias node are placeholders without an activation
+        mutable_nodes = np.setdiff1d(
+            np.concatenate(
+                (
+                    np.unique(network_connection_directions.directions),
+                    base_nodes.output_nodes,
+                )
+            ),
+            np.append(base_nodes.input_nodes, base_nodes.bias_node),
+        )
+        node_id = np.random.choice(mutable_nodes)
+        activation = np.random.randint(len(ACTIVATION_FUNCTIONS))
+
+        # replace the node's gene
+        activations = network_connection_directions.activations
+        if activations is None:
+            activations = np.zeros((0, 2), dtype=int)
+        network_connection_directions = ConnectionDirections(
+            network_connection_directions.directions,
+            np.concatenate(
+                (activations[activations[:, 0] != node_id], [[node_id, activation]])
+            ),
+        )
+
+    return _apply_dtype_policy(
         network_connection_directions,
         network_connection_weights,
         network_connection_states,
+        dtype_policy,
+    )
+
+
+def register_connection_innovations(
+    global_connection_innovation_history: ConnectionInnovationsMap,
+    connection_directions: np.ndarray,
+):
+    """log the connections that are new to an innovation history, each new connection
+    gets the next innovation number
+
+    With a registry the numbers of all new connections are taken from it in one call,
+    known connections never reach the registry.
+
+    Arguments:
+        global_connection_innovation_history {ConnectionInnovationsMap} -- connection innovation history
+        connection_directions {np.ndarray} -- (connections, 2) source and destination nodes
+    """
+    innovations = global_connection_innovation_history.innovations
+    new_connections = []
+    for source, destination in np.asarray(connection_directions).reshape(-1, 2):
+        connection = (int(source), int(destination))
+        if connection not in innovations and connection not in new_connections:
+            new_connections.append(connection)
+    if not new_connections:
+        return
+
+    registry = global_connection_innovation_history.registry
+    if registry is not None:
+        innovations.update(
+            zip(new_connections, registry.register_connections(new_connections))
+        )
+        return
+    for connection in new_connections:
+        innovations[connection] = max(innovations.values(), default=-1) + 1
+
+
+def _split_node_id(
+    global_node_innovation_history: NodeInnovationsMap,
+    split_connection_direction: Tuple[int, int],
+    base_nodes: BaseNodes,
+) -> int:
+    """helper function that finds the node splitting a connection, connections that
+    weren't split before get the next node number without logging it
+
+    Arguments:
+        global_node_innovation_history {NodeInnovationsMap} -- node innovation history
+        split_connection_direction {Tuple[int, int]} -- connection to split
+        base_nodes {BaseNodes} -- input, output and bias nodes
+
+    Returns:
+        int -- node number
+    """
+    innovations = global_node_innovation_history.innovations
+
+    # check if connection has been split in the past
+    if split_connection_direction in innovations:
+        return innovations[split_connection_direction]
+
+    # the registry logs the split for every population sharing it
+    first_node_id = int(max(base_nodes.output_nodes)) + 1
+    if global_node_innovation_history.registry is not None:
+        return global_node_innovation_history.registry.register_node(
+            tuple(map(int, split_connection_direction)), first_node_id
+        )
+    return max(innovations.values(), default=first_node_id - 1) + 1
+
+
+def _apply_dtype_policy(
+    connection_directions: ConnectionDirections,
+    connection_weights: ConnectionWeights,
+    connection_states: ConnectionStates,
+    dtype_policy: DTypePolicy,
+) -> Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates]:
+    """helper function to cast a network to the dtypes of a dtype policy, numpy
+    promotes mixed dtype concatenations so every operation that builds a network
+    casts it back
+
+    Arguments:
+        connection_directions {ConnectionDirections} -- ConnectionDirections
+        connection_weights {ConnectionWeights} -- ConnectionWeights
+        connection_states {ConnectionStates} -- ConnectionStates
+        dtype_policy {DTypePolicy} -- dtypes to cast to
+
+    Returns:
+        Tuple[ConnectionDirections, ConnectionWeights, ConnectionStates] -- cast network
+    """
+    return (
+        ConnectionDirections(
+            connection_directions.directions.astype(dtype_policy.nodes, copy=False),
+            None
+            if connection_directions.activations is None
+            else connection_directions.activations.astype(
+                dtype_policy.nodes, copy=False
+            ),
+        ),
+        ConnectionWeights(
+            connection_weights.weights.astype(dtype_policy.weights, copy=False)
+        ),
+        ConnectionStates(
+            connection_states.states.astype(dtype_policy.states, copy=False)
+        ),
+    )
+
+
+def population_memory_report(
+    networks_connection_directions: List[ConnectionDirections],
+    networks_connection_weights: List[ConnectionWeights],
+    networks_connection_states: List[ConnectionStates],
+) -> Dict[str, float]:
+    """count the bytes used to store a population
+
+    Arguments:
+        networks_connection_directions {List[ConnectionDirections]} -- directions of connections of each network
+        networks_connection_weights {List[ConnectionWeights]} -- weights of connections of each network
+        networks_connection_states {List[ConnectionStates]} -- states of connections of each network
+
+    Returns:
+        Dict[str, float] -- bytes used by directions, weights, states, activation genes, in total and per network
+    """
+    directions_bytes = sum(
+        connection_directions.directions.nbytes
+        for connection_directions in networks_connection_directions
+    )
+    weights_bytes = sum(
+        connection_weights.weights.nbytes
+        for connection_weights in networks_connection_weights
+    )
+    states_bytes = sum(
+        connection_states.states.nbytes
+        for connection_states in networks_connection_states
+    )
+    activations_bytes = sum(
+        connection_directions.activations.nbytes
+        for connection_directions in networks_connection_directions
+        if connection_directions.activations is not None
+    )
+    total_bytes = directions_bytes + weights_bytes + states_bytes + activations_bytes
+    return {
+        "directions": directions_bytes,
+        "weights": weights_bytes,
+        "states": states_bytes,
+        "activations": activations_bytes,
+        "total": total_bytes,
+        "per_network": total_bytes / max(len(networks_connection_directions), 1),
+    }
+
+
+def compact_innovation_history(
+    global_connection_innovation_history: ConnectionInnovationsMap,
+    global_node_innovation_history: NodeInnovationsMap,
+    networks_connection_directions: List[ConnectionDirections],
+    species: List[Species],
+) -> Tuple[int, int]:
+    """drop innovations that aren't present in any network or species rep
+
+    Innovation numbers are never changed and the newest innovation of each history is
+    always kept, so new innovations keep getting larger numbers than every innovation
+    that is still alive and excess/disjoint classification is unaffected.
+
+    Arguments:
+        global_connection_innovation_history {ConnectionInnovationsMap} -- connection innovation history
+        global_node_innovation_history {NodeInnovationsMap} -- node innovation history
+        networks_connection_directions {List[ConnectionDirections]} -- connections of each network
+        species {List[Species]} -- live species
+
+    Returns:
+        Tuple[int, int] -- connection and node innovation history sizes after compaction
+    """
+    live_connection_directions = np.unique(
+        np.concatenate(
+            [
+                connection_directions.directions.reshape(-1, 2)
+                for connection_directions in networks_connection_directions
+            ]
+            + [
+                live_species.rep_connection_directions.directions.reshape(-1, 2)
+                for live_species in species
+            ]
+        ).astype(np.int64),
+        axis=0,
+    )
+    live_connections = set(map(tuple, live_connection_directions.tolist()))
+    live_nodes = set(live_connection_directions.ravel().tolist())
+
+    for innovations, is_live in (
+        (
+            global_connection_innovation_history.innovations,
+            lambda connection, _: connection in live_connections,
+        ),
+        (
+            global_node_innovation_history.innovations,
+            lambda _, node_id: node_id in live_nodes,
+        ),
+    ):
+        if not innovations:
+            continue
+        newest_innovation = max(innovations.values())
+        for key, innovation in list(innovations.items()):
+            if innovation != newest_innovation and not is_live(key, innovation):
+                del innovations[key]
+
+    return (
+        len(global_connection_innovation_history.innovations),
+        len(global_node_innovation_history.innovations),
     )
 
 
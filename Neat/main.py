@@ -1,18 +1,38 @@
-from typing import List, Tuple
+import os
+from multiprocessing import Pool
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-import gym
 import numpy as np
-import pygraphviz as pgv
 
-from logics import evaluate_networks, feed_forward, new_generation, split_into_species
+from logics import (
+    clear_species_hints,
+    compact_innovation_history,
+    draw_episode_seeds,
+    evaluate_networks,
+    evaluate_networks_parallel,
+    evaluate_networks_racing,
+    feed_forward,
+    new_generation,
+    population_memory_report,
+    register_connection_innovations,
+    save_champion,
+    split_into_species,
+    update_species,
+)
+from hyperneat import cppn_base_nodes, evaluate_substrate_networks, grid_substrate
+from policy import freeze_champion
 from structs import (
+    DEFAULT_DTYPE_POLICY,
     BaseNodes,
     ConnectionDirections,
     ConnectionInnovationsMap,
     ConnectionStates,
     ConnectionWeights,
+    DTypePolicy,
     Environments,
     NodeInnovationsMap,
+    Species,
+    SpeciesHints,
 )
 
 # parameters
@@ -22,6 +42,7 @@ GENETIC_DISTANCE_PARAMETERS = {
     "excess_constant": 1.0,
     "disjoint_constant": 1.0,
     "weight_bias_constant": 0.4,
+    "activation_constant": 1.0,
     "large_genome_size": 20,
     "threshold": 3.0,
     "interspecies_mating_rate": 0.001,
@@ -31,6 +52,7 @@ MUTATION_PARAMETERS = {
     "random_weight_rate": 0.1,
     "new_connection_rate": 0.05,
     "split_connection_rate": 0.03,
+    "activation_mutation_rate": 0.03,
     "large_species": 5,
 }
 CROSSOVER_PARAMETERS = {
@@ -39,24 +61,125 @@ CROSSOVER_PARAMETERS = {
 }
 GENERATIONS = 100
 
+# drop innovations that left the population every this many generations
+INNOVATION_COMPACTION_INTERVAL = 10
 
-if __name__ == "__main__":
+# use COMPACT_DTYPE_POLICY (structs.py) for large populations, or
+# FAST_SIGMOID_DTYPE_POLICY to evaluate sigmoids in float32
+DTYPE_POLICY = DEFAULT_DTYPE_POLICY
+
+# evaluate networks in this many worker processes, 0 evaluates them in this process
+WORKERS = 0
+
+# race evaluations of noisy environments, spending extra episodes only on networks
+# close to the selection cutoff (see evaluate_networks_racing), None plays every
+# network the same amount of episodes
+RACING_PARAMETERS = None
+
+# seed of the episode seeds, every network of a generation then plays the same seeded
+# episodes (common random numbers) and the seeds are logged. None plays unseeded
+# episodes
+EVALUATION_SEED = None
+
+# the best network seen during training is saved here for serving (see serve.py), None
+# doesn't save it
+CHAMPION_PATH = "champion.npz"
+
+# hidden layer sizes of a HyperNEAT substrate, genomes are then evolved as CPPNs that
+# generate the weights of the substrate network (see hyperneat.py). None evolves the
+# networks directly
+SUBSTRATE_HIDDEN_LAYERS = None
+
+# after training the champion is frozen into a numpy only policy file (see policy.py)
+POLICY_PATH = "champion.policy.npy"
+
+
+def training_loop(
+    environment_name: str,
+    network_amount: int,
+    generations: int,
+    genetic_distance_parameters: Dict[str, float],
+    mutation_parameters: Dict[str, float],
+    crossover_parameters: Dict[str, float],
+    max_steps: int = 200,
+    episodes: int = 1,
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY,
+    workers: int = 0,
+    racing_parameters: Dict[str, float] = None,
+    evaluation_seed: int = None,
+    champion_path: str = None,
+    substrate_hidden_layers: List[int] = None,
+    innovation_registry: Any = None,
+    migration: Callable[..., Optional[Tuple]] = None,
+    draw_networks: bool = True,
+    verbose: bool = True,
+    episode_callback: Callable[[int, float, float], Optional[bool]] = None,
+) -> Tuple[List[float], List[float]]:
+    """evolve a population of networks in an environment
+
+    Arguments:
+        environment_name {str} -- gym environment id
+        network_amount {int} -- amount of networks in the population
+        generations {int} -- amount of generations to evolve
+        genetic_distance_parameters {Dict[str, float]} -- hyperparameters for genetic distance
+        mutation_parameters {Dict[str, float]} -- hyperparameters for mutation
+        crossover_parameters {Dict[str, float]} -- hyperparameters for crossover
+
+    Keyword Arguments:
+        max_steps {int} -- step limit for each episode (default: {200})
+        episodes {int} -- number of episodes to test each network (default: {1})
+        dtype_policy {DTypePolicy} -- dtypes of the population arrays (default: {DEFAULT_DTYPE_POLICY})
+        workers {int} -- evaluate networks in this many worker processes (default: {0})
+        racing_parameters {Dict[str, float]} -- keyword arguments of
+            evaluate_networks_racing, races evaluations when given, racing isn't
+            supported with workers or a substrate (default: {None})
+        evaluation_seed {int} -- draw seeded episodes that every network of a
+            generation plays from this seed (default: {None, unseeded episodes})
+        champion_path {str} -- save the best network seen to this file with
+            save_champion, direct encoding only (default: {None})
+        substrate_hidden_layers {List[int]} -- evolve CPPNs of a HyperNEAT
+            substrate with these hidden layers, evaluated in this process
+            (default: {None, direct encoding})
+        innovation_registry {Any} -- registry shared with other populations that
+            assigns innovation numbers (default: {None, local innovation numbers})
+        migration {Callable[..., Optional[Tuple]]} -- called with the generation,
+            the networks and their scores after each evaluation, returns the
+            networks and scores with migrants swapped in and the indices of the
+            replaced networks, or None (default: {None})
+        draw_networks {bool} -- draw the best network of each generation (default: {True})
+        verbose {bool} -- print generation reports (default: {True})
+        episode_callback {Callable[[int, float, float], Optional[bool]]} -- called with
+            the generation, average score and max score after each evaluation, training
+            stops when it returns False (default: {None})
+
+    Returns:
+        Tuple[List[float], List[float]] -- average and max score of each generation
+    """
+
+    if racing_parameters and (workers or substrate_hidden_layers is not None):
+        raise ValueError("racing is not supported with workers or a substrate")
+
+    import gym
 
     # generate environments
     environments = Environments(
-        [gym.make(ENVIRONMENT_NAME) for _ in range(NETWORK_AMOUNT)]
+        [gym.make(environment_name) for _ in range(network_amount)]
     )
 
     # generate empty network arrays
     networks_connection_directions = []
     networks_connection_weights = []
     networks_connection_states = []
-    for _ in range(NETWORK_AMOUNT):
+    for _ in range(network_amount):
         networks_connection_directions.append(
-            ConnectionDirections(np.array([], dtype=np.int).reshape(-1, 2))
+            ConnectionDirections(np.array([], dtype=dtype_policy.nodes).reshape(-1, 2))
+        )
+        networks_connection_weights.append(
+            ConnectionWeights(np.array([], dtype=dtype_policy.weights))
+        )
+        networks_connection_states.append(
+            ConnectionStates(np.array([], dtype=dtype_policy.states))
         )
-        networks_connection_weights.append(ConnectionWeights(np.array([])))
-        networks_connection_states.append(ConnectionStates(np.array([])))
 
     # generate base nodes for environment
     test_env = environments.environments[0]
@@ -67,118 +190,335 @@ if __name__ == "__main__":
     ## output nodes are the
     output_node_amount = test_env.action_space.n
     base_nodes = BaseNodes(
-        np.arange(input_node_amount, dtype=np.int),
+        np.arange(input_node_amount, dtype=dtype_policy.nodes),
         np.arange(
-            input_node_amount, input_node_amount + output_node_amount, dtype=np.int
+            input_node_amount,
+            input_node_amount + output_node_amount,
+            dtype=dtype_policy.nodes,
         ),
     )
 
+    ## with a substrate the genomes are CPPNs queried with substrate coordinates
+    substrate = None
+    if substrate_hidden_layers is not None:
+        substrate = grid_substrate(
+            [input_node_amount, *substrate_hidden_layers, output_node_amount]
+        )
+        base_nodes = cppn_base_nodes(substrate, dtype_policy)
+
     # generate innovation history maps
-    global_connection_innovation_history = ConnectionInnovationsMap(dict())
-    global_node_innovation_history = NodeInnovationsMap(dict())
+    global_connection_innovation_history = ConnectionInnovationsMap(
+        dict(), innovation_registry
+    )
+    global_node_innovation_history = NodeInnovationsMap(dict(), innovation_registry)
 
     # init variables
-    species_reps: List[Tuple[ConnectionDirections, ConnectionWeights]] = []
+    species: List[Species] = []
+    species_hints: SpeciesHints = None
     average_scores: List[float] = []
     max_scores: List[float] = []
+    innovation_history_sizes: List[Tuple[int, int]] = []
+    pool = Pool(workers) if workers else None
+    seed_rng = np.random.default_rng(evaluation_seed)
+    episode_seeds = None
 
-    # train networks
-    for generation in range(GENERATIONS):
-        average_scores = []
-        max_scores = []
-
-        # get network rewards from environments
-        networks_scores = evaluate_networks(
-            environments,
-            networks_connection_directions,
-            networks_connection_weights,
-            networks_connection_states,
-            base_nodes,
-            max_steps=200,
-            episodes=1,
-            score_exponent=1,
-            render=False,
-        )
+    # train networks, the pool is closed even when training fails
+    try:
+        for generation in range(generations):
 
-        # draw best network
-        best_network = networks_scores.argmax()
-        best_network_connection_directions = networks_connection_directions[
-            best_network
-        ]
-        best_network_connection_weights = networks_connection_weights[best_network]
-        best_network_connection_states = networks_connection_states[best_network]
-        G = pgv.AGraph(directed=True)
-        for (source, dest), weight, enabled in zip(
-            best_network_connection_directions.directions,
-            best_network_connection_weights.weights,
-            best_network_connection_states.states,
-        ):
-            color = "black" if not enabled else "blue" if weight > 0 else "red"
-            penwidth = abs(weight) * 2
-
-            G.add_edge(source, dest, color=color, penwidth=penwidth)
-        G.draw(f"genomes/best_network_gen_{generation}.png", prog="fdp")
-
-        # show best network perform
-        # evaluate_networks(
-        #     Environments([gym.make(ENVIRONMENT_NAME)]),
-        #     [best_network_connection_directions],
-        #     [best_network_connection_weights],
-        #     [best_network_connection_states],
-        #     base_nodes,
-        #     max_steps=200,
-        #     episodes=1,
-        #     render=True,
-        # )
-
-        # generate next generation
-        average_scores.append(np.average(networks_scores))
-        max_scores.append(np.max(networks_scores))
-        networks_species, species_reps = split_into_species(
-            networks_connection_directions,
-            networks_connection_weights,
-            global_connection_innovation_history,
-            GENETIC_DISTANCE_PARAMETERS,
-            previous_generation_species_reps=species_reps,
-        )
+            # the same seeded starts for every network of this generation
+            if evaluation_seed is not None:
+                episode_seeds = draw_episode_seeds(
+                    seed_rng,
+                    (
+                        racing_parameters.get("max_episodes", 10)
+                        if racing_parameters
+                        else episodes
+                    ),
+                )
+                if verbose:
+                    print(
+                        f"generation {generation} episode seeds: {episode_seeds.tolist()}"
+                    )
+
+            # get network rewards from environments
+            if substrate:
+                networks_scores = evaluate_substrate_networks(
+                    environments,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                    base_nodes,
+                    substrate,
+                    max_steps=max_steps,
+                    episodes=episodes,
+                    score_exponent=1,
+                    dtype_policy=dtype_policy,
+                    episode_seeds=episode_seeds,
+                )
+            elif pool:
+                networks_scores = evaluate_networks_parallel(
+                    pool,
+                    environment_name,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                    base_nodes,
+                    max_steps=max_steps,
+                    episodes=episodes,
+                    score_exponent=1,
+                    dtype_policy=dtype_policy,
+                    chunks=workers,
+                    episode_seeds=episode_seeds,
+                )
+            elif racing_parameters:
+                networks_scores, episode_counts = evaluate_networks_racing(
+                    environments,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                    base_nodes,
+                    max_steps=max_steps,
+                    dtype_policy=dtype_policy,
+                    episode_seeds=episode_seeds,
+                    **racing_parameters,
+                )
+                if verbose:
+                    print(f"average evaluation episodes: {episode_counts.mean()}")
+            else:
+                networks_scores = evaluate_networks(
+                    environments,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                    base_nodes,
+                    max_steps=max_steps,
+                    episodes=episodes,
+                    score_exponent=1,
+                    render=False,
+                    dtype_policy=dtype_policy,
+                    episode_seeds=episode_seeds,
+                )
 
-        species_amounts = {
-            species: species_amount
-            for species, species_amount in zip(
-                *np.unique(networks_species, return_counts=True)
+            # draw best network
+            if draw_networks:
+                import pygraphviz as pgv
+
+                best_network = networks_scores.argmax()
+                best_network_connection_directions = networks_connection_directions[
+                    best_network
+                ]
+                best_network_connection_weights = networks_connection_weights[
+                    best_network
+                ]
+                best_network_connection_states = networks_connection_states[
+                    best_network
+                ]
+                G = pgv.AGraph(directed=True)
+                for (source, dest), weight, enabled in zip(
+                    best_network_connection_directions.directions,
+                    best_network_connection_weights.weights,
+                    best_network_connection_states.states,
+                ):
+                    color = "black" if not enabled else "blue" if weight > 0 else "red"
+                    penwidth = abs(weight) * 2
+
+                    G.add_edge(source, dest, color=color, penwidth=penwidth)
+                G.draw(f"genomes/best_network_gen_{generation}.png", prog="fdp")
+
+            # show best network perform
+            # evaluate_networks(
+            #     Environments([gym.make(environment_name)]),
+            #     [best_network_connection_directions],
+            #     [best_network_connection_weights],
+            #     [best_network_connection_states],
+            #     base_nodes,
+            #     max_steps=max_steps,
+            #     episodes=episodes,
+            #     render=True,
+            # )
+
+            # save the best network seen so far
+            if (
+                champion_path
+                and not substrate
+                and np.max(networks_scores) > max(max_scores, default=-np.inf)
+            ):
+                best_network = networks_scores.argmax()
+                save_champion(
+                    champion_path,
+                    networks_connection_directions[best_network],
+                    networks_connection_weights[best_network],
+                    networks_connection_states[best_network],
+                    base_nodes,
+                )
+
+            # log scores, the callback can stop training early
+            average_scores.append(np.average(networks_scores))
+            max_scores.append(np.max(networks_scores))
+            if (
+                episode_callback
+                and episode_callback(generation, average_scores[-1], max_scores[-1])
+                is False
+            ):
+                break
+
+            # exchange networks with other populations, the innovations of migrants are
+            # logged before they are compared with local networks
+            migrated_population = (
+                migration(
+                    generation,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                    networks_scores,
+                )
+                if migration
+                else None
             )
-        }
+            if migrated_population:
+                (
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                    networks_scores,
+                    migrated_networks,
+                ) = migrated_population
+                for connection_directions in networks_connection_directions:
+                    register_connection_innovations(
+                        global_connection_innovation_history,
+                        connection_directions.directions,
+                    )
+
+                # migrants don't belong to the species of the networks they replaced
+                if species_hints is not None:
+                    species_hints = clear_species_hints(
+                        species_hints, migrated_networks
+                    )
+
+            # generate next generation
+            speciation_metrics = {}
+            networks_species, species = split_into_species(
+                networks_connection_directions,
+                networks_connection_weights,
+                global_connection_innovation_history,
+                genetic_distance_parameters,
+                previous_generation_species=species,
+                metrics=speciation_metrics,
+                species_hints=species_hints,
+            )
+
+            # retire extinct species and pick new reps from the current members
+            species, networks_species = update_species(
+                species,
+                networks_species,
+                networks_connection_directions,
+                networks_connection_weights,
+                networks_scores,
+                generation,
+            )
+
+            species_amounts = {
+                live_species.species_id: live_species.member_amount
+                for live_species in species
+            }
 
-        species_scores = {
-            species: np.average(networks_scores[networks_species == species])
-            for species in networks_species
-        }
+            species_scores = {
+                live_species.species_id: np.average(
+                    networks_scores[networks_species == species_index]
+                )
+                for species_index, live_species in enumerate(species)
+            }
 
+            memory_report = population_memory_report(
+                networks_connection_directions,
+                networks_connection_weights,
+                networks_connection_states,
+            )
+
+            if verbose:
+                print(
+                    f"\n-- Generation {generation} --"
+                    f"\nbest score: {max(networks_scores)}"
+                    f"\naverage score: {np.average(networks_scores)}"
+                    f"\nspecies: {species_amounts}"
+                    f"\naverage species score: {species_scores}"
+                    f"\npopulation memory: {memory_report}"
+                    f"\nspeciation skip rate: "
+                    f"{speciation_metrics['pruned'] / max(speciation_metrics['comparisons'], 1)}"
+                    f"\nconnection innovations: "
+                    f"{len(global_connection_innovation_history.innovations)}"
+                    f"\nnode innovations: {len(global_node_innovation_history.innovations)}"
+                    "\n"
+                )
+            (
+                networks_connection_directions,
+                networks_connection_weights,
+                networks_connection_states,
+                global_connection_innovation_history,
+                species_hints,
+            ) = new_generation(
+                networks_connection_directions,
+                networks_connection_weights,
+                networks_connection_states,
+                base_nodes,
+                networks_scores,
+                networks_species,
+                global_connection_innovation_history,
+                global_node_innovation_history,
+                genetic_distance_parameters,
+                mutation_parameters,
+                crossover_parameters,
+                dtype_policy,
+            )
+
+            # keep the innovation histories bounded by the live population
+            if generation % INNOVATION_COMPACTION_INTERVAL == 0:
+                compact_innovation_history(
+                    global_connection_innovation_history,
+                    global_node_innovation_history,
+                    networks_connection_directions,
+                    species,
+                )
+            innovation_history_sizes.append(
+                (
+                    len(global_connection_innovation_history.innovations),
+                    len(global_node_innovation_history.innovations),
+                )
+            )
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    if verbose:
         print(
-            f"\n-- Generation {generation} --"
-            f"\nbest score: {max(networks_scores)}"
-            f"\naverage score: {np.average(networks_scores)}"
-            f"\nspecies: {species_amounts}"
-            f"\naverage species score: {species_scores}"
-            f"\nconnection innovations:\n\t{global_connection_innovation_history}"
-            f"\nnode innovations:\n\t{global_node_innovation_history}"
-            "\n"
-        )
-        (
-            networks_connection_directions,
-            networks_connection_weights,
-            networks_connection_states,
-            global_connection_innovation_history,
-        ) = new_generation(
-            networks_connection_directions,
-            networks_connection_weights,
-            networks_connection_states,
-            base_nodes,
-            networks_scores,
-            networks_species,
-            global_connection_innovation_history,
-            global_node_innovation_history,
-            GENETIC_DISTANCE_PARAMETERS,
-            MUTATION_PARAMETERS,
-            CROSSOVER_PARAMETERS,
+            f"innovation history sizes (connections, nodes): {innovation_history_sizes}"
         )
+    return average_scores, max_scores
+
+
+if __name__ == "__main__":
+    training_loop(
+        ENVIRONMENT_NAME,
+        NETWORK_AMOUNT,
+        GENERATIONS,
+        GENETIC_DISTANCE_PARAMETERS,
+        MUTATION_PARAMETERS,
+        CROSSOVER_PARAMETERS,
+        dtype_policy=DTYPE_POLICY,
+        workers=WORKERS,
+        racing_parameters=RACING_PARAMETERS,
+        evaluation_seed=EVALUATION_SEED,
+        champion_path=CHAMPION_PATH,
+        substrate_hidden_layers=SUBSTRATE_HIDDEN_LAYERS,
+    )
+    if CHAMPION_PATH and POLICY_PATH and SUBSTRATE_HIDDEN_LAYERS is None:
+        try:
+            freeze_champion(CHAMPION_PATH, POLICY_PATH)
+        except ValueError as error:
+            # recurrent champions can't be frozen, serve.py falls back to the champion
+            # file when there is no policy file, so a stale one is removed
+            if os.path.exists(POLICY_PATH):
+                os.remove(POLICY_PATH)
+            print(f"{error}, the champion stays at {CHAMPION_PATH}")
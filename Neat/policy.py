@@ -0,0 +1,244 @@
+"""
+Frozen policies, a trained NEAT network or NeuroEvolution agent stored as one flat
+binary file that a numpy only runtime maps and evaluates
+"""
+
+import json
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+# the file is a single uint8 .npy array: magic, header length, json header and the
+# arrays, every array starts on an ALIGNMENT byte boundary
+MAGIC = b"FROZENP1"
+ALIGNMENT = 64
+
+# champion saved by Neat/main.py or NeuroEvolution/main.py and the policy file it is
+# frozen into
+CHAMPION_PATH = "champion.npz"
+POLICY_PATH = "champion.policy.npy"
+
+ACTIVATIONS = {
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0),
+    "identity": lambda x: x,
+    "gaussian": lambda x: np.exp(-x * x),
+}
+
+
+class FrozenLayer(NamedTuple):
+    """
+    slots a layer writes (rows), slots it reads (columns) and the (rows, columns)
+    weights between them
+    """
+
+    rows: np.ndarray
+    columns: np.ndarray
+    weights: np.ndarray
+    activation: str
+
+
+class FrozenPolicy(NamedTuple):
+    """
+    a network evaluated over a vector of node slots like CompiledNetworks, the bias
+    slot always holds 1. the arrays are views into the mapped policy file
+    """
+
+    kind: str
+    node_amount: int
+    input_slots: np.ndarray
+    bias_slot: int
+    output_slots: np.ndarray
+    layers: List[FrozenLayer]
+    dtype: type
+
+
+def write_frozen_policy(
+    path: str,
+    kind: str,
+    node_amount: int,
+    input_slots: np.ndarray,
+    bias_slot: int,
+    output_slots: np.ndarray,
+    layers: List[Tuple[np.ndarray, np.ndarray, np.ndarray, str]],
+):
+    """
+    write a policy file, layers are (rows, columns, weights, activation) tuples in
+    evaluation order
+    """
+    arrays = {"input_slots": input_slots, "output_slots": output_slots}
+    for layer, (rows, columns, weights, _) in enumerate(layers):
+        arrays[f"layer_{layer}_rows"] = rows
+        arrays[f"layer_{layer}_columns"] = columns
+        arrays[f"layer_{layer}_weights"] = weights
+
+    # array offsets are relative to the end of the header
+    array_entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        array_entries[name] = [array.dtype.str, list(array.shape), offset]
+        offset = _aligned(offset + array.nbytes)
+
+    header = json.dumps(
+        {
+            "kind": kind,
+            "node_amount": int(node_amount),
+            "bias_slot": int(bias_slot),
+            "input_size": int(np.size(input_slots)),
+            "output_size": int(np.size(output_slots)),
+            "activations": [activation for *_, activation in layers],
+            "arrays": array_entries,
+        }
+    ).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    buffer = np.zeros(data_start + offset, dtype=np.uint8)
+    buffer[: len(MAGIC)] = np.frombuffer(MAGIC, dtype=np.uint8)
+    buffer[len(MAGIC) : len(MAGIC) + 8] = np.frombuffer(
+        np.array(len(header), dtype="<u8").tobytes(), dtype=np.uint8
+    )
+    buffer[len(MAGIC) + 8 : len(MAGIC) + 8 + len(header)] = np.frombuffer(
+        header, dtype=np.uint8
+    )
+    for name, (_, _, array_offset) in array_entries.items():
+        array_bytes = arrays[name].view(np.uint8).ravel()
+        start = data_start + array_offset
+        buffer[start : start + array_bytes.size] = array_bytes
+    np.save(path, buffer)
+
+
+def load_frozen_policy(path: str) -> FrozenPolicy:
+    """
+    map a policy file without reading it, the arrays are loaded by the os as they are
+    used
+    """
+    buffer = np.load(path, mmap_mode="r")
+    if bytes(buffer[: len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a frozen policy")
+    header_length = int(
+        np.frombuffer(bytes(buffer[len(MAGIC) : len(MAGIC) + 8]), "<u8")[0]
+    )
+    header = json.loads(bytes(buffer[len(MAGIC) + 8 : len(MAGIC) + 8 + header_length]))
+    data_start = _aligned(len(MAGIC) + 8 + header_length)
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header["arrays"].items():
+        dtype = np.dtype(dtype)
+        start = data_start + offset
+        arrays[name] = (
+            buffer[start : start + dtype.itemsize * int(np.prod(shape))]
+            .view(dtype)
+            .reshape(shape)
+        )
+
+    layers = [
+        FrozenLayer(
+            arrays[f"layer_{layer}_rows"],
+            arrays[f"layer_{layer}_columns"],
+            arrays[f"layer_{layer}_weights"],
+            activation,
+        )
+        for layer, activation in enumerate(header["activations"])
+    ]
+    return FrozenPolicy(
+        header["kind"],
+        header["node_amount"],
+        arrays["input_slots"],
+        header["bias_slot"],
+        arrays["output_slots"],
+        layers,
+        layers[0].weights.dtype if layers else np.float64,
+    )
+
+
+def evaluate_frozen_policy(
+    observations: np.ndarray, frozen_policy: FrozenPolicy
+) -> np.ndarray:
+    """
+    outputs of a policy for a (batch, inputs) batch of observations, or for a single
+    observation
+    """
+    observations = np.asarray(observations)
+    batched = observations.ndim == 2
+    observations = observations.reshape(-1, frozen_policy.input_slots.size)
+
+    # each column holds the values of all nodes for one batch entry
+    values = np.zeros(
+        (frozen_policy.node_amount, observations.shape[0]), dtype=frozen_policy.dtype
+    )
+    values[frozen_policy.input_slots] = observations.T
+    values[frozen_policy.bias_slot] = 1.0
+    for layer in frozen_policy.layers:
+        values[layer.rows] = ACTIVATIONS[layer.activation](
+            layer.weights @ values[layer.columns]
+        )
+
+    outputs = values[frozen_policy.output_slots].T
+    return outputs if batched else outputs[0]
+
+
+def freeze_neuro_evolution(
+    path: str, weights: List[np.ndarray], biases: List[np.ndarray]
+):
+    """
+    write the (out, in) weights and (out,) biases of a NeuroEvolution agent as a
+    policy, the biases become weights of the bias slot
+    """
+    input_size = weights[0].shape[1]
+    bias_slot = input_size
+    previous_slots = np.arange(input_size)
+    node_amount = input_size + 1
+    layers = []
+    for layer_weights, layer_biases in zip(weights, biases):
+        rows = np.arange(node_amount, node_amount + layer_weights.shape[0])
+        node_amount += rows.size
+        layers.append(
+            (
+                rows,
+                np.append(previous_slots, bias_slot),
+                np.hstack([layer_weights, layer_biases[:, None]]),
+                "identity",
+            )
+        )
+        previous_slots = rows
+    write_frozen_policy(
+        path,
+        "neuro_evolution",
+        node_amount,
+        np.arange(input_size),
+        bias_slot,
+        previous_slots,
+        layers,
+    )
+
+
+def freeze_champion(champion_path: str, policy_path: str):
+    """
+    convert a champion saved by save_champion or NeuroEvolution.save_agent into a
+    policy file
+    """
+    with np.load(champion_path) as champion:
+        if str(champion["kind"]) == "neuro_evolution":
+            layer_amount = int(champion["layer_amount"])
+            freeze_neuro_evolution(
+                policy_path,
+                [champion[f"weights_{layer}"] for layer in range(layer_amount)],
+                [champion[f"biases_{layer}"] for layer in range(layer_amount)],
+            )
+            return
+
+    # compiling NEAT networks needs the full NEAT logic
+    from logics import freeze_neat, load_champion
+
+    freeze_neat(policy_path, *load_champion(champion_path))
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+if __name__ == "__main__":
+    freeze_champion(CHAMPION_PATH, POLICY_PATH)
@@ -0,0 +1,324 @@
+"""
+Serves a saved champion policy over localhost HTTP or a unix socket, concurrent
+requests are coalesced into batched forward passes
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from policy import (
+    CHAMPION_PATH as SAVED_CHAMPION_PATH,
+    POLICY_PATH,
+    evaluate_frozen_policy,
+    load_frozen_policy,
+)
+
+# policy frozen by policy.py, or a champion saved by Neat/main.py or
+# NeuroEvolution/main.py
+CHAMPION_PATH = POLICY_PATH
+
+# served when CHAMPION_PATH doesn't exist, like a recurrent NEAT champion that
+# couldn't be frozen
+FALLBACK_CHAMPION_PATH = SAVED_CHAMPION_PATH
+
+# serve on localhost, or on a unix socket when UNIX_SOCKET is set
+HOST = "127.0.0.1"
+PORT = 8750
+UNIX_SOCKET = None
+
+# a batch is evaluated once it is full or MAX_DELAY seconds after its first request
+MAX_BATCH_SIZE = 64
+MAX_DELAY = 0.002
+
+# latency percentiles are taken over this many of the latest requests
+LATENCY_WINDOW = 10_000
+
+Policy = Callable[[np.ndarray], np.ndarray]
+
+
+def resolve_champion_path(path: str, fallback_path: str = None) -> str:
+    """
+    the path to serve, the fallback path when path doesn't exist but it does
+    """
+    if fallback_path and not os.path.exists(path) and os.path.exists(fallback_path):
+        return fallback_path
+    return path
+
+
+def load_policy(path: str, backend: str = "auto") -> Tuple[Policy, int]:
+    """load a frozen policy, or a champion saved by save_champion or
+    NeuroEvolution.save_agent
+
+    Frozen policies are mapped by the numpy only runtime of policy.py, NEAT champions
+    are compiled once here, so serving a batch is a single forward pass.
+
+    Arguments:
+        path {str} -- .npy policy file or .npz champion file
+
+    Keyword Arguments:
+        backend {str} -- compile_networks backend of NEAT champions (default: {"auto"})
+
+    Returns:
+        Tuple[Policy, int] -- policy mapping (batch, inputs) observations to
+                              (batch, outputs) outputs, and the amount of inputs
+    """
+    if str(path).endswith(".npy"):
+        frozen_policy = load_frozen_policy(path)
+        return (
+            lambda observations: evaluate_frozen_policy(observations, frozen_policy),
+            frozen_policy.input_slots.size,
+        )
+
+    with np.load(path) as champion:
+        kind = str(champion["kind"])
+        if kind == "neuro_evolution":
+            weights = [
+                champion[f"weights_{layer}"]
+                for layer in range(int(champion["layer_amount"]))
+            ]
+            biases = [
+                champion[f"biases_{layer}"]
+                for layer in range(int(champion["layer_amount"]))
+            ]
+
+    if kind == "neuro_evolution":
+
+        def neuro_evolution_policy(observations: np.ndarray) -> np.ndarray:
+            outputs = observations
+            for layer_weights, layer_biases in zip(weights, biases):
+                outputs = outputs @ layer_weights.T + layer_biases
+            return outputs
+
+        return neuro_evolution_policy, weights[0].shape[1]
+
+    # the NEAT logic is only imported to serve unfrozen NEAT champions
+    from logics import compile_networks, feed_forward_compiled, load_champion
+
+    connection_directions, connection_weights, connection_states, base_nodes = (
+        load_champion(path)
+    )
+    compiled_networks = compile_networks(
+        [connection_directions],
+        [connection_weights],
+        [connection_states],
+        base_nodes,
+        backend,
+    )
+
+    def neat_policy(observations: np.ndarray) -> np.ndarray:
+        return feed_forward_compiled(observations[:, None], compiled_networks)[:, 0]
+
+    return neat_policy, base_nodes.input_nodes.size
+
+
+class BatchingServer:
+    """
+    queues observations of concurrent requests and evaluates them in batches, a batch
+    closes when it holds max_batch_size observations or max_delay seconds after its
+    first observation arrived
+    """
+
+    def __init__(
+        self,
+        policy: Policy,
+        input_size: int,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        max_delay: float = MAX_DELAY,
+    ):
+        self.policy = policy
+        self.input_size = input_size
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue: Optional[asyncio.Queue] = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = Counter()
+
+    async def infer(self, observation: np.ndarray) -> np.ndarray:
+        """
+        output of the policy for one observation, evaluated in the next batch
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((observation, future))
+        return await future
+
+    async def batch_loop(self):
+        """
+        collect queued observations into batches and evaluate them, runs until
+        cancelled
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+
+            # the forward pass of a batch is short, so it runs on the event loop
+            # instead of paying for a thread hop
+            observations = np.stack([observation for observation, _ in batch])
+            try:
+                outputs = self.policy(observations)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for output, (_, future) in zip(outputs, batch):
+                if not future.done():
+                    future.set_result(output)
+            self.batch_sizes[len(batch)] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        latency percentiles in milliseconds over the latest requests and the histogram
+        of evaluated batch sizes
+        """
+        latencies = np.array(self.latencies) * 1000
+        batches = sum(self.batch_sizes.values())
+        requests = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "input_size": self.input_size,
+            "requests": requests,
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "latency_p50_ms": (
+                float(np.percentile(latencies, 50)) if latencies.size else None
+            ),
+            "latency_p99_ms": (
+                float(np.percentile(latencies, 99)) if latencies.size else None
+            ),
+            "batch_size_histogram": {
+                str(size): count for size, count in sorted(self.batch_sizes.items())
+            },
+        }
+
+    async def handle_request(
+        self, method: str, path: str, body: bytes
+    ) -> Tuple[int, Dict[str, Any]]:
+        """
+        POST /act with {"observation": [...]} returns the policy outputs and the
+        greedy action, GET /metrics returns the server metrics
+        """
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics()
+        if method != "POST" or path != "/act":
+            return 404, {"error": f"unknown endpoint {method} {path}"}
+
+        try:
+            observation = np.asarray(json.loads(body)["observation"], dtype=float)
+        except (ValueError, KeyError, TypeError) as error:
+            return 400, {"error": f"invalid request: {error}"}
+        if observation.size != self.input_size:
+            return 400, {
+                "error": f"expected {self.input_size} observation values, "
+                f"got {observation.size}"
+            }
+
+        start = time.perf_counter()
+        outputs = await self.infer(observation.ravel())
+        self.latencies.append(time.perf_counter() - start)
+        return 200, {"outputs": outputs.tolist(), "action": int(np.argmax(outputs))}
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        """
+        answer HTTP/1.1 requests of a kept alive connection until the client closes it
+        """
+        try:
+            while True:
+                request = await read_http_message(reader)
+                if request is None:
+                    break
+                start_line, body = request
+                method, path, _ = start_line.split(" ", 2)
+                status, response = await self.handle_request(method, path, body)
+                writer.write(
+                    encode_http_message(
+                        f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                        json.dumps(response).encode(),
+                    )
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = HOST, port: int = PORT, unix_socket: str = None):
+        """
+        serve until cancelled
+        """
+        self.queue = asyncio.Queue()
+        batch_task = asyncio.create_task(self.batch_loop())
+        if unix_socket:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, unix_socket
+            )
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+
+async def read_http_message(
+    reader: asyncio.StreamReader,
+) -> Optional[Tuple[str, bytes]]:
+    """
+    read the start line and body of an HTTP message, None when the connection closed
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as error:
+        if error.partial:
+            raise
+        return None
+    start_line, *header_lines = head.decode("latin-1").split("\r\n")
+    content_length = 0
+    for header_line in header_lines:
+        name, _, value = header_line.partition(":")
+        if name.strip().lower() == "content-length":
+            content_length = int(value)
+    return start_line, await reader.readexactly(content_length)
+
+
+def encode_http_message(start_line: str, body: bytes, headers: str = "") -> bytes:
+    return (
+        f"{start_line}\r\n{headers}Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("latin-1") + body
+
+
+if __name__ == "__main__":
+    champion_path = resolve_champion_path(CHAMPION_PATH, FALLBACK_CHAMPION_PATH)
+    policy, input_size = load_policy(champion_path)
+    print(
+        f"serving {champion_path} on "
+        f"{UNIX_SOCKET or f'http://{HOST}:{PORT}'} (POST /act, GET /metrics)"
+    )
+    try:
+        asyncio.run(
+            BatchingServer(policy, input_size, MAX_BATCH_SIZE, MAX_DELAY).serve(
+                HOST, PORT, UNIX_SOCKET
+            )
+        )
+    except KeyboardInterrupt:
+        pass
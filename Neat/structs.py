@@ -1,11 +1,13 @@
-from typing import Dict, Iterator, List, NamedTuple, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Tuple
 
-import gym
 import numpy as np
 
+if TYPE_CHECKING:
+    import gym
+
 
 class Environments(NamedTuple):
-    environments: List[gym.Env]
+    environments: List["gym.Env"]
 
 
 class ConnectionWeights(NamedTuple):
@@ -23,25 +25,39 @@ class ConnectionStates(NamedTuple):
 
 
 class ConnectionDirections(NamedTuple):
+    """
+    source and destination node of each connection, activations holds the activation
+    genes of the network's nodes as (node, activation index) rows, nodes without a
+    gene use the sigmoid
+    """
+
     directions: np.ndarray
+    activations: np.ndarray = None
 
     def __iter__(self) -> Iterator[int]:
         return iter(self.directions)
 
 
 class ConnectionInnovationsMap(NamedTuple):
-    """maps a connection direction to an innovation number"""
+    """
+    maps a connection direction to an innovation number, with a registry (see
+    islands.InnovationRegistry) new numbers are taken from the registry so
+    populations sharing it agree on them
+    """
 
     innovations: Dict[Tuple[int, int], int]
+    registry: Any = None
 
 
 class NodeInnovationsMap(NamedTuple):
     """
     maps a split connection to the new node number that
-    represents splitting that connection
+    represents splitting that connection, new node numbers
+    are taken from the registry when there is one
     """
 
     innovations: Dict[Tuple[int, int], int]
+    registry: Any = None
 
 
 class BaseNodes(NamedTuple):
@@ -51,3 +67,116 @@ class BaseNodes(NamedTuple):
 
 
 # TODO: replace as much classes as possible with a custom type
+
+
+class CompiledNetworks(NamedTuple):
+    """
+    one or more networks flattened into evaluation layers, every node of every
+    network owns a slot in a shared value vector and each layer maps the slots
+    it reads (columns) to the slots it writes (rows). the rows of a layer are grouped
+    by activation, layer_activations holds an (activation index, start, stop) row
+    range per group (None when every node uses the sigmoid). networks with recurrent
+    connections are listed in recurrent_networks as (network index, directions,
+    weights, states) and evaluated with feed_forward instead of the layers
+    """
+
+    node_amount: int
+    input_slots: np.ndarray
+    bias_slots: np.ndarray
+    output_slots: np.ndarray
+    layer_rows: List[np.ndarray]
+    layer_columns: List[np.ndarray]
+    layer_weights: List[Any]
+    backend: str
+    dtype: type = np.float64
+    layer_activations: List[List[Tuple[int, int, int]]] = None
+    sigmoid_dtype: type = None
+    recurrent_networks: List[
+        Tuple[int, ConnectionDirections, ConnectionWeights, ConnectionStates]
+    ] = ()
+    base_nodes: BaseNodes = None
+
+
+class DTypePolicy(NamedTuple):
+    """
+    dtypes used to store genomes and evaluate networks, sigmoids are evaluated in the
+    sigmoid dtype when it is set (np.float32 approximates float64 networks faster)
+    """
+
+    weights: type = np.float64
+    nodes: type = np.int64
+    states: type = np.int8
+    sigmoid: type = None
+
+
+DEFAULT_DTYPE_POLICY = DTypePolicy()
+
+# halves the memory and bandwidth of large populations
+COMPACT_DTYPE_POLICY = DTypePolicy(np.float32, np.int32, np.int8)
+
+# float64 networks with float32 sigmoids, within 1e-6 of the exact sigmoid
+FAST_SIGMOID_DTYPE_POLICY = DTypePolicy(sigmoid=np.float32)
+
+
+class Species(NamedTuple):
+    """a species, its representative network and its history"""
+
+    species_id: int
+    rep_connection_directions: ConnectionDirections
+    rep_connection_weights: ConnectionWeights
+    age: int = 0
+    member_amount: int = 0
+    best_score: float = -np.inf
+    last_improvement_generation: int = 0
+
+
+class GenomeSummary(NamedTuple):
+    """cheap summary of a network used to bound the genetic distance between networks"""
+
+    connection_amount: int
+    max_node: int
+    fingerprint: np.ndarray
+
+
+class SpeciesHints(NamedTuple):
+    """
+    species index of the parent of each network and, when it is known, the genetic
+    distance of the network to that species' rep (nan otherwise)
+    """
+
+    species: np.ndarray
+    distances: np.ndarray
+
+
+class SharedPopulation(NamedTuple):
+    """
+    handle of a population concatenated into one shared memory block, small enough to
+    send to worker processes which map the block by name
+    """
+
+    name: str
+    network_amount: int
+    connection_amount: int
+    dtype_policy: DTypePolicy = DEFAULT_DTYPE_POLICY
+    activation_amount: int = 0
+
+
+class Substrate(NamedTuple):
+    """
+    coordinates of the nodes of each layer of a HyperNEAT substrate, from the input
+    layer to the output layer, every layer is connected to the next one
+    """
+
+    layer_coordinates: List[np.ndarray]
+
+
+class SubstrateNetworks(NamedTuple):
+    """
+    substrate networks generated by the CPPN of each genome, layer weights are
+    (networks, out, in) arrays for the dense backend or block diagonal
+    (networks * out, networks * in) csr matrices for the sparse backend
+    """
+
+    layer_weights: List[Any]
+    layer_biases: List[np.ndarray]
+    backend: str
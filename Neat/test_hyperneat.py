@@ -0,0 +1,121 @@
+import numpy as np
+
+from hyperneat import (
+    _express,
+    build_substrate_networks,
+    cppn_base_nodes,
+    feed_forward_substrate,
+    grid_substrate,
+)
+from logics import feed_forward
+from structs import ConnectionDirections, ConnectionStates, ConnectionWeights
+
+
+def generate_cppns(network_amount, base_nodes):
+    # every input and the bias feed a hidden node and both outputs
+    input_nodes = [-1, *base_nodes.input_nodes]
+    hidden_node = base_nodes.output_nodes.max() + 1
+    directions = np.array(
+        [
+            [source, destination]
+            for source in input_nodes
+            for destination in [*base_nodes.output_nodes, hidden_node]
+        ]
+        + [[hidden_node, output_node] for output_node in base_nodes.output_nodes]
+    )
+    return (
+        [ConnectionDirections(directions) for _ in range(network_amount)],
+        [
+            ConnectionWeights(np.random.normal(scale=2, size=len(directions)))
+            for _ in range(network_amount)
+        ],
+        [
+            ConnectionStates(np.ones(len(directions), dtype=np.int8))
+            for _ in range(network_amount)
+        ],
+    )
+
+
+def test_build_substrate_networks():
+    substrate = grid_substrate([3, 5, 2])
+    base_nodes = cppn_base_nodes(substrate)
+    assert base_nodes.input_nodes.size == 4 and base_nodes.output_nodes.size == 2
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+    ) = generate_cppns(3, base_nodes)
+    substrate_networks = build_substrate_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        substrate,
+    )
+    assert [weights.shape for weights in substrate_networks.layer_weights] == [
+        (3, 5, 3),
+        (3, 2, 5),
+    ]
+    assert [biases.shape for biases in substrate_networks.layer_biases] == [
+        (3, 5),
+        (3, 2),
+    ]
+
+    # every weight and bias is the expressed CPPN output of its query
+    for network in range(3):
+        cppn = (
+            networks_connection_directions[network],
+            networks_connection_weights[network],
+            networks_connection_states[network],
+            base_nodes,
+        )
+        for layer, (sources, destinations) in enumerate(
+            zip(substrate.layer_coordinates, substrate.layer_coordinates[1:])
+        ):
+            for destination_index, destination in enumerate(destinations):
+                for source_index, source in enumerate(sources):
+                    weight, _ = feed_forward(np.append(source, destination), *cppn)
+                    assert np.isclose(
+                        substrate_networks.layer_weights[layer][
+                            network, destination_index, source_index
+                        ],
+                        _express(weight, 0.2, 3.0),
+                    )
+                _, bias = feed_forward(np.append(np.zeros(2), destination), *cppn)
+                assert np.isclose(
+                    substrate_networks.layer_biases[layer][network, destination_index],
+                    _express(bias, 0.2, 3.0),
+                )
+
+    # weak outputs aren't expressed
+    assert _express(np.array([0.5, 0.55, 0.45]), 0.2, 3.0).tolist() == [0, 0, 0]
+    assert np.isclose(_express(1.0, 0.2, 3.0), 3.0)
+
+
+def test_feed_forward_substrate():
+    substrate = grid_substrate([4, 6, 6, 2])
+    base_nodes = cppn_base_nodes(substrate)
+    cppns = generate_cppns(5, base_nodes)
+    dense_networks = build_substrate_networks(*cppns, base_nodes, substrate)
+    sparse_networks = build_substrate_networks(
+        *cppns, base_nodes, substrate, backend="sparse"
+    )
+    inputs = np.random.normal(size=(3, 5, 4))
+
+    expected = []
+    for batch_inputs in inputs:
+        batch_outputs = []
+        for network, network_inputs in enumerate(batch_inputs):
+            values = network_inputs
+            for weights, biases in zip(
+                dense_networks.layer_weights, dense_networks.layer_biases
+            ):
+                values = 1 / (
+                    1 + np.exp(-(weights[network] @ values + biases[network]))
+                )
+            batch_outputs.append(values)
+        expected.append(batch_outputs)
+
+    assert np.allclose(feed_forward_substrate(inputs, dense_networks), expected)
+    assert np.allclose(feed_forward_substrate(inputs, sparse_networks), expected)
+    assert np.allclose(feed_forward_substrate(inputs[0], dense_networks), expected[0])
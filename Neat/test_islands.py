@@ -0,0 +1,152 @@
+from queue import Queue
+
+import numpy as np
+
+from islands import InnovationRegistry, _migration
+from logics import (
+    _split_node_id,
+    clear_species_hints,
+    register_connection_innovations,
+    split_into_species,
+)
+from structs import (
+    BaseNodes,
+    ConnectionDirections,
+    ConnectionInnovationsMap,
+    ConnectionStates,
+    ConnectionWeights,
+    NodeInnovationsMap,
+    Species,
+    SpeciesHints,
+)
+
+
+def test_innovation_registry():
+    registry = InnovationRegistry()
+    history_a = ConnectionInnovationsMap(dict(), registry)
+    history_b = ConnectionInnovationsMap(dict(), registry)
+
+    # histories sharing a registry agree on numbers whatever order they log in
+    register_connection_innovations(history_a, np.array([[0, 4], [1, 4]]))
+    register_connection_innovations(history_b, np.array([[2, 5], [1, 4], [2, 5]]))
+    register_connection_innovations(history_a, np.array([[2, 5]]))
+    assert history_a.innovations == {(0, 4): 0, (1, 4): 1, (2, 5): 2}
+    assert history_b.innovations == {(2, 5): 2, (1, 4): 1}
+
+    # without a registry numbers are local
+    local_history = ConnectionInnovationsMap(dict())
+    register_connection_innovations(local_history, np.array([[2, 5], [0, 4]]))
+    assert local_history.innovations == {(2, 5): 0, (0, 4): 1}
+
+    # split nodes are numbered after the output nodes
+    base_nodes = BaseNodes(np.arange(4), np.arange(4, 6))
+    node_history_a = NodeInnovationsMap(dict(), registry)
+    node_history_b = NodeInnovationsMap(dict(), registry)
+    assert _split_node_id(node_history_a, (0, 4), base_nodes) == 6
+    assert _split_node_id(node_history_b, (1, 4), base_nodes) == 7
+    assert _split_node_id(node_history_b, (0, 4), base_nodes) == 6
+    assert _split_node_id(NodeInnovationsMap(dict()), (1, 4), base_nodes) == 6
+
+
+def test_migration():
+    queues = [Queue(), Queue()]
+    migrations = [
+        _migration(queues[island], queues[1 - island], 2, 2) for island in (0, 1)
+    ]
+
+    def population(first_weight):
+        return (
+            [ConnectionDirections(np.array([[0, 2]])) for _ in range(4)],
+            [
+                ConnectionWeights(np.array([first_weight + network]))
+                for network in range(4)
+            ],
+            [ConnectionStates(np.array([1])) for _ in range(4)],
+            np.arange(4, dtype=float) + first_weight,
+        )
+
+    # nothing migrates between migration generations
+    assert migrations[0](0, *population(0)) is None
+    assert queues[1].empty()
+
+    # the first island to migrate has nothing to receive yet
+    assert migrations[0](1, *population(0)) is None
+    directions, weights, states, scores, replaced = migrations[1](1, *population(10))
+
+    # the best networks of island 0 replaced the worst networks of island 1
+    assert [network_weights.weights[0] for network_weights in weights] == [2, 3, 12, 13]
+    assert scores.tolist() == [2, 3, 12, 13]
+    assert replaced.tolist() == [0, 1]
+    assert [
+        migrant_weights[0] for _, migrant_weights, *_ in queues[0].get_nowait()
+    ] == [12, 13]
+
+
+def test_migration_into_hinted_network():
+    queues = [Queue(), Queue()]
+    migrations = [
+        _migration(queues[island], queues[1 - island], 1, 1) for island in (0, 1)
+    ]
+    connection_directions = ConnectionDirections(np.array([[0, 2]]))
+    connection_weights = ConnectionWeights(np.array([0.5]))
+    migrant_directions = ConnectionDirections(np.array([[0, 3], [1, 3], [1, 4]]))
+
+    # every network of island 1 is a child of species 0 with a known distance, and
+    # scores are tied so the migrant replaces the first network
+    migrations[0](
+        0,
+        [migrant_directions],
+        [ConnectionWeights(np.array([5.0, -5.0, 5.0]))],
+        [ConnectionStates(np.ones(3, dtype=bool))],
+        np.array([1.0]),
+    )
+    directions, weights, _, _, replaced = migrations[1](
+        0,
+        [connection_directions] * 3,
+        [connection_weights] * 3,
+        [ConnectionStates(np.array([1]))] * 3,
+        np.ones(3),
+    )
+    assert replaced.tolist() == [0]
+    species_hints = SpeciesHints(np.zeros(3, dtype=int), np.zeros(3))
+
+    global_innovation_history = ConnectionInnovationsMap(dict())
+    for network_directions in directions:
+        register_connection_innovations(
+            global_innovation_history, network_directions.directions
+        )
+    genetic_distance_parameters = {
+        "excess_constant": 1.0,
+        "disjoint_constant": 1.0,
+        "weight_bias_constant": 0.4,
+        "large_genome_size": 20,
+        "threshold": 3.0,
+    }
+    previous_species = [Species(0, connection_directions, connection_weights)]
+
+    # the hint of the replaced network would put the migrant into species 0
+    networks_species, _ = split_into_species(
+        directions,
+        weights,
+        global_innovation_history,
+        genetic_distance_parameters,
+        previous_generation_species=previous_species,
+        species_hints=species_hints,
+    )
+    assert networks_species.tolist() == [0, 0, 0]
+
+    # without it the migrant is compared with the rep and founds a new species
+    cleared_hints = clear_species_hints(species_hints, replaced)
+    assert cleared_hints.species.tolist() == [-1, 0, 0]
+    assert np.isnan(cleared_hints.distances[0])
+    assert species_hints.species.tolist() == [0, 0, 0]
+    networks_species, species = split_into_species(
+        directions,
+        weights,
+        global_innovation_history,
+        genetic_distance_parameters,
+        previous_generation_species=previous_species,
+        species_hints=cleared_hints,
+    )
+    assert networks_species.tolist() == [1, 0, 0]
+    assert len(species) == 2
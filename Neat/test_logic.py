@@ -1,9 +1,13 @@
+import os
+import subprocess
+import sys
+from multiprocessing import Pool
+
 import numpy as np
 import pytest
 import gym
-import matplotlib.pyplot as plt
-import pygraphviz as pgv
 
+import logics
 from logics import (
     Environments,
     BaseNodes,
@@ -13,11 +17,42 @@ from logics import (
     ConnectionInnovationsMap,
     NodeInnovationsMap,
     feed_forward,
+    compile_networks,
+    draw_episode_seeds,
+    feed_forward_compiled,
     evaluate_networks,
+    evaluate_networks_parallel,
+    evaluate_networks_racing,
+    share_population,
+    attach_population,
+    _evaluate_shared_networks,
+    _worker_environments,
+    population_memory_report,
     split_into_species,
+    update_species,
+    compact_innovation_history,
     new_generation,
+    register_connection_innovations,
+    _genetic_distance,
+    _crossover,
+    _mutate,
+    _sigmoid,
+    ACTIVATION_FUNCTIONS,
+    load_champion,
+    save_champion,
+)
+from main import training_loop
+from structs import (
+    COMPACT_DTYPE_POLICY,
+    DEFAULT_DTYPE_POLICY,
+    FAST_SIGMOID_DTYPE_POLICY,
+    SpeciesHints,
 )
 
+# import time budget of the core modules on top of numpy, relative to the import time
+# of numpy
+CORE_IMPORT_NUMPY_RATIO = 2.0
+
 
 def generate_temp_network(
     network_amount=1,
@@ -101,6 +136,461 @@ def test_feed_forward():
     assert np.sum(result) > 0
 
 
+def generate_feed_forward_network(
+    network_amount=1, input_amount=4, output_amount=2, hidden_amount=6, density=0.5,
+):
+    # nodes are ordered inputs, bias, hidden, outputs and connections only lead
+    # forward in that order, so the networks have no recurrent connections
+    hidden_nodes = np.arange(
+        input_amount + output_amount, input_amount + output_amount + hidden_amount
+    )
+    output_nodes = np.arange(input_amount, input_amount + output_amount)
+    ordered_nodes = np.concatenate(
+        (np.arange(input_amount), [-1], hidden_nodes, output_nodes)
+    )
+    source_positions, destination_positions = np.triu_indices(ordered_nodes.size, 1)
+    possible_connections = np.stack(
+        (ordered_nodes[source_positions], ordered_nodes[destination_positions]), -1
+    )
+    possible_connections = possible_connections[
+        possible_connections[:, 1] >= input_amount
+    ]
+
+    networks_connection_directions = []
+    networks_connection_weights = []
+    networks_connection_states = []
+    for _ in range(network_amount):
+        connections = possible_connections[
+            np.random.random(possible_connections.shape[0]) < density
+        ]
+        networks_connection_directions.append(ConnectionDirections(connections))
+        networks_connection_weights.append(
+            ConnectionWeights(np.random.normal(size=connections.shape[0]))
+        )
+        networks_connection_states.append(
+            ConnectionStates(np.random.randint(2, size=connections.shape[0]))
+        )
+    base_nodes = BaseNodes(np.arange(input_amount), output_nodes)
+    return (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    )
+
+
+@pytest.mark.parametrize("backend", ["auto", "dense", "sparse", "scalar"])
+def test_feed_forward_compiled(backend):
+    network_amount = 5
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount)
+    inputs = np.random.random(size=(3, network_amount, base_nodes.input_nodes.size))
+
+    compiled_networks = compile_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        backend,
+    )
+    result = feed_forward_compiled(inputs, compiled_networks)
+
+    expected = np.array(
+        [
+            [
+                feed_forward(
+                    network_inputs,
+                    connection_directions,
+                    connection_weights,
+                    connection_states,
+                    base_nodes,
+                )
+                for (
+                    network_inputs,
+                    connection_directions,
+                    connection_weights,
+                    connection_states,
+                ) in zip(
+                    batch_inputs,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                )
+            ]
+            for batch_inputs in inputs
+        ]
+    )
+    assert np.allclose(result, expected)
+    assert np.allclose(feed_forward_compiled(inputs[0], compiled_networks), expected[0])
+
+
+@pytest.mark.parametrize("backend", ["auto", "dense", "sparse", "scalar"])
+def test_feed_forward_compiled_recurrent(backend):
+    network_amount = 4
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount)
+
+    # a cycle through a hidden node and a self loop on an output node
+    recurrent_directions = np.array(
+        [[0, 6], [1, 6], [6, 4], [4, 6], [2, 5], [5, 5], [6, 5], [-1, 4]]
+    )
+    networks_connection_directions[1] = ConnectionDirections(recurrent_directions)
+    networks_connection_weights[1] = ConnectionWeights(
+        np.random.normal(size=recurrent_directions.shape[0])
+    )
+    networks_connection_states[1] = ConnectionStates(
+        np.ones(recurrent_directions.shape[0], dtype=int)
+    )
+    inputs = np.random.random(size=(3, network_amount, base_nodes.input_nodes.size))
+
+    compiled_networks = compile_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        backend,
+    )
+    assert [
+        network_index for network_index, *_ in compiled_networks.recurrent_networks
+    ] == [1]
+    result = feed_forward_compiled(inputs, compiled_networks)
+
+    expected = np.array(
+        [
+            [
+                feed_forward(
+                    network_inputs,
+                    connection_directions,
+                    connection_weights,
+                    connection_states,
+                    base_nodes,
+                )
+                for (
+                    network_inputs,
+                    connection_directions,
+                    connection_weights,
+                    connection_states,
+                ) in zip(
+                    batch_inputs,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                )
+            ]
+            for batch_inputs in inputs
+        ]
+    )
+    assert np.allclose(result, expected)
+    assert np.allclose(feed_forward_compiled(inputs[0], compiled_networks), expected[0])
+
+
+def add_activation_genes(networks_connection_directions, base_nodes):
+    # every node except the inputs and the bias gets a random activation gene
+    genes_networks_connection_directions = []
+    for connection_directions in networks_connection_directions:
+        nodes = np.setdiff1d(
+            np.union1d(connection_directions.directions, base_nodes.output_nodes),
+            np.append(base_nodes.input_nodes, base_nodes.bias_node),
+        )
+        genes_networks_connection_directions.append(
+            ConnectionDirections(
+                connection_directions.directions,
+                np.stack(
+                    (
+                        nodes,
+                        np.random.randint(len(ACTIVATION_FUNCTIONS), size=nodes.size),
+                    ),
+                    -1,
+                ),
+            )
+        )
+    return genes_networks_connection_directions
+
+
+@pytest.mark.parametrize("backend", ["dense", "sparse", "scalar"])
+def test_activation_genes(backend):
+    network_amount = 5
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount, hidden_amount=20)
+    networks_connection_directions = add_activation_genes(
+        networks_connection_directions, base_nodes
+    )
+
+    # networks without genes use the sigmoid
+    networks_connection_directions[0] = ConnectionDirections(
+        networks_connection_directions[0].directions
+    )
+    inputs = np.random.random(size=(3, network_amount, base_nodes.input_nodes.size))
+
+    compiled_networks = compile_networks(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        backend,
+    )
+    expected = np.array(
+        [
+            [
+                feed_forward(
+                    network_inputs,
+                    connection_directions,
+                    connection_weights,
+                    connection_states,
+                    base_nodes,
+                )
+                for (
+                    network_inputs,
+                    connection_directions,
+                    connection_weights,
+                    connection_states,
+                ) in zip(
+                    batch_inputs,
+                    networks_connection_directions,
+                    networks_connection_weights,
+                    networks_connection_states,
+                )
+            ]
+            for batch_inputs in inputs
+        ]
+    )
+    assert np.allclose(feed_forward_compiled(inputs, compiled_networks), expected)
+
+    # each layer is split into one contiguous row range per activation
+    for rows, activation_ranges in zip(
+        compiled_networks.layer_rows, compiled_networks.layer_activations
+    ):
+        activations = [activation for activation, _, _ in activation_ranges]
+        assert activations == sorted(set(activations))
+        assert activation_ranges[0][1] == 0 and activation_ranges[-1][2] == rows.size
+        assert all(
+            stop == next_start
+            for (_, _, stop), (_, next_start, _) in zip(
+                activation_ranges, activation_ranges[1:]
+            )
+        )
+    assert any(
+        len(activation_ranges) > 1
+        for activation_ranges in compiled_networks.layer_activations
+    )
+
+
+def test_fast_sigmoid():
+    x = np.linspace(-50, 50, 100_001)
+    exact = 1.0 / (1.0 + np.exp(-x))
+    assert np.array_equal(_sigmoid(x), exact)
+
+    # float32 sigmoids stay within 1e-6 of the exact sigmoid
+    fast = _sigmoid(x, np.float32)
+    assert fast.dtype == np.float64
+    assert np.abs(fast - exact).max() < 1e-6
+
+    network_amount = 5
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount, hidden_amount=20)
+    inputs = np.random.random(size=(network_amount, base_nodes.input_nodes.size))
+    results = [
+        feed_forward_compiled(
+            inputs,
+            compile_networks(
+                networks_connection_directions,
+                networks_connection_weights,
+                networks_connection_states,
+                base_nodes,
+                dtype_policy=dtype_policy,
+            ),
+        )
+        for dtype_policy in (DEFAULT_DTYPE_POLICY, FAST_SIGMOID_DTYPE_POLICY)
+    ]
+    assert results[1].dtype == np.float64
+    assert np.abs(results[0] - results[1]).max() < 1e-5
+
+
+def test_activation_mutation(tmp_path):
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(2)
+    genes_networks_connection_directions = add_activation_genes(
+        networks_connection_directions, base_nodes
+    )
+    mutation_parameters = {
+        "permutation_rate": 0.0,
+        "random_weight_rate": 0.0,
+        "new_connection_rate": 0.0,
+        "split_connection_rate": 0.0,
+        "activation_mutation_rate": 1.0,
+    }
+
+    # networks without genes get a gene for a node that isn't an input or the bias
+    mutated_directions, _, _ = _mutate(
+        networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+        ConnectionInnovationsMap(dict()),
+        NodeInnovationsMap(dict()),
+        mutation_parameters,
+    )
+    ((node_id, activation),) = mutated_directions.activations
+    assert node_id not in base_nodes.input_nodes and node_id != base_nodes.bias_node
+    assert 0 <= activation < len(ACTIVATION_FUNCTIONS)
+
+    # a mutation replaces one gene and keeps the others
+    genes = genes_networks_connection_directions[0].activations
+    mutated_directions, _, _ = _mutate(
+        genes_networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+        ConnectionInnovationsMap(dict()),
+        NodeInnovationsMap(dict()),
+        mutation_parameters,
+    )
+    mutated_genes = dict(map(tuple, mutated_directions.activations))
+    assert sorted(mutated_genes) == sorted(genes[:, 0])
+    assert sum(mutated_genes[node_id] != gene for node_id, gene in genes) <= 1
+
+    # children only inherit genes of their own nodes from their parents
+    child_directions, _, _ = _crossover(
+        genes_networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        genes_networks_connection_directions[1],
+        networks_connection_weights[1],
+        networks_connection_states[1],
+        {},
+        {"disable_connection_rate": 0.75},
+    )
+    parent_genes = [
+        set(map(tuple, connection_directions.activations))
+        for connection_directions in genes_networks_connection_directions
+    ]
+    for node_id, activation in child_directions.activations:
+        assert node_id in child_directions.directions
+        assert (node_id, activation) in parent_genes[0] | parent_genes[1]
+
+    # genes are shared with workers and saved with champions
+    shared_memory, shared_population = share_population(
+        genes_networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+    )
+    attached_memory, directions, _, _ = attach_population(shared_population)
+    for connection_directions, attached_directions in zip(
+        genes_networks_connection_directions, directions
+    ):
+        assert np.array_equal(
+            connection_directions.activations, attached_directions.activations
+        )
+    del directions, attached_directions
+    attached_memory.close()
+    shared_memory.close()
+    shared_memory.unlink()
+
+    save_champion(
+        tmp_path / "champion.npz",
+        genes_networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+    )
+    assert np.array_equal(
+        load_champion(tmp_path / "champion.npz")[0].activations,
+        genes_networks_connection_directions[0].activations,
+    )
+
+
+def test_compact_dtype_policy():
+    network_amount = 5
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount, hidden_amount=20)
+    inputs = np.random.random(size=(network_amount, base_nodes.input_nodes.size))
+
+    results = []
+    for dtype_policy in (DEFAULT_DTYPE_POLICY, COMPACT_DTYPE_POLICY):
+        compiled_networks = compile_networks(
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+            dtype_policy=dtype_policy,
+        )
+        results.append(feed_forward_compiled(inputs, compiled_networks))
+    assert results[1].dtype == np.float32
+    assert np.allclose(results[0], results[1], atol=1e-5)
+
+    # mutation and crossover keep the networks in the policy dtypes
+    compact_networks = [
+        (
+            ConnectionDirections(connection_directions.directions.astype(np.int32)),
+            ConnectionWeights(connection_weights.weights.astype(np.float32)),
+            ConnectionStates(connection_states.states.astype(np.int8)),
+        )
+        for connection_directions, connection_weights, connection_states in zip(
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+        )
+    ]
+    child = _crossover(
+        *compact_networks[0],
+        *compact_networks[1],
+        {},
+        {"disable_connection_rate": 0.75},
+        COMPACT_DTYPE_POLICY,
+    )
+    innovations = {}
+    for connection_directions, _, _ in compact_networks:
+        for connection in map(tuple, connection_directions.directions):
+            innovations.setdefault(connection, len(innovations))
+    child = _mutate(
+        *child,
+        base_nodes,
+        ConnectionInnovationsMap(innovations),
+        NodeInnovationsMap(dict()),
+        {
+            "permutation_rate": 0.7,
+            "random_weight_rate": 0.1,
+            "new_connection_rate": 1.0,
+            "split_connection_rate": 1.0,
+        },
+        COMPACT_DTYPE_POLICY,
+    )
+    assert child[0].directions.dtype == np.int32
+    assert child[1].weights.dtype == np.float32
+    assert child[2].states.dtype == np.int8
+
+    report = population_memory_report(*zip(*compact_networks))
+    assert report["weights"] * 2 == population_memory_report(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+    )["weights"]
+
+
 def test_evaluate_network():
     network_amount = 10
     environments = Environments(
@@ -126,6 +616,368 @@ def test_evaluate_network():
     print(result)
 
 
+class NoisyEnvironment:
+    """five step episodes with a constant observation, rewards are the action plus noise"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.steps = 0
+
+    def reset(self):
+        self.steps = 0
+        return np.ones(4)
+
+    def step(self, action):
+        self.steps += 1
+        return np.ones(4), action + self.rng.normal(scale=0.1), self.steps == 5, {}
+
+    def close(self):
+        pass
+
+
+class ConstantEnvironment(NoisyEnvironment):
+    """five step episodes with a constant observation, rewards are the action"""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def step(self, action):
+        self.steps += 1
+        return np.ones(4), action, self.steps == 5, {}
+
+
+def test_evaluate_networks_racing():
+    np.random.seed(0)
+    rng = np.random.default_rng(0)
+    network_amount = 30
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount)
+    environments = Environments([NoisyEnvironment(rng) for _ in range(network_amount)])
+    actions = feed_forward_compiled(
+        np.ones((network_amount, 4)),
+        compile_networks(
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+        ),
+    ).argmax(axis=1)
+    assert 0 < actions.sum() < network_amount
+
+    scores, episode_counts = evaluate_networks_racing(
+        environments,
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        max_steps=10,
+        initial_episodes=2,
+        max_episodes=8,
+        cutoff_quantile=0.2,
+    )
+    assert np.allclose(scores, 5 * actions, atol=0.5)
+
+    # the cutoff is among the networks choosing action 0, networks choosing action 1
+    # are far above it and stop after the initial episodes
+    assert (actions == 0).mean() > 0.2
+    assert (episode_counts >= 2).all() and (episode_counts <= 8).all()
+    assert (episode_counts[actions == 1] == 2).all()
+    assert episode_counts[actions == 0].max() > 2
+
+    # the step budget stops racing after the round that exceeds it
+    _, budget_counts = evaluate_networks_racing(
+        environments,
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        max_steps=10,
+        initial_episodes=2,
+        max_episodes=8,
+        cutoff_quantile=0.2,
+        step_budget=2 * 5 * network_amount + 1,
+    )
+    assert budget_counts.sum() <= episode_counts.sum()
+    assert budget_counts.sum() <= 3 * network_amount
+
+    # racing only runs in the training process on direct encodings
+    for unsupported_parameters in (
+        {"workers": 2},
+        {"substrate_hidden_layers": []},
+    ):
+        with pytest.raises(ValueError):
+            training_loop(
+                "CartPole-v0",
+                network_amount,
+                1,
+                {},
+                {},
+                {},
+                racing_parameters={"max_episodes": 3},
+                **unsupported_parameters,
+            )
+
+
+def test_evaluate_networks_racing_rounds(monkeypatch):
+    network_amount = 30
+    for seed in range(5):
+        np.random.seed(seed)
+        rng = np.random.default_rng(seed)
+        (
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+        ) = generate_feed_forward_network(network_amount)
+
+        # record the networks compiled for each round
+        rounds = []
+
+        def record_compile_networks(
+            networks_connection_directions, networks_connection_weights, *arguments
+        ):
+            rounds.append({id(weights) for weights in networks_connection_weights})
+            return compile_networks(
+                networks_connection_directions, networks_connection_weights, *arguments
+            )
+
+        monkeypatch.setattr(logics, "compile_networks", record_compile_networks)
+        _, episode_counts = evaluate_networks_racing(
+            Environments([NoisyEnvironment(rng) for _ in range(network_amount)]),
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+            max_steps=10,
+            initial_episodes=2,
+            max_episodes=8,
+            cutoff_quantile=0.5,
+        )
+        monkeypatch.undo()
+
+        # networks that stopped racing never race again, so the k-th episode of
+        # every network is the k-th episode of the round
+        assert all(
+            later_round <= earlier_round
+            for earlier_round, later_round in zip(rounds, rounds[1:])
+        )
+        assert episode_counts.max() == len(rounds) + 1
+
+
+def test_evaluate_networks_racing_equal_rewards():
+    np.random.seed(0)
+    network_amount = 30
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount)
+    actions = feed_forward_compiled(
+        np.ones((network_amount, 4)),
+        compile_networks(
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+        ),
+    ).argmax(axis=1)
+    assert (actions == 0).mean() > 0.2 and actions.sum() > 0
+
+    # networks with equal rewards on the cutoff keep racing, the others are far from
+    # it even with the standard deviation floor
+    _, episode_counts = evaluate_networks_racing(
+        Environments([ConstantEnvironment() for _ in range(network_amount)]),
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        max_steps=10,
+        initial_episodes=2,
+        max_episodes=6,
+        cutoff_quantile=0.2,
+    )
+    assert (episode_counts[actions == 0] == 6).all()
+    assert (episode_counts[actions == 1] == 2).all()
+
+
+def test_evaluate_networks_common_random_numbers():
+    network_amount = 6
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(network_amount)
+
+    # the second half of the population repeats the first half
+    networks_connection_directions *= 2
+    networks_connection_weights *= 2
+    networks_connection_states *= 2
+    environments = Environments(
+        [gym.make("CartPole-v0") for _ in range(2 * network_amount)]
+    )
+    episode_seeds = draw_episode_seeds(np.random.default_rng(0), 3)
+
+    def evaluate():
+        return evaluate_networks(
+            environments,
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+            200,
+            len(episode_seeds),
+            episode_seeds=episode_seeds,
+        )
+
+    # equal networks score equally and evaluations are reproducible
+    scores = evaluate()
+    assert (scores[:network_amount] == scores[network_amount:]).all()
+    assert (scores == evaluate()).all()
+
+    # workers reproduce the same starts
+    with Pool(2) as pool:
+        parallel_scores = evaluate_networks_parallel(
+            pool,
+            "CartPole-v0",
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+            200,
+            len(episode_seeds),
+            chunks=3,
+            episode_seeds=episode_seeds,
+        )
+    assert (parallel_scores == scores).all()
+
+def test_share_population():
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        _,
+        _,
+        _,
+    ) = generate_temp_network(5)
+
+    # empty networks take no space in the shared block
+    networks_connection_directions[2] = ConnectionDirections(np.zeros((0, 2), int))
+    networks_connection_weights[2] = ConnectionWeights(np.zeros(0))
+    networks_connection_states[2] = ConnectionStates(np.zeros(0, int))
+
+    shared_memory, shared_population = share_population(
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+    )
+    assert shared_population.connection_amount == 80
+
+    # a slice of the population maps back to the same networks
+    attached_memory, directions, weights, states = attach_population(
+        shared_population, 1, 4
+    )
+    for index, (connection_directions, connection_weights, connection_states) in zip(
+        range(1, 4), zip(directions, weights, states)
+    ):
+        assert (
+            connection_directions.directions
+            == networks_connection_directions[index].directions
+        ).all()
+        assert (
+            connection_weights.weights == networks_connection_weights[index].weights
+        ).all()
+        assert (
+            connection_states.states == networks_connection_states[index].states
+        ).all()
+    assert len(directions) == 3 and directions[1].directions.shape == (0, 2)
+
+    del directions, weights, states, connection_directions, connection_weights
+    del connection_states
+    attached_memory.close()
+    shared_memory.close()
+    shared_memory.unlink()
+
+
+def test_evaluate_networks_parallel():
+    network_amount = 10
+    (
+        networks_connections,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        _,
+        _,
+    ) = generate_temp_network(network_amount)
+    with Pool(2) as pool:
+        result = evaluate_networks_parallel(
+            pool,
+            "CartPole-v0",
+            networks_connections,
+            networks_connection_weights,
+            networks_connection_states,
+            base_nodes,
+            200,
+            2,
+            chunks=3,
+        )
+    assert result.shape == (network_amount,)
+    assert ((result >= 1) & (result <= 200)).all()
+
+
+def test_evaluate_shared_networks():
+    network_amount = 4
+    (
+        networks_connections,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        _,
+        _,
+    ) = generate_temp_network(network_amount)
+    shared_memory, shared_population = share_population(
+        networks_connections, networks_connection_weights, networks_connection_states
+    )
+    try:
+        # errors of the evaluation aren't masked by closing the block
+        with pytest.raises(ValueError):
+            _evaluate_shared_networks(
+                shared_population,
+                0,
+                network_amount,
+                "CartPole-v0",
+                BaseNodes(np.arange(3), base_nodes.output_nodes),
+                20,
+                1,
+                1,
+                "auto",
+            )
+
+        # the environments of the worker are kept between calls
+        environments = list(_worker_environments["CartPole-v0"])
+        scores = _evaluate_shared_networks(
+            shared_population,
+            0,
+            network_amount,
+            "CartPole-v0",
+            base_nodes,
+            20,
+            1,
+            1,
+            "auto",
+        )
+        assert scores.shape == (network_amount,)
+        assert _worker_environments["CartPole-v0"] == environments
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+
 def test_split_into_species():
     network_amount = 100
     (
@@ -154,6 +1006,280 @@ def test_split_into_species():
     print(result)
 
 
+def test_split_into_species_pruning():
+    network_amount = 60
+    (
+        networks_connections,
+        networks_connection_weights,
+        _,
+        _,
+        global_innovation_history,
+        _,
+    ) = generate_temp_network(
+        network_amount=network_amount, max_hidden_amount=4, connection_amount=8
+    )
+    genetic_distance_parameters = {
+        "excess_constant": 1.0,
+        "disjoint_constant": 1.0,
+        "weight_bias_constant": 0.4,
+        "large_genome_size": 20,
+        "threshold": 12.0,
+    }
+    metrics = {}
+    result, species = split_into_species(
+        networks_connections,
+        networks_connection_weights,
+        global_innovation_history,
+        genetic_distance_parameters,
+        metrics=metrics,
+    )
+
+    # compare every network with every rep in order, without pruning
+    expected = []
+    reps = []
+    for connections, connection_weights in zip(
+        networks_connections, networks_connection_weights
+    ):
+        for rep_index, (rep_connections, rep_connection_weights) in enumerate(reps):
+            if (
+                _genetic_distance(
+                    connections,
+                    connection_weights,
+                    rep_connections,
+                    rep_connection_weights,
+                    global_innovation_history,
+                    genetic_distance_parameters,
+                )
+                < genetic_distance_parameters["threshold"]
+            ):
+                expected.append(rep_index)
+                break
+        else:
+            expected.append(len(reps))
+            reps.append((connections, connection_weights))
+
+    assert result.tolist() == expected
+    assert len(species) == len(reps)
+    assert metrics["pruned"] > 0
+    assert metrics["pruned"] + metrics["distances"] == metrics["comparisons"]
+
+
+def test_genetic_distance_activations():
+    directions = np.array([[0, 2], [1, 2], [0, 3]])
+    weights = ConnectionWeights(np.array([0.5, -0.5, 1.0]))
+    global_innovation_history = ConnectionInnovationsMap(dict())
+    register_connection_innovations(global_innovation_history, directions)
+    genetic_distance_parameters = {
+        "excess_constant": 1.0,
+        "disjoint_constant": 1.0,
+        "weight_bias_constant": 0.4,
+        "activation_constant": 2.0,
+        "large_genome_size": 20,
+    }
+
+    def distance(activations_a, activations_b, parameters=genetic_distance_parameters):
+        return _genetic_distance(
+            ConnectionDirections(directions, activations_a),
+            weights,
+            ConnectionDirections(directions, activations_b),
+            weights,
+            global_innovation_history,
+            parameters,
+        )
+
+    # one of the four shared nodes has another activation, explicit sigmoid genes
+    # match nodes without a gene and genes of nodes that aren't shared don't count
+    assert distance(None, None) == 0
+    assert distance(np.array([[2, 1]]), None) == 2.0 * 0.25
+    assert distance(np.array([[2, 1], [3, 0]]), np.array([[2, 4], [9, 2]])) == 0.5
+    assert distance(np.array([[2, 1], [2, 0]]), None) == 0
+
+    # without an activation constant activations are ignored
+    parameters = dict(genetic_distance_parameters)
+    del parameters["activation_constant"]
+    assert distance(np.array([[2, 1]]), None, parameters) == 0
+
+
+def test_split_into_species_hints():
+    (
+        networks_connections,
+        networks_connection_weights,
+        _,
+        _,
+        global_innovation_history,
+        _,
+    ) = generate_temp_network(network_amount=3, connection_amount=10)
+    genetic_distance_parameters = {
+        "excess_constant": 1.0,
+        "disjoint_constant": 1.0,
+        "weight_bias_constant": 0.4,
+        "large_genome_size": 20,
+        "threshold": 100.0,
+    }
+
+    # every network fits the first species with this threshold
+    _, species = split_into_species(
+        networks_connections[:1],
+        networks_connection_weights[:1],
+        global_innovation_history,
+        genetic_distance_parameters,
+    )
+    species.append(species[0]._replace(species_id=1))
+    species.append(species[0]._replace(species_id=2))
+
+    # a known distance skips all comparisons, an unknown one tests the hint first
+    metrics = {}
+    result, _ = split_into_species(
+        networks_connections,
+        networks_connection_weights,
+        global_innovation_history,
+        genetic_distance_parameters,
+        previous_generation_species=species,
+        metrics=metrics,
+        species_hints=SpeciesHints(
+            np.array([2, 1, -1]), np.array([0.0, np.nan, np.nan])
+        ),
+    )
+    assert result.tolist() == [2, 1, 0]
+    assert metrics["hinted"] == 2
+    assert metrics["comparisons"] == 2
+
+
+def test_update_species():
+    (
+        networks_connections,
+        networks_connection_weights,
+        _,
+        _,
+        global_innovation_history,
+        _,
+    ) = generate_temp_network(network_amount=6, connection_amount=10)
+    genetic_distance_parameters = {
+        "excess_constant": 1.0,
+        "disjoint_constant": 1.0,
+        "weight_bias_constant": 0.4,
+        "large_genome_size": 20,
+        "threshold": 0.5,
+    }
+
+    # the first three networks found species, only the last three are members
+    networks_species, species = split_into_species(
+        networks_connections[:3],
+        networks_connection_weights[:3],
+        global_innovation_history,
+        genetic_distance_parameters,
+    )
+    networks_species, species = split_into_species(
+        networks_connections[:1] + networks_connections[2:],
+        networks_connection_weights[:1] + networks_connection_weights[2:],
+        global_innovation_history,
+        genetic_distance_parameters,
+        previous_generation_species=species,
+    )
+    networks_scores = np.arange(networks_species.size, dtype=float)
+    live_species, live_networks_species = update_species(
+        species,
+        networks_species,
+        networks_connections[:1] + networks_connections[2:],
+        networks_connection_weights[:1] + networks_connection_weights[2:],
+        networks_scores,
+        generation=1,
+    )
+
+    # the species of the second network has no members and is retired
+    assert [live.species_id for live in live_species] == [
+        existing.species_id
+        for species_index, existing in enumerate(species)
+        if species_index in networks_species
+    ]
+    assert 1 not in [live.species_id for live in live_species]
+    assert live_networks_species.max() == len(live_species) - 1
+    for species_index, live in enumerate(live_species):
+        members = np.where(live_networks_species == species_index)[0]
+        champion = members[networks_scores[members].argmax()]
+        assert live.member_amount == members.size
+        assert live.best_score == networks_scores[champion]
+        assert live.last_improvement_generation == 1
+
+
+def test_compact_innovation_history():
+    (
+        networks_connections,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+        global_innovation_history,
+        global_node_innovation_history,
+    ) = generate_temp_network(network_amount=4, connection_amount=10)
+    global_node_innovation_history.innovations.update({(0, 4): 10, (1, 5): 11})
+    all_innovations = dict(global_innovation_history.innovations)
+    newest_innovation = max(all_innovations.values())
+
+    # only the first network and the rep of one species survive
+    _, species = split_into_species(
+        networks_connections[1:2],
+        networks_connection_weights[1:2],
+        global_innovation_history,
+        {
+            "excess_constant": 1.0,
+            "disjoint_constant": 1.0,
+            "weight_bias_constant": 0.4,
+            "large_genome_size": 20,
+            "threshold": 3.0,
+        },
+    )
+    connection_history_size, node_history_size = compact_innovation_history(
+        global_innovation_history,
+        global_node_innovation_history,
+        networks_connections[:1],
+        species,
+    )
+
+    live_connections = set(
+        map(
+            tuple,
+            np.concatenate(
+                (networks_connections[0].directions, networks_connections[1].directions)
+            ).tolist(),
+        )
+    )
+    assert set(global_innovation_history.innovations) == live_connections | {
+        connection
+        for connection, innovation in all_innovations.items()
+        if innovation == newest_innovation
+    }
+    assert connection_history_size == len(global_innovation_history.innovations)
+    assert all(
+        global_innovation_history.innovations[connection] == all_innovations[connection]
+        for connection in global_innovation_history.innovations
+    )
+
+    # node 11 is the newest node innovation, so it is kept even if it isn't alive
+    assert 11 in global_node_innovation_history.innovations.values()
+    assert node_history_size == len(global_node_innovation_history.innovations)
+
+    # new innovations are still numbered after all surviving innovations
+    new_connection_directions, _, _ = _mutate(
+        ConnectionDirections(np.array([[0, 4]])),
+        ConnectionWeights(np.array([1.0])),
+        ConnectionStates(np.array([1])),
+        base_nodes,
+        global_innovation_history,
+        global_node_innovation_history,
+        {
+            "permutation_rate": 0.0,
+            "random_weight_rate": 0.0,
+            "new_connection_rate": 1.0,
+            "split_connection_rate": 0.0,
+        },
+    )
+    new_connection = tuple(new_connection_directions.directions[-1])
+    if new_connection not in all_innovations:
+        assert global_innovation_history.innovations[new_connection] == (
+            newest_innovation + 1
+        )
+
+
 def test_new_generation():
 
     # parameters
@@ -199,8 +1325,9 @@ def test_new_generation():
         connection_amount=0,
     )
 
-    # initialize species reps as an empty list
-    species_reps = []
+    # initialize species as an empty list
+    species = []
+    species_hints = None
 
     # logging
     average_scores = []
@@ -226,14 +1353,24 @@ def test_new_generation():
         average_scores.append(np.average(networks_scores))
         max_scores.append(np.max(networks_scores))
 
-        # split into species, and get the new species reps
-        networks_species, species_reps = split_into_species(
+        # split into species, and refresh the species reps
+        networks_species, species = split_into_species(
             networks_connection_directions,
             networks_connection_weights,
             global_innovation_history,
             genetic_distance_parameters,
-            previous_generation_species_reps=species_reps,
+            previous_generation_species=species,
+            species_hints=species_hints,
         )
+        species, networks_species = update_species(
+            species,
+            networks_species,
+            networks_connection_directions,
+            networks_connection_weights,
+            networks_scores,
+            generation,
+        )
+        assert len(species) == np.unique(networks_species).size
 
         # generate new networks
         (
@@ -241,6 +1378,7 @@ def test_new_generation():
             networks_connection_weights,
             networks_connection_states,
             global_innovation_history,
+            species_hints,
         ) = new_generation(
             networks_connection_directions,
             networks_connection_weights,
@@ -256,8 +1394,40 @@ def test_new_generation():
         )
 
     # plot results
+    import matplotlib.pyplot as plt
+
     plt.plot(average_scores, label="avg")
     plt.plot(max_scores, label="max")
     plt.legend()
     plt.title(f"Score history from training for {generations} generations")
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+
+def test_core_import_time():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import structs, logics"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # lines look like "import time: self [us] | cumulative | imported package"
+    cumulative_times = {}
+    top_level_time = 0
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split("|")
+        cumulative_times[name.strip()] = int(cumulative)
+        if not name.startswith("  "):
+            top_level_time += int(cumulative)
+
+    # heavy optional dependencies are only imported by the functions using them
+    for heavy_module in ("gym", "scipy", "matplotlib", "pygraphviz"):
+        assert heavy_module not in cumulative_times
+
+    # relative to numpy so a loaded machine slows both sides, the core modules take
+    # well under numpy's own import time
+    assert (
+        top_level_time - cumulative_times["numpy"]
+        < CORE_IMPORT_NUMPY_RATIO * cumulative_times["numpy"]
+    )
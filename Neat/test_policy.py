@@ -0,0 +1,167 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from logics import feed_forward, freeze_neat, save_champion
+from policy import evaluate_frozen_policy, freeze_champion, load_frozen_policy
+from structs import BaseNodes, ConnectionDirections, ConnectionStates, ConnectionWeights
+from test_logic import add_activation_genes, generate_feed_forward_network
+
+
+def test_freeze_neat(tmp_path):
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(1)
+    freeze_neat(
+        tmp_path / "policy.npy",
+        networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+    )
+    frozen_policy = load_frozen_policy(tmp_path / "policy.npy")
+    observations = np.random.random(size=(5, base_nodes.input_nodes.size))
+
+    expected = [
+        feed_forward(
+            observation,
+            networks_connection_directions[0],
+            networks_connection_weights[0],
+            networks_connection_states[0],
+            base_nodes,
+        )
+        for observation in observations
+    ]
+    assert np.allclose(evaluate_frozen_policy(observations, frozen_policy), expected)
+    assert np.allclose(
+        evaluate_frozen_policy(observations[0], frozen_policy), expected[0]
+    )
+
+    # weights are mapped from the file, aligned for direct use
+    for layer in frozen_policy.layers:
+        assert isinstance(layer.weights, np.memmap)
+        assert layer.weights.ctypes.data % 64 == 0
+
+    # champions convert to the same policy
+    save_champion(
+        tmp_path / "champion.npz",
+        networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+    )
+    freeze_champion(tmp_path / "champion.npz", tmp_path / "champion.policy.npy")
+    assert np.allclose(
+        evaluate_frozen_policy(
+            observations, load_frozen_policy(tmp_path / "champion.policy.npy")
+        ),
+        expected,
+    )
+
+
+def test_freeze_neat_activations(tmp_path):
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(1, hidden_amount=20)
+    networks_connection_directions = add_activation_genes(
+        networks_connection_directions, base_nodes
+    )
+    freeze_neat(
+        tmp_path / "policy.npy",
+        networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+    )
+    frozen_policy = load_frozen_policy(tmp_path / "policy.npy")
+    observations = np.random.random(size=(5, base_nodes.input_nodes.size))
+
+    # layers with several activations are stored as one layer per activation
+    assert len({layer.activation for layer in frozen_policy.layers}) > 1
+    assert np.allclose(
+        evaluate_frozen_policy(observations, frozen_policy),
+        [
+            feed_forward(
+                observation,
+                networks_connection_directions[0],
+                networks_connection_weights[0],
+                networks_connection_states[0],
+                base_nodes,
+            )
+            for observation in observations
+        ],
+    )
+
+
+def test_freeze_neat_recurrent(tmp_path):
+    # recurrent networks can't be stored as layers
+    with pytest.raises(ValueError):
+        freeze_neat(
+            tmp_path / "policy.npy",
+            ConnectionDirections(np.array([[0, 2], [2, 2]])),
+            ConnectionWeights(np.array([0.5, -0.5])),
+            ConnectionStates(np.array([1, 1])),
+            BaseNodes(np.array([0, 1]), np.array([2])),
+        )
+
+
+def test_freeze_neuro_evolution_champion(tmp_path):
+    weights = [np.random.normal(size=(5, 4)), np.random.normal(size=(2, 5))]
+    biases = [np.random.normal(size=5), np.random.normal(size=2)]
+    np.savez(
+        tmp_path / "champion.npz",
+        kind="neuro_evolution",
+        layer_amount=2,
+        weights_0=weights[0],
+        biases_0=biases[0],
+        weights_1=weights[1],
+        biases_1=biases[1],
+    )
+    freeze_champion(tmp_path / "champion.npz", tmp_path / "policy.npy")
+    observations = np.random.normal(size=(3, 4))
+
+    expected = (observations @ weights[0].T + biases[0]) @ weights[1].T + biases[1]
+    assert np.allclose(
+        evaluate_frozen_policy(
+            observations, load_frozen_policy(tmp_path / "policy.npy")
+        ),
+        expected,
+    )
+
+
+def test_frozen_policy_runtime_imports(tmp_path):
+    weights = [np.random.normal(size=(2, 3))]
+    champion_path = tmp_path / "champion.npz"
+    np.savez(
+        champion_path,
+        kind="neuro_evolution",
+        layer_amount=1,
+        weights_0=weights[0],
+        biases_0=np.zeros(2),
+    )
+    freeze_champion(champion_path, tmp_path / "policy.npy")
+
+    # the runtime loads and evaluates policies with numpy alone
+    modules = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, policy;"
+            f"policy.evaluate_frozen_policy([1, 2, 3], "
+            f"policy.load_frozen_policy({str(tmp_path / 'policy.npy')!r}));"
+            "print(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    for module in ("logics", "structs", "gym", "scipy"):
+        assert module not in modules
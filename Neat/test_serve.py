@@ -0,0 +1,96 @@
+import asyncio
+
+import numpy as np
+
+from logics import feed_forward, freeze_neat, save_champion
+from serve import BatchingServer, load_policy, resolve_champion_path
+from load_generator import generate_load
+from test_logic import generate_feed_forward_network
+
+
+def test_load_policy(tmp_path):
+    (
+        networks_connection_directions,
+        networks_connection_weights,
+        networks_connection_states,
+        base_nodes,
+    ) = generate_feed_forward_network(1)
+    save_champion(
+        tmp_path / "champion.npz",
+        networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+    )
+    policy, input_size = load_policy(tmp_path / "champion.npz")
+    observations = np.random.random(size=(5, input_size))
+
+    expected = [
+        feed_forward(
+            observation,
+            networks_connection_directions[0],
+            networks_connection_weights[0],
+            networks_connection_states[0],
+            base_nodes,
+        )
+        for observation in observations
+    ]
+    assert np.allclose(policy(observations), expected)
+
+    # frozen policies are served by the numpy only runtime
+    freeze_neat(
+        tmp_path / "champion.policy.npy",
+        networks_connection_directions[0],
+        networks_connection_weights[0],
+        networks_connection_states[0],
+        base_nodes,
+    )
+    policy, input_size = load_policy(tmp_path / "champion.policy.npy")
+    assert input_size == base_nodes.input_nodes.size
+    assert np.allclose(policy(observations), expected)
+
+
+def test_resolve_champion_path(tmp_path):
+    policy_path = str(tmp_path / "champion.policy.npy")
+    champion_path = str(tmp_path / "champion.npz")
+
+    # without a policy file the saved champion is served, when there is one
+    assert resolve_champion_path(policy_path, champion_path) == policy_path
+    (tmp_path / "champion.npz").write_bytes(b"")
+    assert resolve_champion_path(policy_path, champion_path) == champion_path
+    (tmp_path / "champion.policy.npy").write_bytes(b"")
+    assert resolve_champion_path(policy_path, champion_path) == policy_path
+    assert resolve_champion_path(policy_path) == policy_path
+
+
+def test_batching_server(tmp_path):
+    weights = np.random.normal(size=(2, 3))
+    server = BatchingServer(lambda observations: observations @ weights.T, 3, 8, 0.05)
+    observations = np.random.normal(size=(20, 3))
+
+    async def infer_concurrently():
+        server.queue = asyncio.Queue()
+        batch_task = asyncio.create_task(server.batch_loop())
+        outputs = await asyncio.gather(*map(server.infer, observations))
+        batch_task.cancel()
+        return outputs
+
+    # concurrent requests are coalesced into full batches and a final partial batch
+    outputs = asyncio.run(infer_concurrently())
+    assert np.allclose(outputs, observations @ weights.T)
+    assert server.batch_sizes == {8: 2, 4: 1}
+
+    # the load generator exercises the server over a unix socket
+    async def serve_load():
+        serve_task = asyncio.create_task(
+            server.serve(unix_socket=str(tmp_path / "serve.sock"))
+        )
+        await asyncio.sleep(0.1)
+        report = await generate_load(4, 0.5, unix_socket=str(tmp_path / "serve.sock"))
+        serve_task.cancel()
+        return report
+
+    report = asyncio.run(serve_load())
+    assert report["requests"] > 0
+    assert report["server"]["requests"] == report["requests"] + 20
+    assert report["server"]["latency_p99_ms"] >= report["server"]["latency_p50_ms"]
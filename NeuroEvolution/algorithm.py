@@ -1,7 +1,88 @@
-from typing import Tuple, List
+from collections import OrderedDict
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, NamedTuple, Tuple, List
 import numpy as np
 
 
+class SharedAgents(NamedTuple):
+    """
+    handle of the stacked weights and biases of all agents in one shared memory block,
+    small enough to send to worker processes which map the block by name
+    """
+
+    name: str
+    agent_amount: int
+    layers: List[int]
+    dtype: type = np.float64
+
+
+def _shared_agents_layout(
+    shared_agents: SharedAgents,
+) -> List[Tuple[Tuple[int, ...], int]]:
+    """
+    shape and byte offset of the stacked weights of each layer followed by the stacked
+    biases of each layer
+    """
+    layers = shared_agents.layers
+    shapes = [
+        (shared_agents.agent_amount, layers[i], layers[i - 1])
+        for i in range(1, len(layers))
+    ] + [(shared_agents.agent_amount, layers[i]) for i in range(1, len(layers))]
+    layout = []
+    offset = 0
+    for shape in shapes:
+        layout.append((shape, offset))
+        offset += int(np.prod(shape)) * np.dtype(shared_agents.dtype).itemsize
+    return layout
+
+
+def _shared_agents_arrays(
+    shared_memory: SharedMemory, shared_agents: SharedAgents
+) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    arrays = [
+        np.ndarray(
+            shape, dtype=shared_agents.dtype, buffer=shared_memory.buf, offset=offset
+        )
+        for shape, offset in _shared_agents_layout(shared_agents)
+    ]
+    layer_amount = len(shared_agents.layers) - 1
+    return arrays[:layer_amount], arrays[layer_amount:]
+
+
+def attach_agents(
+    shared_agents: SharedAgents,
+) -> Tuple[SharedMemory, List[np.ndarray], List[np.ndarray]]:
+    """
+    map shared agents without copying them, returns the block and the (agents, out, in)
+    weights and (agents, out) biases of each layer. the arrays are views into the
+    block so they have to be released before the block is closed
+    """
+    shared_memory = SharedMemory(name=shared_agents.name)
+    return (shared_memory, *_shared_agents_arrays(shared_memory, shared_agents))
+
+
+def _save_layers(path: str, weights: List[np.ndarray], biases: List[np.ndarray]):
+    layers = {}
+    for layer, (layer_weights, layer_biases) in enumerate(zip(weights, biases)):
+        layers[f"weights_{layer}"] = layer_weights
+        layers[f"biases_{layer}"] = layer_biases
+    np.savez(path, kind="neuro_evolution", layer_amount=len(weights), **layers)
+
+
+def calculate_stacked_outputs(
+    weights: List[np.ndarray], biases: List[np.ndarray], inputs: np.ndarray
+) -> np.ndarray:
+    """
+    calculate the output of stacked agents, inputs have one row per agent
+    """
+    previous_layer_output = inputs.reshape(inputs.shape[0], -1)
+    for layer_weights, layer_biases in zip(weights, biases):
+        previous_layer_output = (
+            np.einsum("aoi,ai->ao", layer_weights, previous_layer_output) + layer_biases
+        )
+    return previous_layer_output
+
+
 class NeuroEvolution:
 
     agent_outputs: List[np.ndarray]
@@ -17,13 +98,17 @@ class NeuroEvolution:
         mutation_rate: float = 0.001,
         keep_champion: bool = False,
         survival_rate: float = 0.0,
+        dtype: type = np.float64,
     ):
         # each agent is represented as in index, instead of an object
         self.agents = range(amount)
         self.input_shape = input_shape
         self.hidden_dimensions = hidden_dimensions
         self.output_shape = output_shape
-        self.agent_outputs = [np.zeros(shape=self.output_shape) for _ in self.agents]
+        self.dtype = dtype
+        self.agent_outputs = [
+            np.zeros(shape=self.output_shape, dtype=self.dtype) for _ in self.agents
+        ]
         self.mutation_rate = mutation_rate
         self.keep_champion = keep_champion
         self.survival_rate = survival_rate
@@ -38,8 +123,10 @@ class NeuroEvolution:
             new_weights = []
             new_biases = []
             for i in range(1, len(layers)):
-                new_weights.append(np.random.normal(size=(layers[i], layers[i - 1])))
-                new_biases.append(np.random.normal(size=layers[i]))
+                new_weights.append(
+                    np.random.normal(size=(layers[i], layers[i - 1])).astype(self.dtype)
+                )
+                new_biases.append(np.random.normal(size=layers[i]).astype(self.dtype))
             self.agent_weights.append(new_weights)
             self.agent_biases.append(new_biases)
 
@@ -53,7 +140,9 @@ class NeuroEvolution:
         for agent, input_, weights, biases in zip(
             self.agents, inputs, self.agent_weights, self.agent_biases
         ):
-            previous_layer_output: np.ndarray = input_.reshape(-1, 1)
+            previous_layer_output: np.ndarray = np.asarray(
+                input_, dtype=self.dtype
+            ).reshape(-1, 1)
             for layer_weights, layer_biases in zip(weights, biases):
                 previous_layer_output = (
                     np.sum(previous_layer_output.T * layer_weights, axis=1)
@@ -83,8 +172,12 @@ class NeuroEvolution:
                 size=int(len(self.agents) * self.survival_rate),
                 p=normalized_fitness_levels,
             )
-            new_generation_weights.extend(list(np.array(self.agent_weights)[new_weights_and_biases]))
-            new_generation_biases.extend(list(np.array(self.agent_biases)[new_weights_and_biases]))
+            new_generation_weights.extend(
+                self.agent_weights[agent] for agent in new_weights_and_biases
+            )
+            new_generation_biases.extend(
+                self.agent_biases[agent] for agent in new_weights_and_biases
+            )
 
         # generate new weights and biases for each new agent
         while len(new_generation_biases) < len(self.agents):
@@ -115,3 +208,578 @@ class NeuroEvolution:
         # set generation to new generation
         self.agent_weights = new_generation_weights
         self.agent_biases = new_generation_biases
+
+    def share(self) -> Tuple[SharedMemory, SharedAgents]:
+        """
+        write the weights and biases of all agents into a new shared memory block, the
+        caller owns the block and has to close and unlink it
+        """
+        layers = [self.agent_weights[0][0].shape[1]] + [
+            layer_weights.shape[0] for layer_weights in self.agent_weights[0]
+        ]
+        shared_agents = SharedAgents("", len(self.agents), layers, self.dtype)
+        layout = _shared_agents_layout(shared_agents)
+        shape, offset = layout[-1]
+        shared_memory = SharedMemory(
+            create=True,
+            size=offset + int(np.prod(shape)) * np.dtype(self.dtype).itemsize,
+        )
+        shared_agents = shared_agents._replace(name=shared_memory.name)
+
+        weights, biases = _shared_agents_arrays(shared_memory, shared_agents)
+        for layer in range(len(layers) - 1):
+            weights[layer][:] = [
+                agent_weights[layer] for agent_weights in self.agent_weights
+            ]
+            biases[layer][:] = [
+                agent_biases[layer] for agent_biases in self.agent_biases
+            ]
+        del weights, biases
+        return shared_memory, shared_agents
+
+    def save_agent(self, path: str, agent: int):
+        """
+        save the weights and biases of an agent to an .npz file so it can be served
+        without the trainer, layer i is stored as weights_i and biases_i
+        """
+        _save_layers(path, self.agent_weights[agent], self.agent_biases[agent])
+
+    def memory_report(self) -> Dict[str, float]:
+        """
+        count the bytes used to store the weights and biases of all agents
+        """
+        weights_bytes = sum(
+            layer_weights.nbytes
+            for weights in self.agent_weights
+            for layer_weights in weights
+        )
+        biases_bytes = sum(
+            layer_biases.nbytes for biases in self.agent_biases for layer_biases in biases
+        )
+        total_bytes = weights_bytes + biases_bytes
+        return {
+            "weights": weights_bytes,
+            "biases": biases_bytes,
+            "total": total_bytes,
+            "per_agent": total_bytes / len(self.agents),
+        }
+
+
+class MultiTrialNeuroEvolution:
+    """
+    independent NeuroEvolution trials evolved together, the weights and biases of
+    every layer are stacked into (trials, agents, out, in) and (trials, agents, out)
+    arrays so outputs and new generations of all trials are computed at once.
+    selection only ever mixes agents of the same trial
+    """
+
+    weights: List[np.ndarray]
+    biases: List[np.ndarray]
+
+    def __init__(
+        self,
+        trials: int,
+        amount: int,
+        input_shape: Tuple[int, ...],
+        output_shape: Tuple[int, ...],
+        hidden_dimensions: List[int],
+        mutation_rate: float = 0.001,
+        keep_champion: bool = False,
+        survival_rate: float = 0.0,
+        dtype: type = np.float64,
+        seed: int = None,
+    ):
+        self.trials = trials
+        self.amount = amount
+        self.input_shape = input_shape
+        self.hidden_dimensions = hidden_dimensions
+        self.output_shape = output_shape
+        self.mutation_rate = mutation_rate
+        self.keep_champion = keep_champion
+        self.survival_rate = survival_rate
+        self.dtype = dtype
+        self.rng = np.random.default_rng(seed)
+
+        # generate agent weights and biases using a normal distribution
+        input_layer = int(np.prod(self.input_shape))
+        output_layer = int(np.prod(self.output_shape))
+        layers = [input_layer] + self.hidden_dimensions + [output_layer]
+        self.weights = [
+            self.rng.normal(size=(trials, amount, layers[i], layers[i - 1])).astype(
+                dtype
+            )
+            for i in range(1, len(layers))
+        ]
+        self.biases = [
+            self.rng.normal(size=(trials, amount, layers[i])).astype(dtype)
+            for i in range(1, len(layers))
+        ]
+
+    def save_agent(self, path: str, trial: int, agent: int):
+        """
+        save the weights and biases of an agent of a trial, like
+        NeuroEvolution.save_agent
+        """
+        _save_layers(
+            path,
+            [layer_weights[trial, agent] for layer_weights in self.weights],
+            [layer_biases[trial, agent] for layer_biases in self.biases],
+        )
+
+    def calculate_outputs(self, inputs: np.ndarray) -> np.ndarray:
+        """
+        calculate the (trials, agents, *output_shape) outputs for inputs with a row per
+        agent of each trial
+        """
+        previous_layer_output = np.asarray(inputs, dtype=self.dtype).reshape(
+            self.trials, self.amount, -1
+        )
+        for layer_weights, layer_biases in zip(self.weights, self.biases):
+            previous_layer_output = (
+                np.einsum("taoi,tai->tao", layer_weights, previous_layer_output)
+                + layer_biases
+            )
+        return previous_layer_output.reshape(
+            self.trials, self.amount, *np.atleast_1d(self.output_shape)
+        )
+
+    def _sample_without_replacement(
+        self, probabilities: np.ndarray, draws: int, size: int
+    ) -> np.ndarray:
+        """
+        sample size distinct agents `draws` times from each trial with respect to the
+        (trials, agents) probabilities, using the largest Gumbel perturbed log
+        probabilities (Efraimidis-Spirakis keys). returns (trials, draws, size) indices
+        """
+        with np.errstate(divide="ignore"):
+            keys = np.log(probabilities)[:, None, :] + self.rng.gumbel(
+                size=(self.trials, draws, self.amount)
+            )
+        return np.argsort(-keys, axis=2)[:, :, :size]
+
+    def new_generation(self, agent_fitness_levels: np.ndarray):
+        """
+        spawn a new generation of every trial using crossover and mutation judging
+        agents by their (trials, agents) fitness
+        """
+        normalized_fitness_levels = agent_fitness_levels / agent_fitness_levels.sum(
+            axis=1, keepdims=True
+        )
+        trial_indices = np.arange(self.trials)[:, None]
+
+        # agents copied from the previous generation, the champion first
+        kept_agents = np.zeros((self.trials, 0), dtype=int)
+        if self.keep_champion:
+            kept_agents = normalized_fitness_levels.argmax(axis=1)[:, None]
+
+        # keep survival_rate * 100 % of agents from the previous generation
+        if self.survival_rate:
+            survivors = self._sample_without_replacement(
+                normalized_fitness_levels, 1, int(self.amount * self.survival_rate)
+            )[:, 0]
+            kept_agents = np.concatenate([kept_agents, survivors], axis=1)
+        kept_agents = kept_agents[:, : self.amount]
+
+        # choose two different parents for each new agent
+        children = self.amount - kept_agents.shape[1]
+        parents = self._sample_without_replacement(
+            normalized_fitness_levels, children, 2
+        )
+        parent_a, parent_b = parents[:, :, 0], parents[:, :, 1]
+
+        new_weights = []
+        new_biases = []
+        for layer_weights, layer_biases in zip(self.weights, self.biases):
+            new_layers = []
+            for layer in (layer_weights, layer_biases):
+                child_layer = layer[trial_indices, parent_a]
+
+                # each gene mutates or, otherwise, comes from parent b half the time
+                mutated = self.rng.random(child_layer.shape) < self.mutation_rate
+                from_parent_b = ~mutated & (self.rng.random(child_layer.shape) < 0.5)
+                np.copyto(child_layer, layer[trial_indices, parent_b], where=from_parent_b)
+                child_layer[mutated] = self.rng.normal(size=mutated.sum())
+
+                new_layers.append(
+                    np.concatenate([layer[trial_indices, kept_agents], child_layer], axis=1)
+                )
+            new_weights.append(new_layers[0])
+            new_biases.append(new_layers[1])
+
+        # set generation to new generation
+        self.weights = new_weights
+        self.biases = new_biases
+
+
+class SharedNoiseTable(NamedTuple):
+    """
+    handle of a table of standard normal noise in a shared memory block, workers map
+    the block by name and perturbations are addressed by their offset in the table
+    """
+
+    name: str
+    size: int
+    dtype: type = np.float32
+
+
+def create_noise_table(
+    size: int, seed: int = None, dtype: type = np.float32
+) -> Tuple[SharedMemory, SharedNoiseTable]:
+    """
+    fill a new shared memory block with size standard normal values, the caller owns
+    the block and has to close and unlink it
+    """
+    shared_memory = SharedMemory(create=True, size=size * np.dtype(dtype).itemsize)
+    noise = np.ndarray(size, dtype=dtype, buffer=shared_memory.buf)
+    np.random.default_rng(seed).standard_normal(size, dtype=dtype, out=noise)
+    del noise
+    return shared_memory, SharedNoiseTable(shared_memory.name, size, dtype)
+
+
+def attach_noise_table(
+    shared_noise_table: SharedNoiseTable,
+) -> Tuple[SharedMemory, np.ndarray]:
+    """
+    map a shared noise table without copying it, the array is a view into the block
+    so it has to be released before the block is closed
+    """
+    shared_memory = SharedMemory(name=shared_noise_table.name)
+    return shared_memory, np.ndarray(
+        shared_noise_table.size,
+        dtype=shared_noise_table.dtype,
+        buffer=shared_memory.buf,
+    )
+
+
+def noise_rows(noise: np.ndarray, offsets: np.ndarray, length: int) -> np.ndarray:
+    """
+    the (offsets, length) perturbations starting at each offset of a noise table
+    """
+    return np.lib.stride_tricks.sliding_window_view(noise, length)[offsets]
+
+
+def perturb_parameters(
+    parameters: np.ndarray, noise: np.ndarray, offsets: np.ndarray, sigma: float
+) -> np.ndarray:
+    """
+    (2 * offsets, parameters) parameters moved by sigma times the noise at each offset,
+    the positive perturbations followed by their negative twins
+    """
+    perturbations = sigma * noise_rows(noise, offsets, parameters.size)
+    return np.concatenate([parameters + perturbations, parameters - perturbations])
+
+
+def unflatten_parameters(
+    parameters: np.ndarray, layers: List[int]
+) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """
+    split (..., parameters) flat parameter vectors into the (..., out, in) weights and
+    (..., out) biases of each layer, as views when possible
+    """
+    weights = []
+    biases = []
+    offset = 0
+    batch_shape = parameters.shape[:-1]
+    for i in range(1, len(layers)):
+        size = layers[i] * layers[i - 1]
+        weights.append(
+            parameters[..., offset : offset + size].reshape(
+                *batch_shape, layers[i], layers[i - 1]
+            )
+        )
+        offset += size
+        biases.append(parameters[..., offset : offset + layers[i]])
+        offset += layers[i]
+    return weights, biases
+
+
+def centered_ranks(values: np.ndarray) -> np.ndarray:
+    """
+    replace values by their rank scaled to [-0.5, 0.5], so updates don't depend on
+    the scale of the fitness. tied values share their average rank, so ties don't
+    move the parameters
+    """
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    ranks = ((ends - counts + ends - 1) / 2)[inverse]
+    return (ranks / max(values.size - 1, 1) - 0.5).reshape(values.shape)
+
+
+class EvolutionStrategies:
+    """
+    OpenAI style evolution strategies over the parameters of one agent laid out like
+    the NeuroEvolution layers. every generation samples antithetic pairs of
+    perturbations by their offsets in a noise table, so the fitness of a pair is all
+    that is needed to estimate the gradient
+    """
+
+    def __init__(
+        self,
+        input_shape: Tuple[int, ...],
+        output_shape: Tuple[int, ...],
+        hidden_dimensions: List[int],
+        noise: np.ndarray,
+        pairs: int,
+        sigma: float = 0.02,
+        learning_rate: float = 0.01,
+        weight_decay: float = 0.005,
+        adam_betas: Tuple[float, float] = (0.9, 0.999),
+        adam_epsilon: float = 1e-8,
+        parameters: np.ndarray = None,
+        seed: int = None,
+    ):
+        self.layers = (
+            [int(np.prod(input_shape))]
+            + hidden_dimensions
+            + [int(np.prod(output_shape))]
+        )
+        self.parameter_amount = sum(
+            self.layers[i] * self.layers[i - 1] + self.layers[i]
+            for i in range(1, len(self.layers))
+        )
+        self.noise = noise
+        self.pairs = pairs
+        self.sigma = sigma
+        self.learning_rate = learning_rate
+        self.weight_decay = weight_decay
+        self.adam_betas = adam_betas
+        self.adam_epsilon = adam_epsilon
+        self.rng = np.random.default_rng(seed)
+
+        # parameters can live in a caller owned (shared) buffer, they are updated in
+        # place. weights start scaled by the fan in, biases at 0
+        self.parameters = (
+            np.empty(self.parameter_amount, dtype=noise.dtype)
+            if parameters is None
+            else parameters
+        )
+        self.parameters[:] = 0
+        weights, _ = unflatten_parameters(self.parameters, self.layers)
+        for layer_weights in weights:
+            layer_weights[:] = self.rng.normal(
+                scale=1 / np.sqrt(layer_weights.shape[1]), size=layer_weights.shape
+            )
+
+        self.first_moment = np.zeros(self.parameter_amount)
+        self.second_moment = np.zeros(self.parameter_amount)
+        self.steps = 0
+
+    def sample_offsets(self) -> np.ndarray:
+        """
+        noise table offsets of this generation's perturbations
+        """
+        return self.rng.integers(
+            self.noise.size - self.parameter_amount + 1, size=self.pairs
+        )
+
+    def update(
+        self,
+        offsets: np.ndarray,
+        positive_fitness: np.ndarray,
+        negative_fitness: np.ndarray,
+    ):
+        """
+        move the parameters along the gradient estimated from the fitness of each
+        antithetic pair, fitness is rank normalized over the whole generation
+        """
+        ranks = centered_ranks(np.stack([positive_fitness, negative_fitness]))
+        gradient = (ranks[0] - ranks[1]) @ noise_rows(
+            self.noise, offsets, self.parameter_amount
+        ) / (offsets.size * self.sigma)
+
+        # adam ascent with weight decay
+        gradient = gradient - self.weight_decay * self.parameters
+        self.steps += 1
+        beta_1, beta_2 = self.adam_betas
+        self.first_moment = beta_1 * self.first_moment + (1 - beta_1) * gradient
+        self.second_moment = beta_2 * self.second_moment + (1 - beta_2) * gradient**2
+        step_size = (
+            self.learning_rate
+            * np.sqrt(1.0 - beta_2**self.steps)
+            / (1.0 - beta_1**self.steps)
+        )
+        self.parameters += step_size * self.first_moment / (
+            np.sqrt(self.second_moment) + self.adam_epsilon
+        )
+
+
+# seeds are drawn below this bound so they fit in an int32
+SEED_BOUND = 2**31 - 1
+
+
+class SeedChainDecoder:
+    """
+    rebuilds the flat parameters of seed chain agents, a chain is the seed of the
+    agent's normal initialization followed by the seed of every mutation applied to
+    it. the cache_size least recently used agents are kept, so an agent whose parent
+    is cached is decoded with a single mutation
+    """
+
+    def __init__(
+        self,
+        layers: List[int],
+        mutation_power: float,
+        dtype: type = np.float64,
+        cache_size: int = 128,
+    ):
+        self.layers = layers
+        self.mutation_power = mutation_power
+        self.dtype = dtype
+        self.cache_size = cache_size
+        self.parameter_amount = sum(
+            layers[i] * layers[i - 1] + layers[i] for i in range(1, len(layers))
+        )
+        self.cache: "OrderedDict[Tuple[int, ...], np.ndarray]" = OrderedDict()
+
+    def _noise(self, seed: int) -> np.ndarray:
+        return np.random.default_rng(seed).standard_normal(
+            self.parameter_amount, dtype=self.dtype
+        )
+
+    def decode(self, chain: Tuple[int, ...]) -> np.ndarray:
+        """
+        flat parameters of a chain, starting from its longest cached prefix. the
+        array is shared with the cache so it is read only
+        """
+        for length in range(len(chain), 0, -1):
+            parameters = self.cache.get(chain[:length])
+            if parameters is not None:
+                self.cache.move_to_end(chain[:length])
+                if length == len(chain):
+                    return parameters
+                parameters = parameters.copy()
+                break
+        else:
+            length = 1
+            parameters = self._noise(chain[0])
+
+        for mutation_seed in chain[length:]:
+            parameters += self.mutation_power * self._noise(mutation_seed)
+        parameters.flags.writeable = False
+        self.cache[chain] = parameters
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return parameters
+
+    def decode_agents(
+        self, chains: List[Tuple[int, ...]]
+    ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        stacked (agents, out, in) weights and (agents, out) biases of each layer
+        """
+        return unflatten_parameters(
+            np.stack([self.decode(chain) for chain in chains]), self.layers
+        )
+
+
+class SeedChainNeuroEvolution:
+    """
+    Deep GA style NeuroEvolution where each agent is stored as a chain of seeds
+    instead of its weights and biases, see SeedChainDecoder. children are a
+    truncation selected parent mutated by mutation_power gaussian noise, a chain only
+    grows by one seed per generation so populations are cheap to keep and to send
+    """
+
+    def __init__(
+        self,
+        amount: int,
+        input_shape: Tuple[int, ...],
+        output_shape: Tuple[int, ...],
+        hidden_dimensions: List[int],
+        mutation_power: float = 0.01,
+        keep_champion: bool = False,
+        truncation_rate: float = 0.2,
+        dtype: type = np.float64,
+        cache_size: int = None,
+        seed: int = None,
+    ):
+        # each agent is represented as in index, instead of an object
+        self.agents = range(amount)
+        self.input_shape = input_shape
+        self.hidden_dimensions = hidden_dimensions
+        self.output_shape = output_shape
+        self.dtype = dtype
+        self.agent_outputs = [
+            np.zeros(shape=self.output_shape, dtype=self.dtype) for _ in self.agents
+        ]
+        self.mutation_power = mutation_power
+        self.keep_champion = keep_champion
+        self.truncation_rate = truncation_rate
+        self.rng = np.random.default_rng(seed)
+        self.layers = (
+            [int(np.prod(input_shape))]
+            + hidden_dimensions
+            + [int(np.prod(output_shape))]
+        )
+
+        # the cache holds a generation and its parents by default
+        self.decoder = SeedChainDecoder(
+            self.layers, mutation_power, dtype, cache_size or 2 * amount
+        )
+        self.chains: List[Tuple[int, ...]] = [
+            (int(seed),) for seed in self.rng.integers(SEED_BOUND, size=amount)
+        ]
+        self._stacked_agents = None
+
+    def stacked_agents(self) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        stacked weights and biases of this generation, decoded once per generation
+        """
+        if self._stacked_agents is None:
+            self._stacked_agents = self.decoder.decode_agents(self.chains)
+        return self._stacked_agents
+
+    def calculate_outputs(self, inputs: List[np.ndarray]):
+        """
+        calculate the output of each agent with respect to the inputs
+        """
+        weights, biases = self.stacked_agents()
+        outputs = calculate_stacked_outputs(
+            weights, biases, np.asarray(inputs, dtype=self.dtype)
+        )
+        self.agent_outputs = [output.reshape(self.output_shape) for output in outputs]
+
+    def new_generation(self, agent_fitness_levels: np.ndarray):
+        """
+        spawn a new generation by mutating uniformly chosen agents of the top
+        truncation_rate * 100 %, the champion is kept unmutated when keep_champion
+        """
+        ranking = np.argsort(-np.asarray(agent_fitness_levels), kind="stable")
+        parents = ranking[: max(1, int(len(self.agents) * self.truncation_rate))]
+
+        new_chains = [self.chains[ranking[0]]] if self.keep_champion else []
+        children = len(self.agents) - len(new_chains)
+        for parent, mutation_seed in zip(
+            self.rng.choice(parents, size=children),
+            self.rng.integers(SEED_BOUND, size=children),
+        ):
+            new_chains.append(self.chains[parent] + (int(mutation_seed),))
+
+        # set generation to new generation
+        self.chains = new_chains
+        self._stacked_agents = None
+
+    def save_agent(self, path: str, agent: int):
+        """
+        save the decoded weights and biases of an agent like NeuroEvolution.save_agent
+        """
+        weights, biases = unflatten_parameters(
+            self.decoder.decode(self.chains[agent]), self.layers
+        )
+        _save_layers(path, weights, biases)
+
+    def memory_report(self) -> Dict[str, float]:
+        """
+        count the bytes of the seed chains of all agents (as int32 seeds) and of the
+        decoder cache
+        """
+        chains_bytes = sum(4 * len(chain) for chain in self.chains)
+        cache_bytes = sum(
+            parameters.nbytes for parameters in self.decoder.cache.values()
+        )
+        return {
+            "chains": chains_bytes,
+            "cache": cache_bytes,
+            "total": chains_bytes + cache_bytes,
+            "per_agent": chains_bytes / len(self.agents),
+        }
@@ -1,12 +1,29 @@
 from multiprocessing import Pool
-from itertools import repeat
-import matplotlib.pyplot as plt
+from multiprocessing.shared_memory import SharedMemory
 import numpy as np
-import gym
-from typing import List
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
+# gym and matplotlib are imported where they are used, so pool workers only load what
+# they need
+if TYPE_CHECKING:
+    import gym
 
-from algorithm import NeuroEvolution
+
+from algorithm import (
+    EvolutionStrategies,
+    MultiTrialNeuroEvolution,
+    NeuroEvolution,
+    SeedChainDecoder,
+    SeedChainNeuroEvolution,
+    SharedAgents,
+    SharedNoiseTable,
+    attach_agents,
+    attach_noise_table,
+    calculate_stacked_outputs,
+    create_noise_table,
+    perturb_parameters,
+    unflatten_parameters,
+)
 
 # env and hyper parameters setup
 ENV_NAME = "CartPole-v0"
@@ -19,6 +36,191 @@ MUTATION_RATE = 0.01
 KEEP_CHAMPION = False
 SURVIVAL_RATE = 0.4
 
+# use np.float32 to halve the memory of large populations
+DTYPE = np.float64
+
+# evolve all trials together in one process with MultiTrialNeuroEvolution, WORKERS and
+# SEED_CHAINS aren't supported then
+VECTORIZED_TRIALS = False
+
+# evaluate the agents of a trial in this many worker processes (trials then run one
+# after another), 0 runs every trial in its own process
+WORKERS = 0
+
+# seed of the episode seeds, every agent of an episode then starts from the same seeded
+# state (common random numbers) and the seeds are printed. None plays unseeded episodes
+SEED = None
+
+# the best agent of each trial is saved here, freeze it for serving with
+# Neat/policy.py. None doesn't save it
+CHAMPION_PATH = "champion_{trial}.npz"
+
+# train a single agent of each trial with evolution strategies instead (see
+# es_training_loop), EPISODES is then the amount of generations
+EVOLUTION_STRATEGIES = False
+ES_PAIRS = 32
+ES_SIGMA = 0.05
+ES_LEARNING_RATE = 0.03
+NOISE_TABLE_SIZE = 10_000_000
+
+# store agents as seed chains (see SeedChainNeuroEvolution) when trials aren't
+# vectorized, MUTATION_RATE is then the mutation power and SURVIVAL_RATE the fraction
+# of agents selected as parents. workers then receive the chains instead of weights
+SEED_CHAINS = False
+
+# decoders of seed chain workers, their caches are kept between generations
+_seed_chain_decoders: Dict[Tuple[Any, ...], SeedChainDecoder] = {}
+
+# evolution strategies workers map the noise table and parameters once, their
+# environments are kept between generations
+_es_worker: Dict[str, Any] = {}
+
+# environments of pool workers by environment id, kept between generations
+_worker_environments: Dict[str, List["gym.Env"]] = {}
+
+
+def reset_environment(env: "gym.Env", seed: int = None) -> np.ndarray:
+    """
+    reset an environment, seeded when a seed is given
+    """
+    return env.reset() if seed is None else env.reset(seed=int(seed))
+
+
+def evaluate_agents_parallel(
+    pool: Pool,
+    neuro: NeuroEvolution,
+    env_name: str,
+    episode_steps: int,
+    chunks: int,
+    seed: int = None,
+) -> np.ndarray:
+    """
+    play an episode with every agent in the workers of a pool. the agents are written
+    once into shared memory, workers map their slice of it and only the rewards are
+    sent back. with a seed every worker resets its environments to the same start.
+    seed chain agents are sent as their chains and decoded by the workers
+    """
+    bounds = np.linspace(0, len(neuro.agents), chunks + 1).astype(int)
+    if isinstance(neuro, SeedChainNeuroEvolution):
+        rewards = pool.starmap(
+            _evaluate_seed_chains,
+            [
+                (
+                    neuro.chains[start:stop],
+                    neuro.layers,
+                    neuro.mutation_power,
+                    neuro.dtype,
+                    env_name,
+                    episode_steps,
+                    seed,
+                )
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ],
+        )
+        return np.concatenate(rewards)
+
+    shared_memory, shared_agents = neuro.share()
+    try:
+        rewards = pool.starmap(
+            _evaluate_shared_agents,
+            [
+                (shared_agents, start, stop, env_name, episode_steps, seed)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ],
+        )
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+    return np.concatenate(rewards)
+
+
+def _evaluate_shared_agents(
+    shared_agents: SharedAgents,
+    start: int,
+    stop: int,
+    env_name: str,
+    episode_steps: int,
+    seed: int = None,
+) -> np.ndarray:
+    """
+    worker side of evaluate_agents_parallel, plays an episode with the agents in
+    [start, stop) and returns their rewards (starting at 1 like training_loop)
+    """
+    import gym
+
+    shared_memory, weights, biases = attach_agents(shared_agents)
+    agent_weights = agent_biases = None
+    try:
+        environments = _worker_environments.setdefault(env_name, [])
+        while len(environments) < stop - start:
+            environments.append(gym.make(env_name))
+        environments = environments[: stop - start]
+        observations = np.array([reset_environment(env, seed) for env in environments])
+        episode_rewards = np.ones(len(environments))
+        env_states = np.zeros(len(environments), dtype=bool)
+        agent_weights = [layer_weights[start:stop] for layer_weights in weights]
+        agent_biases = [layer_biases[start:stop] for layer_biases in biases]
+        for step in range(episode_steps):
+            outputs = calculate_stacked_outputs(
+                agent_weights, agent_biases, observations.astype(shared_agents.dtype)
+            )
+            for env_index, environment in enumerate(environments):
+                if env_states[env_index]:
+                    continue
+                (
+                    observations[env_index],
+                    reward,
+                    env_states[env_index],
+                    _,
+                ) = environment.step(np.argmax(outputs[env_index]))
+                episode_rewards[env_index] += reward
+            if env_states.all():
+                break
+    finally:
+        # release the views before closing the block
+        del weights, biases, agent_weights, agent_biases
+        # frames of a raised exception can still hold views, the block is then left
+        # to the garbage collector so the exception isn't masked
+        try:
+            shared_memory.close()
+        except BufferError:
+            pass
+    return episode_rewards
+
+
+def _evaluate_seed_chains(
+    chains: List[Tuple[int, ...]],
+    layers: List[int],
+    mutation_power: float,
+    dtype: type,
+    env_name: str,
+    episode_steps: int,
+    seed: int = None,
+) -> np.ndarray:
+    """
+    worker side of evaluate_agents_parallel for seed chain agents, plays an episode
+    with each agent and returns their rewards (starting at 1 like training_loop)
+    """
+    import gym
+
+    decoder_key = (tuple(layers), mutation_power, np.dtype(dtype).str)
+    if decoder_key not in _seed_chain_decoders:
+        _seed_chain_decoders[decoder_key] = SeedChainDecoder(
+            layers, mutation_power, dtype, 2 * len(chains)
+        )
+    decoder = _seed_chain_decoders[decoder_key]
+    decoder.cache_size = max(decoder.cache_size, 2 * len(chains))
+    weights, biases = decoder.decode_agents(chains)
+
+    environments = _worker_environments.setdefault(env_name, [])
+    while len(environments) < len(chains):
+        environments.append(gym.make(env_name))
+    return 1 + play_stacked_agents(
+        environments[: len(chains)], weights, biases, episode_steps, seed
+    )
+
 
 def training_loop(
     env_name: str,
@@ -29,102 +231,559 @@ def training_loop(
     mutation_rate: float,
     keep_champion: bool,
     survival_rate: float,
+    dtype: type = np.float64,
+    pool: Pool = None,
+    workers: int = 0,
+    episode_callback: Callable[[int, float, float], Optional[bool]] = None,
+    seed: int = None,
+    champion_path: str = None,
+    seed_chains: bool = False,
 ):
+    """
+    evolve agents in an environment, returns the avg and max rewards of each episode.
+    episode_callback is called with the episode, avg and max rewards after each
+    episode and stops training when it returns False. with a seed, every episode
+    draws a seed that all agents reset with. with a champion path, the best agent seen
+    is saved there for serving. with seed_chains the agents are a
+    SeedChainNeuroEvolution population seeded by the seed, mutation_rate and
+    survival_rate are then its mutation power and truncation rate
+    """
+
+    import gym
 
     # initialize environments
     environments = [gym.make(env_name) for _ in range(agents)]
-    observations = [env.reset() for env in environments]
+    seed_rng = np.random.default_rng(seed)
 
     # build neuro evolution trainer
-    neuro = NeuroEvolution(
+    if seed_chains:
+        neuro = SeedChainNeuroEvolution(
+            agents,
+            environments[0].observation_space.shape,
+            environments[0].action_space.n,
+            hidden_layers,
+            mutation_rate,
+            keep_champion,
+            survival_rate,
+            dtype,
+            seed=seed,
+        )
+    else:
+        neuro = NeuroEvolution(
+            agents,
+            environments[0].observation_space.shape,
+            environments[0].action_space.n,
+            hidden_layers,
+            mutation_rate,
+            keep_champion,
+            survival_rate,
+            dtype,
+        )
+
+    # logging
+    avg_rewards = []
+    max_rewards = []
+
+    # training loop
+    for episode in range(episodes):
+
+        # reset environments and get initial observations
+        episode_seed = None
+        if seed is not None:
+            episode_seed = int(seed_rng.integers(2 ** 31 - 1))
+            print(f"episode {episode} seed: {episode_seed}")
+        observations = [reset_environment(env, episode_seed) for env in environments]
+
+        # initialize rewards at 1 to avoid 0 division errors
+        episode_rewards = np.ones(shape=len(neuro.agents))
+        env_states = [False for _ in environments]
+        if pool:
+            episode_rewards = evaluate_agents_parallel(
+                pool, neuro, env_name, episode_steps, workers, episode_seed
+            )
+        else:
+            for step in range(episode_steps):
+
+                # get agent actions
+                neuro.calculate_outputs(observations)
+                observations = []
+                reset = True
+                for (agent_index, action), (env_index, environment) in zip(
+                    enumerate(neuro.agent_outputs), enumerate(environments)
+                ):
+
+                    # don't act in environment if simulation is done
+                    if env_states[env_index]:
+                        observations.append(np.zeros(shape=neuro.input_shape))
+                        continue
+
+                    # take action and log reward and new observation
+                    observation, reward, done, _ = environment.step(np.argmax(action))
+                    episode_rewards[agent_index] += reward
+                    observations.append(observation)
+
+                    # don't reset simulation till all environments are done
+                    if done:
+                        env_states[env_index] = True
+                    else:
+                        reset = False
+
+                if reset:
+                    break
+
+        # log average and max rewards for all agents in this episode
+        average_rewards = np.average(episode_rewards)
+        max_reward = np.max(episode_rewards)
+        if champion_path and max_reward > max(max_rewards, default=-np.inf):
+            neuro.save_agent(champion_path, int(np.argmax(episode_rewards)))
+        avg_rewards.append(average_rewards)
+        max_rewards.append(max_reward)
+        if (
+            episode_callback
+            and episode_callback(episode, average_rewards, max_reward) is False
+        ):
+            break
+
+        # generate new generation with respect to the episode rewards
+        neuro.new_generation(episode_rewards)
+
+    # close environments
+    for env in environments:
+        env.close()
+
+    return avg_rewards, max_rewards
+
+
+def play_stacked_agents(
+    environments: List["gym.Env"],
+    weights: List[np.ndarray],
+    biases: List[np.ndarray],
+    episode_steps: int,
+    seed: int = None,
+) -> np.ndarray:
+    """
+    play an episode with each stacked agent in its own environment, all agents step
+    together. returns the episode rewards
+    """
+    observations = np.array([reset_environment(env, seed) for env in environments])
+    episode_rewards = np.zeros(len(environments))
+    env_states = np.zeros(len(environments), dtype=bool)
+    for step in range(episode_steps):
+        outputs = calculate_stacked_outputs(
+            weights, biases, observations.astype(weights[0].dtype)
+        )
+        for env_index, environment in enumerate(environments):
+            if env_states[env_index]:
+                continue
+            (
+                observations[env_index],
+                reward,
+                env_states[env_index],
+                _,
+            ) = environment.step(np.argmax(outputs[env_index]))
+            episode_rewards[env_index] += reward
+        if env_states.all():
+            break
+    return episode_rewards
+
+
+def evaluate_perturbations(
+    environments: List["gym.Env"],
+    layers: List[int],
+    parameters: np.ndarray,
+    noise: np.ndarray,
+    offsets: np.ndarray,
+    sigma: float,
+    episode_steps: int,
+    seed: int = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    play an episode with the positive and the negative perturbation of the parameters
+    at each noise offset, needs two environments per offset. returns the positive and
+    negative rewards
+    """
+    weights, biases = unflatten_parameters(
+        perturb_parameters(parameters, noise, offsets, sigma), layers
+    )
+    rewards = play_stacked_agents(
+        environments[: 2 * offsets.size], weights, biases, episode_steps, seed
+    )
+    return rewards[: offsets.size], rewards[offsets.size :]
+
+
+def _attach_es_worker(
+    shared_noise_table: SharedNoiseTable,
+    parameters_name: str,
+    layers: List[int],
+    env_name: str,
+):
+    """
+    pool initializer of es_training_loop workers
+    """
+    import gym
+
+    noise_memory, noise = attach_noise_table(shared_noise_table)
+    parameters_memory = SharedMemory(name=parameters_name)
+    parameter_amount = sum(
+        layers[i] * layers[i - 1] + layers[i] for i in range(1, len(layers))
+    )
+    _es_worker.update(
+        noise_memory=noise_memory,
+        parameters_memory=parameters_memory,
+        noise=noise,
+        parameters=np.ndarray(
+            parameter_amount, dtype=noise.dtype, buffer=parameters_memory.buf
+        ),
+        layers=layers,
+        make_environment=lambda: gym.make(env_name),
+        environments=[],
+    )
+
+
+def _evaluate_shared_perturbations(
+    offsets: np.ndarray, sigma: float, episode_steps: int, seed: int = None
+) -> List[Tuple[int, float, float]]:
+    """
+    worker side of es_training_loop, returns (offset, positive reward, negative
+    reward) for each offset
+    """
+    environments = _es_worker["environments"]
+    while len(environments) < 2 * offsets.size:
+        environments.append(_es_worker["make_environment"]())
+    positive_rewards, negative_rewards = evaluate_perturbations(
+        environments,
+        _es_worker["layers"],
+        _es_worker["parameters"],
+        _es_worker["noise"],
+        offsets,
+        sigma,
+        episode_steps,
+        seed,
+    )
+    return list(zip(offsets.tolist(), positive_rewards, negative_rewards))
+
+
+def es_training_loop(
+    env_name: str,
+    generations: int,
+    episode_steps: int,
+    pairs: int,
+    hidden_layers: List[int],
+    sigma: float = ES_SIGMA,
+    learning_rate: float = ES_LEARNING_RATE,
+    noise_table_size: int = NOISE_TABLE_SIZE,
+    workers: int = 0,
+    episode_callback: Callable[[int, float, float], Optional[bool]] = None,
+    seed: int = None,
+):
+    """
+    train an agent with evolution strategies, returns the avg and max rewards of the
+    perturbed agents of each generation. the noise table and the parameters are
+    shared memory that workers map once, so per generation workers only receive noise
+    offsets and send back (offset, positive reward, negative reward) triples. with a
+    seed, every generation draws a seed that all agents reset with
+    """
+    import gym
+
+    seed_rng = np.random.default_rng(seed)
+    test_environment = gym.make(env_name)
+    input_shape = test_environment.observation_space.shape
+    output_shape = test_environment.action_space.n
+    test_environment.close()
+
+    noise_memory, shared_noise_table = create_noise_table(noise_table_size, seed)
+    noise = np.ndarray(
+        noise_table_size, dtype=shared_noise_table.dtype, buffer=noise_memory.buf
+    )
+    layers = [int(np.prod(input_shape))] + hidden_layers + [output_shape]
+    parameter_amount = sum(
+        layers[i] * layers[i - 1] + layers[i] for i in range(1, len(layers))
+    )
+    parameters_memory = SharedMemory(
+        create=True, size=parameter_amount * noise.dtype.itemsize
+    )
+    es = EvolutionStrategies(
+        input_shape,
+        output_shape,
+        hidden_layers,
+        noise,
+        pairs,
+        sigma,
+        learning_rate,
+        parameters=np.ndarray(
+            parameter_amount, dtype=noise.dtype, buffer=parameters_memory.buf
+        ),
+        seed=seed,
+    )
+
+    pool = None
+    environments = []
+    if workers:
+        pool = Pool(
+            workers,
+            initializer=_attach_es_worker,
+            initargs=(shared_noise_table, parameters_memory.name, layers, env_name),
+        )
+    else:
+        environments = [gym.make(env_name) for _ in range(2 * pairs)]
+
+    # logging
+    avg_rewards = []
+    max_rewards = []
+
+    try:
+        for generation in range(generations):
+            generation_seed = None
+            if seed is not None:
+                generation_seed = int(seed_rng.integers(2 ** 31 - 1))
+            offsets = es.sample_offsets()
+
+            if pool:
+                results = sum(
+                    pool.starmap(
+                        _evaluate_shared_perturbations,
+                        [
+                            (chunk, sigma, episode_steps, generation_seed)
+                            for chunk in np.array_split(offsets, workers)
+                            if chunk.size
+                        ],
+                    ),
+                    [],
+                )
+                offsets = np.array([offset for offset, _, _ in results])
+                positive_rewards = np.array([reward for _, reward, _ in results])
+                negative_rewards = np.array([reward for _, _, reward in results])
+            else:
+                positive_rewards, negative_rewards = evaluate_perturbations(
+                    environments,
+                    layers,
+                    es.parameters,
+                    noise,
+                    offsets,
+                    sigma,
+                    episode_steps,
+                    generation_seed,
+                )
+
+            # log average and max rewards of the perturbed agents
+            rewards = np.concatenate([positive_rewards, negative_rewards])
+            avg_rewards.append(np.average(rewards))
+            max_rewards.append(np.max(rewards))
+            if (
+                episode_callback
+                and episode_callback(generation, avg_rewards[-1], max_rewards[-1])
+                is False
+            ):
+                break
+
+            es.update(offsets, positive_rewards, negative_rewards)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        for env in environments:
+            env.close()
+
+        # release the views before closing the blocks, frames of a raised exception
+        # can still hold views, a block is then left to the garbage collector so the
+        # exception isn't masked
+        del es, noise
+        for shared_memory in (noise_memory, parameters_memory):
+            try:
+                shared_memory.close()
+            except BufferError:
+                pass
+            shared_memory.unlink()
+
+    return avg_rewards, max_rewards
+
+
+def trials_training_loop(
+    env_name: str,
+    trials: int,
+    episodes: int,
+    episode_steps: int,
+    agents: int,
+    hidden_layers: List[int],
+    mutation_rate: float,
+    keep_champion: bool,
+    survival_rate: float,
+    dtype: type = np.float64,
+    seed: int = None,
+    champion_paths: List[str] = None,
+) -> List[Tuple[List[float], List[float]]]:
+    """
+    run independent trials of training_loop together, every agent of every trial has
+    its own environment and the agent outputs of all trials are one computation.
+    with a seed, every episode draws a seed per trial that all agents of the trial
+    reset with. with champion paths, the best agent seen in each trial is saved to
+    the trial's path. returns the avg and max rewards for each episode of each trial
+    """
+    seed_rng = np.random.default_rng(seed)
+
+    import gym
+
+    # initialize environments, one row of environments per trial
+    environments = [gym.make(env_name) for _ in range(trials * agents)]
+    observation_shape = environments[0].observation_space.shape
+
+    # build neuro evolution trainer
+    neuro = MultiTrialNeuroEvolution(
+        trials,
         agents,
-        environments[0].observation_space.shape,
+        observation_shape,
         environments[0].action_space.n,
         hidden_layers,
         mutation_rate,
         keep_champion,
         survival_rate,
+        dtype,
     )
 
     # logging
-    avg_rewards = []
-    max_rewards = []
+    avg_rewards = np.zeros((trials, episodes))
+    max_rewards = np.zeros((trials, episodes))
 
     # training loop
     for episode in range(episodes):
+        trial_seeds = [None] * trials
+        if seed is not None:
+            trial_seeds = seed_rng.integers(2 ** 31 - 1, size=trials)
+            print(f"episode {episode} trial seeds: {trial_seeds.tolist()}")
+        observations = np.array(
+            [
+                reset_environment(env, trial_seeds[env_index // agents])
+                for env_index, env in enumerate(environments)
+            ]
+        )
 
         # initialize rewards at 1 to avoid 0 division errors
-        episode_rewards = np.ones(shape=len(neuro.agents))
-        env_states = [False for _ in environments]
+        episode_rewards = np.ones(trials * agents)
+        env_states = np.zeros(trials * agents, dtype=bool)
         for step in range(episode_steps):
 
-            # get agent actions
-            neuro.calculate_outputs(observations)
-            observations = []
-            reset = True
-            for (agent_index, action), (env_index, environment) in zip(
-                enumerate(neuro.agent_outputs), enumerate(environments)
-            ):
+            # get agent actions of all trials
+            actions = neuro.calculate_outputs(observations).reshape(trials * agents, -1)
+            actions = actions.argmax(axis=1)
+            for env_index, environment in enumerate(environments):
 
                 # don't act in environment if simulation is done
                 if env_states[env_index]:
-                    observations.append(np.zeros(shape=neuro.input_shape))
                     continue
 
                 # take action and log reward and new observation
-                observation, reward, done, _ = environment.step(np.argmax(action))
-                episode_rewards[agent_index] += reward
-                observations.append(observation)
-
-                # don't reset simulation till all environments are done
-                if done:
-                    env_states[env_index] = True
-                else:
-                    reset = False
+                (
+                    observations[env_index],
+                    reward,
+                    env_states[env_index],
+                    _,
+                ) = environment.step(actions[env_index])
+                episode_rewards[env_index] += reward
 
-            if reset:
+            if env_states.all():
                 break
 
-        # reset environments and get initial observations
-        observations = [env.reset() for env in environments]
+        # log average and max rewards for all agents of each trial in this episode
+        episode_rewards = episode_rewards.reshape(trials, agents)
+        if champion_paths:
+            best_agents = episode_rewards.argmax(axis=1)
+            for trial, champion_path in enumerate(champion_paths):
+                if champion_path and (
+                    episode == 0
+                    or episode_rewards[trial].max() > max_rewards[trial, :episode].max()
+                ):
+                    neuro.save_agent(champion_path, trial, int(best_agents[trial]))
+        avg_rewards[:, episode] = episode_rewards.mean(axis=1)
+        max_rewards[:, episode] = episode_rewards.max(axis=1)
 
-        # log average and max rewards for all agents in this episode
-        average_rewards = np.average(episode_rewards)
-        max_reward = np.max(episode_rewards)
-        avg_rewards.append(average_rewards)
-        max_rewards.append(max_reward)
-
-        # generate new generation with respect to the episode rewards
+        # generate new generations with respect to the episode rewards
         neuro.new_generation(episode_rewards)
 
     # close environments
     for env in environments:
         env.close()
 
-    return avg_rewards, max_rewards
+    return [
+        (list(trial_avg_rewards), list(trial_max_rewards))
+        for trial_avg_rewards, trial_max_rewards in zip(avg_rewards, max_rewards)
+    ]
 
 
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
 
     # run trainer and get avg and max rewards for each episode during training
-    # use Pool to run trainers in parallel
-    for trial_run, (training_avg_rewards, training_max_rewards) in enumerate(
-        Pool(TRIALS).starmap(
+    # evolve all trials together, or use Pool to run trainers in parallel or to
+    # evaluate the agents of each trainer in parallel when WORKERS is set
+    training_parameters = (
+        ENV_NAME,
+        EPISODES,
+        EPISODE_STEPS,
+        AGENTS,
+        HIDDEN_LAYERS,
+        MUTATION_RATE,
+        KEEP_CHAMPION,
+        SURVIVAL_RATE,
+        DTYPE,
+    )
+    trial_seeds = [None if SEED is None else SEED + trial for trial in range(TRIALS)]
+    champion_paths = [
+        CHAMPION_PATH and CHAMPION_PATH.format(trial=trial) for trial in range(TRIALS)
+    ]
+    if EVOLUTION_STRATEGIES:
+        training_results = [
+            es_training_loop(
+                ENV_NAME,
+                EPISODES,
+                EPISODE_STEPS,
+                ES_PAIRS,
+                HIDDEN_LAYERS,
+                workers=WORKERS,
+                seed=trial_seed,
+            )
+            for trial_seed in trial_seeds
+        ]
+    elif VECTORIZED_TRIALS:
+        if WORKERS or SEED_CHAINS:
+            raise ValueError("vectorized trials don't support WORKERS or SEED_CHAINS")
+        training_results = trials_training_loop(
+            ENV_NAME,
+            TRIALS,
+            *training_parameters[1:],
+            seed=SEED,
+            champion_paths=champion_paths,
+        )
+    elif WORKERS:
+        with Pool(WORKERS) as pool:
+            training_results = [
+                training_loop(
+                    *training_parameters,
+                    pool,
+                    WORKERS,
+                    seed=trial_seed,
+                    champion_path=champion_path,
+                    seed_chains=SEED_CHAINS,
+                )
+                for trial_seed, champion_path in zip(trial_seeds, champion_paths)
+            ]
+    else:
+        training_results = Pool(TRIALS).starmap(
             training_loop,
-            repeat(
+            [
                 (
-                    ENV_NAME,
-                    EPISODES,
-                    EPISODE_STEPS,
-                    AGENTS,
-                    HIDDEN_LAYERS,
-                    MUTATION_RATE,
-                    KEEP_CHAMPION,
-                    SURVIVAL_RATE,
-                ),
-                times=TRIALS,
-            ),
+                    *training_parameters,
+                    None,
+                    0,
+                    None,
+                    trial_seed,
+                    champion_path,
+                    SEED_CHAINS,
+                )
+                for trial_seed, champion_path in zip(trial_seeds, champion_paths)
+            ],
         )
+    for trial_run, (training_avg_rewards, training_max_rewards) in enumerate(
+        training_results
     ):
         # add training results to plot
         plt.plot(training_max_rewards, label=f"max_reward_{trial_run}")
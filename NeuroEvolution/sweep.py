@@ -0,0 +1,326 @@
+"""
+hyperparameter sweeps over the NeuroEvolution and NEAT training loops. trials run on a
+process pool, stream their per-episode metrics to disk and are stopped early by ASHA
+(asynchronous successive halving) when they fall behind the other trials
+"""
+import importlib.util
+import itertools
+import json
+import os
+import sys
+from multiprocessing import Manager, Pool
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+NEAT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Neat")
+
+# sweep setup, "neuro_evolution" or "neat" with "grid" or "random" search
+TARGET = "neuro_evolution"
+SEARCH = "random"
+RANDOM_CONFIGS = 32
+PROCESSES = os.cpu_count()
+OUTPUT_DIRECTORY = "sweep_results"
+SEED = 0
+
+# ASHA: the first rung is at MIN_EPISODES, every next rung is REDUCTION_FACTOR times
+# later and only the best 1 / REDUCTION_FACTOR of the trials at a rung continue
+MIN_EPISODES = 10
+REDUCTION_FACTOR = 3
+
+# score of a trial at a rung is the mean average reward of its last episodes
+SCORE_WINDOW = 5
+
+# lists are choices, (low, high) tuples are uniform ranges (integer ranges for ints)
+SEARCH_SPACES = {
+    "neuro_evolution": {
+        "mutation_rate": (0.001, 0.1),
+        "survival_rate": [0.0, 0.2, 0.4],
+        "hidden_layers": [[], [4], [8]],
+        "keep_champion": [False, True],
+    },
+    "neat": {
+        "threshold": (1.0, 5.0),
+        "new_connection_rate": (0.01, 0.2),
+        "split_connection_rate": (0.01, 0.1),
+        "crossover_rate": [0.5, 0.75],
+    },
+}
+
+# parameters that aren't searched
+BASE_CONFIGS = {
+    "neuro_evolution": {
+        "env_name": "CartPole-v0",
+        "episodes": 100,
+        "episode_steps": 210,
+        "agents": 10,
+        "hidden_layers": [],
+        "mutation_rate": 0.01,
+        "keep_champion": False,
+        "survival_rate": 0.4,
+    },
+    "neat": {
+        "environment_name": "CartPole-v0",
+        "network_amount": 50,
+        "generations": 100,
+    },
+}
+
+
+def grid_configs(search_space: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    every combination of the choices of a search space, ranges contribute their ends
+    """
+    names = list(search_space)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(
+            *(list(search_space[name]) for name in names)
+        )
+    ]
+
+
+def random_configs(
+    search_space: Dict[str, Any], amount: int, rng: np.random.Generator
+) -> List[Dict[str, Any]]:
+    """
+    sample configs from a search space, lists are sampled uniformly and (low, high)
+    tuples uniformly in the range
+    """
+    configs = []
+    for _ in range(amount):
+        config = {}
+        for name, values in search_space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = int(rng.integers(low, high + 1))
+                else:
+                    config[name] = float(rng.uniform(low, high))
+            else:
+                config[name] = values[rng.integers(len(values))]
+        configs.append(config)
+    return configs
+
+
+class AshaStopper:
+    """
+    asynchronous successive halving. a trial reaching a rung records its score there
+    and continues only if the score is in the best 1 / reduction_factor of the scores
+    recorded at that rung so far. the rung results live in a manager dict so every
+    worker process sees them
+    """
+
+    def __init__(
+        self,
+        rung_results: Dict[int, List[float]],
+        lock: Any,
+        min_episodes: int,
+        reduction_factor: int,
+        max_episodes: int,
+        score_window: int = 5,
+    ):
+        self.rung_results = rung_results
+        self.lock = lock
+        self.reduction_factor = reduction_factor
+        self.score_window = score_window
+        self.rungs = []
+        rung = min_episodes
+        while rung < max_episodes:
+            self.rungs.append(rung)
+            rung *= reduction_factor
+
+    def keep_training(self, episode: int, average_rewards: List[float]) -> bool:
+        if episode + 1 not in self.rungs:
+            return True
+        score = float(np.mean(average_rewards[-self.score_window :]))
+        with self.lock:
+            results = self.rung_results.get(episode + 1, []) + [score]
+            self.rung_results[episode + 1] = results
+
+        # too few results to compare against
+        kept = len(results) // self.reduction_factor
+        if kept == 0:
+            return True
+        return score >= sorted(results, reverse=True)[kept - 1]
+
+
+def _load_neat_main():
+    """
+    import Neat/main.py under another name. its modules import each other by name, so
+    the Neat directory is on sys.path only while they are imported, and they are then
+    renamed with a neat_ prefix so later bare imports (like main) don't resolve to them
+    """
+    if "neat_main" not in sys.modules:
+        neat_directory = os.path.abspath(NEAT_DIRECTORY)
+        previous_modules = dict(sys.modules)
+        sys.path.insert(0, neat_directory)
+        try:
+            specification = importlib.util.spec_from_file_location(
+                "neat_main", os.path.join(neat_directory, "main.py")
+            )
+            module = importlib.util.module_from_spec(specification)
+            specification.loader.exec_module(module)
+        finally:
+            sys.path.remove(neat_directory)
+            for name, imported_module in list(sys.modules.items()):
+                module_file = getattr(imported_module, "__file__", None)
+                if name in previous_modules or not module_file:
+                    continue
+                if os.path.dirname(os.path.abspath(module_file)) == neat_directory:
+                    sys.modules[f"neat_{name}"] = sys.modules.pop(name)
+        sys.modules["neat_main"] = module
+    return sys.modules["neat_main"]
+
+
+def _training_function(
+    target: str, config: Dict[str, Any]
+) -> Callable[[Callable[[int, float, float], bool]], Any]:
+    """
+    bind a config to the training loop of a target, the result takes the episode
+    callback
+    """
+    parameters = {**BASE_CONFIGS[target], **config}
+    if target == "neuro_evolution":
+        from main import training_loop
+
+        return lambda episode_callback: training_loop(
+            **parameters, episode_callback=episode_callback
+        )
+
+    # NEAT parameters are spread over its parameter dicts
+    neat_main = _load_neat_main()
+    parameter_dicts = {
+        "genetic_distance_parameters": dict(neat_main.GENETIC_DISTANCE_PARAMETERS),
+        "mutation_parameters": dict(neat_main.MUTATION_PARAMETERS),
+        "crossover_parameters": dict(neat_main.CROSSOVER_PARAMETERS),
+    }
+    for name in list(parameters):
+        for parameter_dict in parameter_dicts.values():
+            if name in parameter_dict:
+                parameter_dict[name] = parameters.pop(name)
+    return lambda episode_callback: neat_main.training_loop(
+        **parameters,
+        **parameter_dicts,
+        draw_networks=False,
+        verbose=False,
+        episode_callback=episode_callback,
+    )
+
+
+def run_trial(
+    trial: int,
+    target: str,
+    config: Dict[str, Any],
+    output_directory: str,
+    stopper: AshaStopper,
+) -> Dict[str, Any]:
+    """
+    train one config, appending the metrics of every episode to the trial's metrics
+    file as they are produced. returns a summary of the trial
+    """
+    average_rewards = []
+    max_rewards = []
+    stopped = False
+
+    with open(os.path.join(output_directory, f"trial_{trial}.jsonl"), "w") as metrics:
+
+        def episode_callback(episode: int, average_reward: float, max_reward: float):
+            nonlocal stopped
+            average_rewards.append(float(average_reward))
+            max_rewards.append(float(max_reward))
+            metrics.write(
+                json.dumps(
+                    {
+                        "episode": episode,
+                        "avg_reward": average_rewards[-1],
+                        "max_reward": max_rewards[-1],
+                    }
+                )
+                + "\n"
+            )
+            metrics.flush()
+            stopped = not stopper.keep_training(episode, average_rewards)
+            return not stopped
+
+        _training_function(target, config)(episode_callback)
+
+    return {
+        "trial": trial,
+        "config": config,
+        "episodes": len(average_rewards),
+        "stopped": stopped,
+        "best_avg_reward": max(average_rewards, default=None),
+        "best_max_reward": max(max_rewards, default=None),
+    }
+
+
+def run_sweep(
+    target: str,
+    configs: List[Dict[str, Any]],
+    output_directory: str,
+    processes: int,
+    min_episodes: int,
+    reduction_factor: int,
+    score_window: int = SCORE_WINDOW,
+) -> List[Dict[str, Any]]:
+    """
+    run a trial for every config on a process pool, writing trial summaries to
+    summary.jsonl in the order trials finish. returns the summaries
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    base_config = BASE_CONFIGS[target]
+    max_episodes = base_config.get("episodes", base_config.get("generations"))
+
+    with Manager() as manager, Pool(processes) as pool:
+        stopper = AshaStopper(
+            manager.dict(),
+            manager.Lock(),
+            min_episodes,
+            reduction_factor,
+            max_episodes,
+            score_window,
+        )
+        summaries = []
+        with open(os.path.join(output_directory, "summary.jsonl"), "w") as summary_file:
+            for summary in pool.imap_unordered(
+                _run_trial_arguments,
+                [
+                    (trial, target, config, output_directory, stopper)
+                    for trial, config in enumerate(configs)
+                ],
+            ):
+                summaries.append(summary)
+                summary_file.write(json.dumps(summary) + "\n")
+                summary_file.flush()
+                print(
+                    f"trial {summary['trial']} finished after {summary['episodes']} "
+                    f"episodes{' (stopped)' if summary['stopped'] else ''}: "
+                    f"best avg reward {summary['best_avg_reward']}"
+                )
+    return summaries
+
+
+def _run_trial_arguments(arguments: Tuple) -> Dict[str, Any]:
+    return run_trial(*arguments)
+
+
+if __name__ == "__main__":
+    search_space = SEARCH_SPACES[TARGET]
+    if SEARCH == "grid":
+        configs = grid_configs(search_space)
+    else:
+        configs = random_configs(
+            search_space, RANDOM_CONFIGS, np.random.default_rng(SEED)
+        )
+
+    summaries = run_sweep(
+        TARGET,
+        configs,
+        OUTPUT_DIRECTORY,
+        PROCESSES,
+        MIN_EPISODES,
+        REDUCTION_FACTOR,
+    )
+    best = max(summaries, key=lambda summary: summary["best_avg_reward"] or 0)
+    print(f"best config: {best['config']} with avg reward {best['best_avg_reward']}")
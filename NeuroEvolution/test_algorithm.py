@@ -0,0 +1,239 @@
+import numpy as np
+import pytest
+
+from algorithm import (
+    EvolutionStrategies,
+    MultiTrialNeuroEvolution,
+    NeuroEvolution,
+    SeedChainDecoder,
+    SeedChainNeuroEvolution,
+    calculate_stacked_outputs,
+    centered_ranks,
+    noise_rows,
+    perturb_parameters,
+    unflatten_parameters,
+)
+
+
+def test_float32_neuro_evolution():
+    np.random.seed(0)
+    amount = 6
+    neuro_64 = NeuroEvolution(amount, (4,), 2, [8], 0.1, survival_rate=0.5)
+    neuro_32 = NeuroEvolution(
+        amount, (4,), 2, [8], 0.1, survival_rate=0.5, dtype=np.float32
+    )
+    neuro_32.agent_weights = [
+        [layer_weights.astype(np.float32) for layer_weights in weights]
+        for weights in neuro_64.agent_weights
+    ]
+    neuro_32.agent_biases = [
+        [layer_biases.astype(np.float32) for layer_biases in biases]
+        for biases in neuro_64.agent_biases
+    ]
+
+    # float32 agents give the outputs of float64 agents within float32 precision
+    inputs = np.random.normal(size=(amount, 4))
+    neuro_64.calculate_outputs(inputs)
+    neuro_32.calculate_outputs(inputs)
+    assert all(output.dtype == np.float32 for output in neuro_32.agent_outputs)
+    assert np.allclose(neuro_32.agent_outputs, neuro_64.agent_outputs, rtol=1e-4)
+
+    def stacked(neuro):
+        return (
+            [np.stack(layer) for layer in zip(*neuro.agent_weights)],
+            [np.stack(layer) for layer in zip(*neuro.agent_biases)],
+        )
+
+    stacked_outputs_32 = calculate_stacked_outputs(
+        *stacked(neuro_32), inputs.astype(np.float32)
+    )
+    assert stacked_outputs_32.dtype == np.float32
+    assert np.allclose(
+        stacked_outputs_32,
+        calculate_stacked_outputs(*stacked(neuro_64), inputs),
+        rtol=1e-4,
+    )
+
+    # new generations stay float32 and take half the memory
+    neuro_32.new_generation(np.arange(1, amount + 1, dtype=float))
+    assert all(
+        layer.dtype == np.float32
+        for agent_layers in neuro_32.agent_weights + neuro_32.agent_biases
+        for layer in agent_layers
+    )
+    assert neuro_32.memory_report()["total"] * 2 == neuro_64.memory_report()["total"]
+
+
+def test_multi_trial_calculate_outputs():
+    trials, amount = 3, 4
+    neuro = MultiTrialNeuroEvolution(trials, amount, (5,), 2, [6], seed=0)
+    inputs = np.random.normal(size=(trials * amount, 5))
+    outputs = neuro.calculate_outputs(inputs)
+    assert outputs.shape == (trials, amount, 2)
+
+    # every agent is evaluated with its own weights
+    trial, agent = 1, 2
+    expected = inputs[trial * amount + agent]
+    for layer_weights, layer_biases in zip(neuro.weights, neuro.biases):
+        expected = layer_weights[trial, agent] @ expected + layer_biases[trial, agent]
+    assert np.allclose(outputs[trial, agent], expected)
+
+
+def test_multi_trial_save_agent(tmp_path):
+    neuro = MultiTrialNeuroEvolution(2, 3, (5,), 2, [6], seed=0)
+    neuro.save_agent(tmp_path / "champion.npz", 1, 2)
+    with np.load(tmp_path / "champion.npz") as champion:
+        assert int(champion["layer_amount"]) == 2
+        assert np.array_equal(champion["weights_1"], neuro.weights[1][1, 2])
+        assert np.array_equal(champion["biases_0"], neuro.biases[0][1, 2])
+
+
+def test_sample_without_replacement():
+    neuro = MultiTrialNeuroEvolution(2, 4, (1,), 1, [], seed=0)
+    probabilities = np.array([[0.1, 0.2, 0.3, 0.4], [0.0, 0.5, 0.5, 0.0]])
+    draws = 20_000
+    samples = neuro._sample_without_replacement(probabilities, draws, 2)
+    assert samples.shape == (2, draws, 2)
+
+    # the agents of a draw are distinct and agents without probability are never drawn
+    assert (samples[:, :, 0] != samples[:, :, 1]).all()
+    assert set(np.unique(samples[1])) == {1, 2}
+
+    # the first agent of a draw is drawn with respect to the probabilities
+    for trial_samples, trial_probabilities in zip(samples, probabilities):
+        frequencies = np.bincount(trial_samples[:, 0], minlength=4) / draws
+        assert np.allclose(frequencies, trial_probabilities, atol=0.02)
+
+
+def test_unflatten_parameters():
+    layers = [3, 4, 2]
+    parameters = np.arange(2 * 26, dtype=float).reshape(2, 26)
+    weights, biases = unflatten_parameters(parameters, layers)
+    assert [layer_weights.shape for layer_weights in weights] == [(2, 4, 3), (2, 2, 4)]
+    assert [layer_biases.shape for layer_biases in biases] == [(2, 4), (2, 2)]
+
+    # every layer is its weights followed by its biases, as views of the parameters
+    assert np.array_equal(
+        np.concatenate(
+            [
+                np.concatenate([layer_weights.reshape(2, -1), layer_biases], axis=1)
+                for layer_weights, layer_biases in zip(weights, biases)
+            ],
+            axis=1,
+        ),
+        parameters,
+    )
+    weights[1][0, 1, 2] = -1
+    assert parameters[0, 16 + 1 * 4 + 2] == -1
+
+
+def test_perturb_parameters():
+    noise = np.arange(10, dtype=float)
+    parameters = np.array([1.0, 2.0, 3.0])
+    offsets = np.array([4, 0, 7])
+    assert np.array_equal(
+        noise_rows(noise, offsets, 3), [[4, 5, 6], [0, 1, 2], [7, 8, 9]]
+    )
+
+    # the positive perturbations come first, followed by their negative twins
+    perturbed = perturb_parameters(parameters, noise, offsets, 0.5)
+    assert perturbed.shape == (6, 3)
+    assert np.allclose(perturbed[:3], parameters + 0.5 * noise_rows(noise, offsets, 3))
+    assert np.allclose(perturbed[3:], parameters - 0.5 * noise_rows(noise, offsets, 3))
+
+
+def test_centered_ranks():
+    ranks = centered_ranks(np.array([[10.0, -3.0, 7.0], [0.0, 100.0, 1.0]]))
+    assert ranks.shape == (2, 3)
+    assert np.allclose(ranks, [[0.3, -0.5, 0.1], [-0.3, 0.5, -0.1]])
+
+    # tied values share their rank, so a tied generation has no gradient
+    ranks = centered_ranks(np.array([2.0, 1.0, 2.0, 3.0]))
+    assert np.allclose(ranks, [0, -0.5, 0, 0.5])
+    assert np.allclose(centered_ranks(np.full((2, 4), 5.0)), 0)
+
+
+def test_evolution_strategies_update():
+    noise = np.arange(6, dtype=float)
+    es = EvolutionStrategies(
+        (1,), (1,), [], noise, 2, sigma=0.5, weight_decay=0, adam_epsilon=0, seed=0
+    )
+    parameters = es.parameters.copy()
+    offsets = np.array([0, 3])
+    es.update(offsets, np.array([1.0, 3.0]), np.array([2.0, 0.0]))
+
+    # ranks of the pairs are [-1 / 6, 1 / 2] and [1 / 6, -1 / 2], and the noise rows
+    # are [0, 1] and [3, 4]
+    gradient = (-1 / 3 * np.array([0, 1]) + 1 * np.array([3, 4])) / (2 * 0.5)
+    assert np.allclose(es.first_moment, 0.1 * gradient)
+    assert np.allclose(es.second_moment, 0.001 * gradient**2)
+
+    # the first adam step moves every parameter by the learning rate
+    assert np.allclose(es.parameters, parameters + 0.01 * np.sign(gradient))
+
+
+def test_seed_chain_decode():
+    layers = [3, 4, 2]
+    decoder = SeedChainDecoder(layers, 0.1, cache_size=0)
+    chain = (5, 17, 3)
+
+    # the initialization noise plus the mutation noise of each seed
+    expected = np.random.default_rng(5).standard_normal(26)
+    for mutation_seed in chain[1:]:
+        expected += 0.1 * np.random.default_rng(mutation_seed).standard_normal(26)
+    assert np.allclose(decoder.decode(chain), expected)
+    assert not decoder.cache
+
+    weights, biases = decoder.decode_agents([chain, chain[:1]])
+    assert [layer_weights.shape for layer_weights in weights] == [(2, 4, 3), (2, 2, 4)]
+    assert np.allclose(weights[0][0], unflatten_parameters(expected, layers)[0][0])
+
+
+def test_seed_chain_decoder_cache():
+    layers = [3, 4, 2]
+    decoder = SeedChainDecoder(layers, 0.1, cache_size=2)
+    for length in range(1, 4):
+        decoder.decode((5, 17, 3)[:length])
+
+    # the least recently used chain was evicted
+    assert list(decoder.cache) == [(5, 17), (5, 17, 3)]
+    decoder.decode((5, 17))
+    decoder.decode((5, 8))
+    assert list(decoder.cache) == [(5, 17), (5, 8)]
+
+    # decoding from a cached prefix gives the parameters of a full decode
+    assert np.array_equal(
+        decoder.decode((5, 17, 3, 9)),
+        SeedChainDecoder(layers, 0.1, cache_size=0).decode((5, 17, 3, 9)),
+    )
+
+    # cached parameters are shared, so they are read only
+    parameters = decoder.decode((5, 17))
+    assert parameters is decoder.cache[(5, 17)]
+    assert not parameters.flags.writeable
+    with pytest.raises(ValueError):
+        parameters[0] = 0
+
+
+def test_seed_chain_new_generation():
+    amount = 10
+    neuro = SeedChainNeuroEvolution(
+        amount, (3,), 2, [4], keep_champion=True, truncation_rate=0.2, seed=0
+    )
+    chains = list(neuro.chains)
+    fitness = np.arange(amount, dtype=float)[::-1] ** 2
+    fitness[[3, 7]] = fitness[0] + [1, 2]
+    neuro.new_generation(fitness)
+
+    # the champion is kept unmutated and the other agents are mutated children of
+    # the top 20 %
+    assert neuro.chains[0] == chains[7]
+    parents = {chains[7], chains[3]}
+    assert all(len(chain) == 2 and chain[:1] in parents for chain in neuro.chains[1:])
+
+    # the same seed breeds the same generation
+    other_neuro = SeedChainNeuroEvolution(
+        amount, (3,), 2, [4], keep_champion=True, truncation_rate=0.2, seed=0
+    )
+    other_neuro.new_generation(fitness)
+    assert other_neuro.chains == neuro.chains
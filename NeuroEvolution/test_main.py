@@ -0,0 +1,57 @@
+from multiprocessing import Pool
+
+import numpy as np
+
+from main import es_training_loop, training_loop, trials_training_loop
+
+
+def test_es_training_loop_workers():
+    parameters = dict(
+        env_name="CartPole-v0",
+        generations=3,
+        episode_steps=50,
+        pairs=4,
+        hidden_layers=[4],
+        noise_table_size=10_000,
+        seed=0,
+    )
+
+    # workers evaluate the same perturbations from the same shared parameters
+    assert es_training_loop(**parameters, workers=2) == es_training_loop(**parameters)
+
+
+def test_training_loop_seed_chains():
+    parameters = dict(
+        env_name="CartPole-v0",
+        episodes=3,
+        episode_steps=50,
+        agents=6,
+        hidden_layers=[4],
+        mutation_rate=0.1,
+        keep_champion=True,
+        survival_rate=0.5,
+        seed=0,
+        seed_chains=True,
+    )
+
+    # the seed seeds the population, so serial and pool runs are the same
+    serial_rewards = training_loop(**parameters)
+    assert training_loop(**parameters) == serial_rewards
+    with Pool(2) as pool:
+        assert training_loop(**parameters, pool=pool, workers=2) == serial_rewards
+
+
+def test_trials_training_loop_champions(tmp_path):
+    champion_paths = [str(tmp_path / f"champion_{trial}.npz") for trial in range(2)]
+    results = trials_training_loop(
+        "CartPole-v0", 2, 3, 50, 4, [4], 0.1, True, 0.5, champion_paths=champion_paths
+    )
+    assert len(results) == 2
+
+    # the best agent of every trial is saved like NeuroEvolution.save_agent
+    for champion_path in champion_paths:
+        with np.load(champion_path) as champion:
+            assert str(champion["kind"]) == "neuro_evolution"
+            assert int(champion["layer_amount"]) == 2
+            assert champion["weights_0"].shape == (4, 4)
+            assert champion["biases_1"].shape == (2,)
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+from threading import Lock
+
+import numpy as np
+
+import sweep
+from sweep import AshaStopper, grid_configs, random_configs, run_sweep
+
+
+def test_grid_configs():
+    configs = grid_configs({"rate": (0.1, 0.5), "layers": [[], [4], [8]]})
+    assert len(configs) == 6
+    assert configs[0] == {"rate": 0.1, "layers": []}
+    assert configs[-1] == {"rate": 0.5, "layers": [8]}
+
+
+def test_random_configs():
+    search_space = {"rate": (0.1, 0.5), "size": (1, 3), "layers": [[], [4]]}
+    configs = random_configs(search_space, 200, np.random.default_rng(0))
+    assert len(configs) == 200
+
+    # float ranges are sampled uniformly, integer ranges include both ends
+    rates = [config["rate"] for config in configs]
+    assert all(isinstance(rate, float) and 0.1 <= rate <= 0.5 for rate in rates)
+    sizes = [config["size"] for config in configs]
+    assert all(isinstance(size, int) for size in sizes)
+    assert set(sizes) == {1, 2, 3}
+    assert {tuple(config["layers"]) for config in configs} == {(), (4,)}
+
+    # the same generator state gives the same configs
+    assert random_configs(search_space, 200, np.random.default_rng(0)) == configs
+
+
+def test_asha_stopper():
+    stopper = AshaStopper({}, Lock(), 2, 3, 20, score_window=2)
+    assert stopper.rungs == [2, 6, 18]
+
+    # only episodes that reach a rung are judged
+    assert stopper.keep_training(0, [100.0])
+    assert stopper.rung_results == {}
+
+    # trials continue until there are enough results to compare against
+    assert stopper.keep_training(1, [0.0, 2.0])
+    assert stopper.keep_training(1, [0.0, 4.0])
+    assert stopper.rung_results == {2: [1.0, 2.0]}
+
+    # with three results only the best third continues
+    assert not stopper.keep_training(1, [0.0, 0.0])
+    assert stopper.keep_training(1, [0.0, 6.0])
+    assert not stopper.keep_training(1, [2.0, 2.0])
+    assert stopper.rung_results[2] == [1.0, 2.0, 0.0, 3.0, 2.0]
+
+
+def test_run_sweep(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+        sweep.BASE_CONFIGS,
+        "neuro_evolution",
+        {
+            "env_name": "CartPole-v0",
+            "episodes": 4,
+            "episode_steps": 20,
+            "agents": 4,
+            "hidden_layers": [],
+            "mutation_rate": 0.01,
+            "keep_champion": False,
+            "survival_rate": 0.4,
+        },
+    )
+    configs = [{"mutation_rate": 0.01}, {"mutation_rate": 0.1}]
+    summaries = run_sweep("neuro_evolution", configs, str(tmp_path), 2, 2, 2, 1)
+
+    assert sorted(summary["trial"] for summary in summaries) == [0, 1]
+    for summary in summaries:
+        assert summary["config"] == configs[summary["trial"]]
+        assert 2 <= summary["episodes"] <= 4
+        with open(tmp_path / f"trial_{summary['trial']}.jsonl") as metrics:
+            episodes = [json.loads(line)["episode"] for line in metrics]
+        assert episodes == list(range(summary["episodes"]))
+    with open(tmp_path / "summary.jsonl") as summary_file:
+        assert len(summary_file.readlines()) == 2
+
+
+def test_load_neat_main():
+    neat_main = sweep._load_neat_main()
+    assert callable(neat_main.training_loop)
+
+    # the Neat directory and module names don't leak into later imports
+    assert os.path.abspath(sweep.NEAT_DIRECTORY) not in sys.path
+    assert "structs" not in sys.modules and "logics" not in sys.modules
+    assert sys.modules["neat_logics"].feed_forward is neat_main.feed_forward